@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from fastapi import Request, Response
+
+from ..infra.content_cache import EncodedContent
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cached_json_response(
+    request: Request, content: EncodedContent, requested_version: str | None, engine_version: str
+) -> Response:
+    cache_control = IMMUTABLE_CACHE_CONTROL if requested_version == engine_version else REVALIDATE_CACHE_CONTROL
+    headers = {"ETag": content.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request, content.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content.body, media_type="application/json", headers=headers)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..infra.metrics import HTTP_REQUEST_DURATION
+from ..infra.timing import answers_fingerprint, request_timings, start_timings
+
+_ID_PREFIX = os.urandom(4).hex()
+_ID_COUNTER = itertools.count(1)
+
+
+@dataclass
+class RequestContext:
+    id: str
+    method: str
+    path: str
+    start: float
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+
+request_context: ContextVar[RequestContext | None] = ContextVar("aiq_request_context", default=None)
+
+
+def current_request_id() -> str:
+    ctx = request_context.get()
+    return ctx.id if ctx else "-"
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id()
+        return True
+
+
+class RequestLoggingMiddleware:
+    def __init__(self, app: ASGIApp, logger: logging.Logger) -> None:
+        self.app = app
+        self.logger = logger
+        # SERVER_TIMING: "always", "header" (only when the request sends X-Debug-Timing) or "off".
+        self.server_timing = os.environ.get("SERVER_TIMING", "header").strip().lower()
+        self.slow_request_ms = float(os.environ.get("SLOW_REQUEST_MS", "0") or 0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        ctx = RequestContext(
+            id=f"{_ID_PREFIX}{next(_ID_COUNTER):x}",
+            method=scope["method"],
+            path=scope["path"],
+            start=time.perf_counter(),
+        )
+        token = request_context.set(ctx)
+        status_code = 500
+        emit_timing = self.server_timing == "always" or (
+            self.server_timing == "header" and any(name == b"x-debug-timing" for name, _ in scope.get("headers") or [])
+        )
+        timings, timings_token = start_timings() if emit_timing or self.slow_request_ms > 0 else (None, None)
+        log_info = self.logger.isEnabledFor(logging.INFO)
+        if log_info:
+            headers = dict(scope.get("headers") or [])
+            client = scope.get("client")
+            self.logger.info(
+                "request_start id=%s method=%s path=%s query=%s client=%s ua=%s",
+                ctx.id,
+                ctx.method,
+                ctx.path,
+                scope.get("query_string", b"").decode("latin-1"),
+                client[0] if client else "",
+                headers.get(b"user-agent", b"").decode("latin-1"),
+            )
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [*message.get("headers", []), (b"x-request-id", ctx.id.encode("latin-1"))]
+                if emit_timing and timings is not None:
+                    headers.append((b"server-timing", timings.header_value(ctx.elapsed_ms()).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            self.logger.exception("request_error id=%s duration_ms=%.2f", ctx.id, ctx.elapsed_ms())
+            raise
+        else:
+            if log_info:
+                self.logger.info(
+                    "request_end id=%s status=%s duration_ms=%.2f", ctx.id, status_code, ctx.elapsed_ms()
+                )
+            if timings is not None and self.slow_request_ms > 0 and ctx.elapsed_ms() >= self.slow_request_ms:
+                answers = timings.answers or {}
+                self.logger.warning(
+                    "slow_request id=%s method=%s path=%s status=%s duration_ms=%.2f phases=%s lang=%s "
+                    "fingerprint=%s answers=%s",
+                    ctx.id,
+                    ctx.method,
+                    ctx.path,
+                    status_code,
+                    ctx.elapsed_ms(),
+                    timings.describe(),
+                    timings.lang,
+                    answers_fingerprint(answers),
+                    json.dumps(answers, ensure_ascii=False, separators=(",", ":"), default=str),
+                )
+        finally:
+            if timings_token is not None:
+                request_timings.reset(timings_token)
+            request_context.reset(token)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The route template keeps label cardinality bounded; unmatched paths share one series.
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code),
+            )
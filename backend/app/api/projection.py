@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+class FieldProjection:
+    def __init__(self, question_fields: set[str], option_fields: set[str]) -> None:
+        self.question_fields = question_fields
+        self.option_fields = option_fields
+
+    @classmethod
+    def parse(cls, fields: str | None) -> FieldProjection | None:
+        if not fields:
+            return None
+        question_fields: set[str] = {"id"}
+        option_fields: set[str] = set()
+        for item in fields.split(","):
+            name = item.strip()
+            if not name:
+                continue
+            if name.startswith("options."):
+                option_fields.add(name[len("options."):])
+                continue
+            question_fields.add(name)
+        if option_fields:
+            option_fields.add("value")
+        return cls(question_fields, option_fields)
+
+    @property
+    def key(self) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        """Canonical form for cache keys: spelling, order and repeats in ``fields`` do not matter."""
+        return tuple(sorted(self.question_fields)), tuple(sorted(self.option_fields))
+
+    def question(self, raw: dict[str, Any]) -> dict[str, Any]:
+        projected = {key: value for key, value in raw.items() if key in self.question_fields}
+        if self.option_fields and "options" not in self.question_fields and raw.get("options") is not None:
+            projected["options"] = [
+                {key: value for key, value in option.items() if key in self.option_fields}
+                for option in raw["options"]
+            ]
+        return projected
+
+    def module(self, payload: dict[str, Any] | None) -> dict[str, Any] | None:
+        if payload is None:
+            return None
+        projected = {**payload, "questions": [self.question(q) for q in payload.get("questions") or []]}
+        lookahead = payload.get("lookahead")
+        if lookahead:
+            projected["lookahead"] = {
+                **lookahead,
+                "options": [{**branch, "module": self.module(branch.get("module"))} for branch in lookahead["options"]],
+            }
+        return projected
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import Request, Response
+
+from ..infra.serialization import MSGPACK_MEDIA_TYPES, encode_json, encode_msgpack, msgpack_available
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return msgpack_available() and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def payload_response(request: Request, payload: dict[str, Any], status_code: int = 200) -> Response:
+    headers = {"Vary": "Accept"}
+    if wants_msgpack(request):
+        return Response(
+            content=encode_msgpack(payload), status_code=status_code, media_type="application/msgpack", headers=headers
+        )
+    return Response(
+        content=encode_json(payload), status_code=status_code, media_type="application/json", headers=headers
+    )
@@ -1,8 +1,16 @@
 from fastapi import APIRouter
 
+from .admin import router as admin_router
 from .health import router as health_router
+from .jobs import router as jobs_router
+from .metrics import router as metrics_router
+from .portfolio import router as portfolio_router
 from .questionnaire import router as questionnaire_router
 
 router = APIRouter()
 router.include_router(questionnaire_router)
 router.include_router(health_router)
+router.include_router(metrics_router)
+router.include_router(jobs_router)
+router.include_router(portfolio_router)
+router.include_router(admin_router)
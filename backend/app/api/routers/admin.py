@@ -0,0 +1,75 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ..schemas import AnalyticsResponse, OwnerTokenResponse, RuleProfileResponse
+from ...container import get_portfolio, get_service
+from ...infra.export import chunked, export_sessions, gzip_chunks
+from ...services.portfolio import Portfolio
+from ...services.questionnaire import QuestionnaireService
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    expected = os.environ.get("ADMIN_TOKEN", "")
+    if not expected:
+        raise HTTPException(status_code=403, detail="admin_disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="admin_token_invalid")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/rules/profile", response_model=RuleProfileResponse)
+def rule_profile(lang: str | None = None, service: QuestionnaireService = Depends(get_service)) -> dict:
+    return service.rule_profile(lang)
+
+
+@router.post("/rules/profile/enable", response_model=RuleProfileResponse)
+def enable_rule_profile(
+    enabled: bool = True, lang: str | None = None, service: QuestionnaireService = Depends(get_service)
+) -> dict:
+    service.set_rule_profiling(enabled)
+    return service.rule_profile(lang)
+
+
+@router.post("/rules/profile/reset", response_model=RuleProfileResponse)
+def reset_rule_profile(lang: str | None = None, service: QuestionnaireService = Depends(get_service)) -> dict:
+    service.reset_rule_profile()
+    return service.rule_profile(lang)
+
+
+@router.post("/rules/profile/dump", response_model=RuleProfileResponse)
+def dump_rule_profile(lang: str | None = None, service: QuestionnaireService = Depends(get_service)) -> dict:
+    return service.dump_rule_profile(lang)
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+def analytics(
+    lang: str | None = None, flush: bool = False, service: QuestionnaireService = Depends(get_service)
+) -> dict:
+    return service.analytics_report(lang, flush)
+
+
+@router.get("/sessions/export")
+def export_session_store(
+    compress: bool = False,
+    batch_size: int = Query(default=500, ge=1, le=10000),
+    service: QuestionnaireService = Depends(get_service),
+) -> StreamingResponse:
+    # A sync generator: Starlette iterates it in the thread pool, so SCAN/MGET round trips never block the loop.
+    body = chunked(export_sessions(service.store, batch_size))
+    if compress:
+        return StreamingResponse(
+            gzip_chunks(body),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="sessions.ndjson.gz"'},
+        )
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+
+@router.post("/portfolio/{owner}/token", response_model=OwnerTokenResponse)
+def issue_owner_token(owner: str, portfolio: Portfolio = Depends(get_portfolio)) -> dict:
+    return {"owner": owner, "token": portfolio.issue_token(owner)}
@@ -0,0 +1,51 @@
+import os
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from ..schemas import JobStatusResponse
+from ...container import get_jobs
+from ...services.jobs import BulkJobs
+
+router = APIRouter(prefix="/jobs")
+
+
+@router.post("", status_code=202, response_model=JobStatusResponse)
+async def create_job(
+    request: Request,
+    format: Literal["csv", "jsonl"] | None = None,
+    lang: str = "en",
+    jobs: BulkJobs = Depends(get_jobs),
+) -> dict:
+    max_bytes = int(os.environ.get("JOBS_MAX_BYTES", "") or 20 * 1024 * 1024)
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise HTTPException(status_code=413, detail={"job_body_too_large": True, "max_bytes": max_bytes})
+    body = await request.body()
+    if len(body) > max_bytes:
+        raise HTTPException(status_code=413, detail={"job_body_too_large": True, "max_bytes": max_bytes})
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    # Parsing and writing the rows to the store happen off the event loop.
+    return await run_in_threadpool(jobs.create, body, fmt, lang)
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+def job_status(job_id: str, jobs: BulkJobs = Depends(get_jobs)) -> dict:
+    return jobs.status(job_id)
+
+
+@router.get("/{job_id}/results")
+def job_results(
+    job_id: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    follow: bool = True,
+    jobs: BulkJobs = Depends(get_jobs),
+) -> StreamingResponse:
+    jobs.status(job_id)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        jobs.iter_results(job_id, format, follow),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="job_{job_id}.{format}"'},
+    )
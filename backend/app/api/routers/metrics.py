@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+
+from ...infra.metrics import CONTENT_TYPE, metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Header, Query
+
+from ..schemas import AssessmentResponse, PortfolioPageResponse, PortfolioSummaryResponse
+from ...container import get_portfolio
+from ...services.portfolio import Portfolio
+from ...services.questionnaire import normalize_lang
+
+
+def require_owner(
+    owner: str, x_owner_token: str | None = Header(default=None), portfolio: Portfolio = Depends(get_portfolio)
+) -> None:
+    portfolio.authorize(owner, x_owner_token)
+
+
+router = APIRouter(prefix="/portfolio", dependencies=[Depends(require_owner)])
+
+
+@router.get("/{owner}/assessments", response_model=PortfolioPageResponse)
+def list_assessments(
+    owner: str,
+    lang: str | None = None,
+    risk_level: str | None = None,
+    type: str | None = None,
+    role: str | None = None,
+    completed_after: float | None = None,
+    completed_before: float | None = None,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    portfolio: Portfolio = Depends(get_portfolio),
+) -> dict:
+    return portfolio.page(
+        owner,
+        normalize_lang(lang) if lang else None,
+        risk_level,
+        type,
+        role,
+        completed_after,
+        completed_before,
+        offset,
+        limit,
+    )
+
+
+@router.get("/{owner}/summary", response_model=PortfolioSummaryResponse)
+def portfolio_summary(owner: str, portfolio: Portfolio = Depends(get_portfolio)) -> dict:
+    return portfolio.summary(owner)
+
+
+@router.put("/{owner}/assessments/{session_id}", response_model=AssessmentResponse)
+def claim_assessment(owner: str, session_id: str, portfolio: Portfolio = Depends(get_portfolio)) -> dict:
+    return portfolio.claim(owner, session_id)
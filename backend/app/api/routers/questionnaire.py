@@ -1,6 +1,25 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Request, Response
 
-from ..schemas import ModuleResponse, QuestionResponse, ResultResponse, StartResponse, SubmitAnswerRequest, SubmitResponse
+from ..http_cache import cached_json_response
+from ..projection import FieldProjection
+from ..responses import payload_response
+from ..schemas import (
+    BackRequest,
+    BackResponse,
+    CompareResponse,
+    ForkRequest,
+    ForkResponse,
+    HistoryResponse,
+    ModuleResponse,
+    QuestionResponse,
+    ResultResponse,
+    RuleBundleResponse,
+    SensitivityResponse,
+    SessionStateResponse,
+    StartResponse,
+    SubmitAnswerRequest,
+    SubmitResponse,
+)
 from ...container import get_service
 from ...services.questionnaire import QuestionnaireService
 
@@ -8,43 +27,192 @@ router = APIRouter()
 
 
 @router.post("/start", response_model=StartResponse)
-def start(lang: str = "en", service: QuestionnaireService = Depends(get_service)) -> StartResponse:
-    session_id, module = service.start(lang)
-    return StartResponse(session_id=session_id, module=module)
+def start(
+    request: Request,
+    lang: str = "en",
+    lookahead: bool = False,
+    fields: str | None = None,
+    owner: str | None = None,
+    x_owner_token: str | None = Header(default=None),
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    session_id, module = service.start(lang, lookahead, owner, x_owner_token)
+    projection = FieldProjection.parse(fields)
+    return payload_response(
+        request,
+        {
+            "session_id": session_id,
+            "module": projection.module(module) if projection else module,
+            "revision": 0,
+            "engine_version": service.engine_version(lang),
+        },
+    )
 
 
 @router.get("/module/{module_id}", response_model=ModuleResponse)
 def get_module(
-    module_id: str, session_id: str, lang: str | None = None, service: QuestionnaireService = Depends(get_service)
-) -> ModuleResponse:
-    module = service.get_module(session_id, module_id, lang)
-    return ModuleResponse(module=module)
+    request: Request,
+    module_id: str,
+    session_id: str,
+    lang: str | None = None,
+    lookahead: bool = False,
+    fields: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    module = service.get_module(session_id, module_id, lang, lookahead)
+    projection = FieldProjection.parse(fields)
+    return payload_response(request, {"module": projection.module(module) if projection else module})
 
 
 @router.post("/submit-answer", response_model=SubmitResponse)
 def submit_answer(
-    req: SubmitAnswerRequest, lang: str | None = None, service: QuestionnaireService = Depends(get_service)
-) -> SubmitResponse:
-    payload = service.submit_answer(req.session_id, req.module_id, req.answers, req.replace, lang)
-    return SubmitResponse(
-        session_id=payload["session_id"],
-        parameters=payload["parameters"],
-        next=payload["next"],
-        module_complete=payload["module_complete"],
-        module=payload["module"],
-        conclusion=payload["conclusion"],
+    request: Request,
+    req: SubmitAnswerRequest,
+    lang: str | None = None,
+    lookahead: bool = False,
+    fields: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    payload = service.submit_answer(
+        req.session_id,
+        req.module_id,
+        req.answers,
+        req.replace,
+        lang,
+        lookahead,
+        removed=req.removed,
+        base_revision=req.base_revision,
+        parameters_mode=req.parameters_mode,
+    )
+    projection = FieldProjection.parse(fields)
+    return payload_response(
+        request,
+        {
+            "session_id": payload["session_id"],
+            "revision": payload["revision"],
+            "pruned": payload["pruned"],
+            "parameters": payload["parameters"],
+            "parameters_base": payload["parameters_base"],
+            "next": payload["next"],
+            "module_complete": payload["module_complete"],
+            "module": projection.module(payload["module"]) if projection else payload["module"],
+            "conclusion": payload["conclusion"],
+        },
     )
 
 
 @router.get("/result", response_model=ResultResponse)
 def result(
-    session_id: str, lang: str | None = None, service: QuestionnaireService = Depends(get_service)
-) -> ResultResponse:
-    parameters, conclusion = service.result(session_id, lang)
-    return ResultResponse(parameters=parameters, conclusion=conclusion)
+    request: Request, session_id: str, lang: str | None = None, service: QuestionnaireService = Depends(get_service)
+) -> Response:
+    parameters, conclusion, revision = service.result(session_id, lang)
+    return payload_response(request, {"parameters": parameters, "conclusion": conclusion, "revision": revision})
+
+
+@router.post("/back", response_model=BackResponse)
+def back(
+    request: Request,
+    req: BackRequest,
+    lang: str | None = None,
+    fields: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    payload = service.back(req.session_id, req.steps, req.base_revision, lang)
+    projection = FieldProjection.parse(fields)
+    if projection and payload["module"]:
+        payload["module"] = projection.module(payload["module"])
+    return payload_response(request, payload)
+
+
+@router.get("/history", response_model=HistoryResponse)
+def history(request: Request, session_id: str, service: QuestionnaireService = Depends(get_service)) -> Response:
+    return payload_response(request, service.history(session_id))
+
+
+@router.get("/session", response_model=SessionStateResponse)
+def session_state(
+    request: Request,
+    session_id: str,
+    lang: str | None = None,
+    fields: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    payload = service.state(session_id, lang)
+    projection = FieldProjection.parse(fields)
+    if projection and payload["module"]:
+        payload["module"] = projection.module(payload["module"])
+    return payload_response(request, payload)
+
+
+@router.post("/fork", response_model=ForkResponse)
+def fork(
+    request: Request,
+    req: ForkRequest,
+    lookahead: bool = False,
+    fields: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    session, module = service.fork(req.session_id, req.module_id, lookahead)
+    projection = FieldProjection.parse(fields)
+    return payload_response(
+        request,
+        {
+            "session_id": session.id,
+            "parent_id": session.parent_id,
+            "module": projection.module(module) if projection else module,
+            "revision": session.revision,
+            "engine_version": service.engine_version(session.lang),
+        },
+    )
+
+
+@router.get("/compare", response_model=CompareResponse)
+def compare(
+    request: Request,
+    session_id: str,
+    other_id: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    return payload_response(request, service.compare(session_id, other_id))
+
+
+@router.get("/sensitivity", response_model=SensitivityResponse)
+def sensitivity(
+    request: Request, session_id: str, lang: str | None = None, service: QuestionnaireService = Depends(get_service)
+) -> Response:
+    return payload_response(request, service.sensitivity(session_id, lang))
 
 
 @router.get("/question/{question_id}", response_model=QuestionResponse)
-def get_question(question_id: str, lang: str | None = None, service: QuestionnaireService = Depends(get_service)) -> QuestionResponse:
-    question = service.get_question(question_id, lang)
-    return QuestionResponse(question=question)
+def get_question(
+    request: Request,
+    question_id: str,
+    lang: str | None = None,
+    fields: str | None = None,
+    v: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    projection = FieldProjection.parse(fields)
+
+    def build(lang_value: str) -> dict:
+        question = service.get_question(question_id, lang_value)
+        return QuestionResponse(question=projection.question(question) if projection else question).model_dump()
+
+    version, content = service.cached_content(
+        lang, ("question", question_id, projection.key if projection else None), build
+    )
+    return cached_json_response(request, content, v, version)
+
+
+@router.get("/rules/bundle", response_model=RuleBundleResponse)
+def rule_bundle(
+    request: Request,
+    lang: str | None = None,
+    v: str | None = None,
+    service: QuestionnaireService = Depends(get_service),
+) -> Response:
+    def build(lang_value: str) -> dict:
+        return RuleBundleResponse(bundle=service.rule_bundle(lang_value)).model_dump()
+
+    version, content = service.cached_content(lang, ("rules_bundle",), build)
+    return cached_json_response(request, content, v, version)
@@ -8,6 +8,8 @@ from pydantic import BaseModel, Field
 class StartResponse(BaseModel):
     session_id: str
     module: dict[str, Any]
+    revision: int = 0
+    engine_version: str | None = None
 
 
 class ModuleResponse(BaseModel):
@@ -19,6 +21,9 @@ class SubmitAnswerRequest(BaseModel):
     module_id: str | None = None
     answers: dict[str, Any] = Field(default_factory=dict)
     replace: bool = False
+    removed: list[str] = Field(default_factory=list)
+    base_revision: int | None = None
+    parameters_mode: Literal["full", "diff"] = "full"
 
 
 class NextAction(BaseModel):
@@ -29,7 +34,10 @@ class NextAction(BaseModel):
 
 class SubmitResponse(BaseModel):
     session_id: str
+    revision: int
+    pruned: list[str] = Field(default_factory=list)
     parameters: dict[str, Any]
+    parameters_base: int | None = None
     next: NextAction
     module_complete: bool
     module: dict[str, Any] | None = None
@@ -39,7 +47,161 @@ class SubmitResponse(BaseModel):
 class ResultResponse(BaseModel):
     parameters: dict[str, Any]
     conclusion: dict[str, Any] | None = None
+    revision: int
+
+
+class BackRequest(BaseModel):
+    session_id: str
+    steps: int = Field(default=1, ge=1)
+    base_revision: int | None = None
+
+
+class BackResponse(BaseModel):
+    session_id: str
+    revision: int
+    restored: Literal["snapshot", "recomputed"]
+    history: int
+    answers: dict[str, Any]
+    parameters: dict[str, Any]
+    module_id: str | None = None
+    module: dict[str, Any] | None = None
+    conclusion: dict[str, Any] | None = None
+
+
+class SessionStateResponse(BaseModel):
+    session_id: str
+    revision: int
+    history: int
+    answers: dict[str, Any]
+    parameters: dict[str, Any]
+    module_id: str | None = None
+    module: dict[str, Any] | None = None
+    conclusion: dict[str, Any] | None = None
+
+
+class HistoryStep(BaseModel):
+    steps: int
+    revision: int
+    module_id: str | None = None
+    question_ids: list[str]
+
+
+class HistoryResponse(BaseModel):
+    session_id: str
+    revision: int
+    steps: list[HistoryStep]
+
+
+class ForkRequest(BaseModel):
+    session_id: str
+    module_id: str
+
+
+class ForkResponse(BaseModel):
+    session_id: str
+    parent_id: str
+    module: dict[str, Any]
+    revision: int = 0
+    engine_version: str | None = None
+
+
+class CompareSide(BaseModel):
+    session_id: str
+    parent_id: str | None = None
+    revision: int
+    current_module_id: str | None = None
+    conclusion: dict[str, Any] | None = None
+
+
+class CompareResponse(BaseModel):
+    session: CompareSide
+    other: CompareSide
+    differences: dict[str, dict[str, Any]]
+    answers: dict[str, list[str]]
+
+
+class SensitivityAlternative(BaseModel):
+    value: Any
+    flips: dict[str, dict[str, Any]]
+    conclusion: dict[str, Any]
+    hides: list[str] = Field(default_factory=list)
+    reveals: list[str] = Field(default_factory=list)
+
+
+class SensitivityQuestion(BaseModel):
+    question_id: str
+    value: Any
+    flips: list[str]
+    alternatives: list[SensitivityAlternative]
+
+
+class SensitivityResponse(BaseModel):
+    session_id: str
+    fingerprint: str
+    conclusion: dict[str, Any]
+    evaluations: int
+    drivers: list[dict[str, Any]]
+    questions: list[SensitivityQuestion]
 
 
 class QuestionResponse(BaseModel):
     question: dict[str, Any]
+
+
+class RuleBundleResponse(BaseModel):
+    bundle: dict[str, Any]
+
+
+class AnalyticsResponse(BaseModel):
+    flushed_at: float | None = None
+    languages: dict[str, Any]
+
+
+class JobStatusResponse(BaseModel):
+    id: str
+    status: Literal["queued", "running", "done", "failed"]
+    format: str
+    total: int
+    done: int
+    errors: int
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+
+
+class AssessmentResponse(BaseModel):
+    id: str
+    owner: str
+    lang: str
+    Risk_level: str | None = None
+    Type: str | None = None
+    Role: str | None = None
+    completed_at: float | None = None
+    first_completed_at: float | None = None
+    revision: int = 0
+    conclusion: dict[str, Any] | None = None
+
+
+class PortfolioPageResponse(BaseModel):
+    total: int
+    offset: int
+    items: list[AssessmentResponse]
+
+
+class OwnerTokenResponse(BaseModel):
+    owner: str
+    token: str
+
+
+class PortfolioSummaryResponse(BaseModel):
+    owner: str
+    total: int
+    facets: dict[str, dict[str, int]]
+
+
+class RuleProfileResponse(BaseModel):
+    enabled: bool
+    lang: str
+    profile: dict[str, Any]
+    path: str | None = None
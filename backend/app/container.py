@@ -1,7 +1,12 @@
+import os
+
 from .config import DATA_DIR_CN, DATA_DIR_EN
+from .infra.content_cache import ContentCache
 from .infra.loader import EngineLoader
 from .infra.store import SessionStore
 from .logic.evaluator import Evaluator
+from .services.jobs import BulkJobs
+from .services.portfolio import Portfolio
 from .services.questionnaire import QuestionnaireService
 
 loaders = {
@@ -10,8 +15,22 @@ loaders = {
 }
 evaluator = Evaluator()
 store = SessionStore()
-service = QuestionnaireService(loaders, evaluator, store)
+store.register_metrics()
+content_cache = ContentCache()
+portfolio = Portfolio(store)
+service = QuestionnaireService(loaders, evaluator, store, content_cache, portfolio=portfolio)
+jobs = BulkJobs(store)
+if os.environ.get("RULE_PROFILING", "").lower() in {"1", "true", "yes"}:
+    service.set_rule_profiling(True)
 
 
 def get_service() -> QuestionnaireService:
     return service
+
+
+def get_jobs() -> BulkJobs:
+    return jobs
+
+
+def get_portfolio() -> Portfolio:
+    return portfolio
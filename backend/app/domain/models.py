@@ -11,12 +11,21 @@ class QuestionDef:
     dependency: str | None
     options: list[dict[str, Any]] | None
     raw: dict[str, Any]
+    dependency_id: str = ""
+
+
+@dataclass
+class TemplateDef:
+    source: str
+    segments: list[tuple[str, str]]
+    placeholders: list[str]
 
 
 @dataclass
 class VariableRuleDef:
     condition: str
     value: Any
+    rule_id: str = ""
 
 
 @dataclass
@@ -33,6 +42,7 @@ class RouterRuleDef:
     action: str
     target_module_id: str | None
     message: str | None
+    rule_id: str = ""
 
 
 @dataclass
@@ -53,6 +63,23 @@ class Engine:
     modules_by_id: dict[str, ModuleDef]
     questions_by_id: dict[str, QuestionDef]
     constants: dict[str, Any] = field(default_factory=dict)
+    templates: dict[str, TemplateDef] = field(default_factory=dict)
+    templated_params: list[str] = field(default_factory=list)
+    version: str = ""
+
+
+@dataclass(frozen=True)
+class SessionBase:
+    id: str
+    lang: str
+    version: str
+    module_id: str
+    module_index: int
+    answers: dict[str, Any]
+    # ``parameters`` is the prefix evaluation that forks resume from; ``rendered`` is the full parameter set
+    # (later modules and templates included) of a fork that has not changed anything yet, which forks diff against.
+    parameters: dict[str, Any]
+    rendered: dict[str, Any]
 
 
 @dataclass
@@ -63,3 +90,10 @@ class Session:
     current_module_id: str | None = None
     lang: str = "en"
     conclusion: dict[str, Any] | None = None
+    revision: int = 0
+    owner: str | None = None
+    parent_id: str | None = None
+    base: SessionBase | None = None
+    history: list[dict[str, Any]] = field(default_factory=list)
+    # Funnel events (``kind|name``) already counted for this session, so revisits are not counted again.
+    funnel: set[str] = field(default_factory=set)
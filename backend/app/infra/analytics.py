@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from .store import SessionStore
+from ..domain.models import Session
+
+COUNTERS_NAME = "analytics"
+CONCLUSION_FIELDS = ("Risk_level", "Type", "Role")
+
+
+class _Shard:
+    __slots__ = ("lock", "values")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.values: dict[str, int] = {}
+
+
+class ShardedCounter:
+    """Counters spread over shards; each thread sticks to one shard, so increments rarely share a lock."""
+
+    def __init__(self, shards: int = 16) -> None:
+        self._shards = [_Shard() for _ in range(shards)]
+        self._next = itertools.count()
+        self._local = threading.local()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._next) % len(self._shards)]
+        return shard
+
+    def inc(self, key: str, amount: int = 1) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.values[key] = shard.values.get(key, 0) + amount
+
+    def merge(self, deltas: dict[str, int]) -> None:
+        for key, amount in deltas.items():
+            self.inc(key, amount)
+
+    def snapshot(self) -> dict[str, int]:
+        merged: dict[str, int] = {}
+        for shard in self._shards:
+            with shard.lock:
+                items = list(shard.values.items())
+            for key, amount in items:
+                merged[key] = merged.get(key, 0) + amount
+        return merged
+
+    def drain(self) -> dict[str, int]:
+        merged: dict[str, int] = {}
+        for shard in self._shards:
+            with shard.lock:
+                values, shard.values = shard.values, {}
+            for key, amount in values.items():
+                merged[key] = merged.get(key, 0) + amount
+        return merged
+
+
+class FunnelAnalytics:
+    """Funnel aggregates kept as O(1) counter increments and periodically added to the session store.
+
+    Keys are ``lang|kind|name``: ``started``, ``completed``, ``module`` (sessions that reached a module),
+    ``shown``/``answered`` per question, and one kind per conclusion field for the result distribution.
+
+    Each event counts once per session: the event methods mark it in ``session.funnel`` and return the keys
+    that are new, which the caller passes to :meth:`count` once the session (and its marks) is saved."""
+
+    def __init__(self, store: SessionStore) -> None:
+        self._logger = logging.getLogger("aiq.analytics")
+        self.store = store
+        self.counters = ShardedCounter()
+        self._flush_interval = float(os.environ.get("ANALYTICS_FLUSH_SECONDS", "10") or 10)
+        self._flusher: threading.Thread | None = None
+        self._flush_lock = threading.Lock()
+        self.flushed_at: float | None = None
+
+    def session_started(self, session: Session, lang: str, module_id: str | None) -> list[str]:
+        return self._new(session, lang, [("started", ""), *([("module", module_id)] if module_id else [])])
+
+    def module_reached(self, session: Session, lang: str, module_id: str) -> list[str]:
+        return self._new(session, lang, [("module", module_id)])
+
+    def question_shown(
+        self, session: Session, lang: str, payload: dict[str, Any] | None, answers: dict[str, Any]
+    ) -> list[str]:
+        questions = (payload or {}).get("questions") or []
+        if questions and str(questions[0].get("id")) not in answers:
+            return self._new(session, lang, [("shown", str(questions[0].get("id")))])
+        return []
+
+    def questions_answered(self, session: Session, lang: str, question_ids: list[str]) -> list[str]:
+        # A question answered before it was the current one (several per submit, or out of turn) was still
+        # shown, so answered never exceeds shown.
+        return self._new(session, lang, [(kind, qid) for qid in question_ids for kind in ("shown", "answered")])
+
+    def completed(self, session: Session, lang: str, conclusion: dict[str, Any]) -> list[str]:
+        keys = self._new(session, lang, [("completed", "")])
+        if keys:
+            keys.extend(f"{lang}|{name}|{conclusion.get(name)}" for name in CONCLUSION_FIELDS)
+        return keys
+
+    @staticmethod
+    def _new(session: Session, lang: str, events: list[tuple[str, str]]) -> list[str]:
+        keys = []
+        for kind, name in events:
+            event = f"{kind}|{name}"
+            if event not in session.funnel:
+                session.funnel.add(event)
+                keys.append(f"{lang}|{event}")
+        return keys
+
+    def count(self, keys: list[str]) -> None:
+        for key in keys:
+            self.counters.inc(key)
+
+    def start_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="aiq-analytics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self._flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                self._logger.exception("analytics_flush_failed backend=%s", self.store.backend)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            deltas = self.counters.drain()
+            if deltas:
+                try:
+                    self.store.add_counters(COUNTERS_NAME, deltas)
+                except Exception:
+                    # Keep the increments for the next attempt rather than losing them.
+                    self.counters.merge(deltas)
+                    raise
+            self.flushed_at = time.time()
+        self._logger.debug("analytics_flush keys=%d", len(deltas))
+        return len(deltas)
+
+    def totals(self) -> dict[str, int]:
+        """Flushed totals (across workers when the store is Redis) plus this worker's pending increments."""
+        totals = self.store.read_counters(COUNTERS_NAME)
+        for key, amount in self.counters.snapshot().items():
+            totals[key] = totals.get(key, 0) + amount
+        return totals
+
+    def report(self, lang: str | None = None) -> dict[str, Any]:
+        languages: dict[str, dict[str, Any]] = {}
+        for key, amount in self.totals().items():
+            key_lang, kind, name = key.split("|", 2)
+            if lang and key_lang != lang:
+                continue
+            entry = languages.setdefault(
+                key_lang,
+                {"started": 0, "completed": 0, "modules": {}, "questions": {}, "conclusions": {}},
+            )
+            if kind in {"started", "completed"}:
+                entry[kind] += amount
+            elif kind == "module":
+                entry["modules"][name] = entry["modules"].get(name, 0) + amount
+            elif kind in {"shown", "answered"}:
+                question = entry["questions"].setdefault(name, {"shown": 0, "answered": 0})
+                question[kind] += amount
+            else:
+                field = entry["conclusions"].setdefault(kind, {})
+                field[name] = field.get(name, 0) + amount
+        return {"flushed_at": self.flushed_at, "languages": {key: _funnel(entry) for key, entry in languages.items()}}
+
+
+def _funnel(entry: dict[str, Any]) -> dict[str, Any]:
+    started = entry["started"]
+    questions = []
+    for qid, counts in entry["questions"].items():
+        abandoned = counts["shown"] - counts["answered"]
+        questions.append(
+            {
+                "question_id": qid,
+                "shown": counts["shown"],
+                "answered": counts["answered"],
+                "abandoned": abandoned,
+                "abandon_rate": abandoned / counts["shown"] if counts["shown"] else 0.0,
+            }
+        )
+    questions.sort(key=lambda row: (-row["abandoned"], row["question_id"]))
+    modules = [
+        {"module_id": module_id, "reached": reached, "reach_rate": reached / started if started else 0.0}
+        for module_id, reached in sorted(entry["modules"].items(), key=lambda item: (-item[1], item[0]))
+    ]
+    return {
+        "started": started,
+        "completed": entry["completed"],
+        "completion_rate": entry["completed"] / started if started else 0.0,
+        "modules": modules,
+        "questions": questions,
+        "conclusions": {
+            name: dict(sorted(values.items(), key=lambda item: -item[1]))
+            for name, values in entry["conclusions"].items()
+        },
+    }
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+from .metrics import CACHE_REQUESTS
+from .serialization import encode_json
+
+
+@dataclass
+class EncodedContent:
+    etag: str
+    body: bytes
+
+
+class ContentCache:
+    """Encoded responses per language for the current engine version; keys partly come from query strings, so
+    each version keeps at most ``CONTENT_CACHE_ENTRIES`` of them, least recently used dropped first."""
+
+    def __init__(self, max_entries: int | None = None) -> None:
+        env_size = os.environ.get("CONTENT_CACHE_ENTRIES", "")
+        self._max_entries = max_entries or (int(env_size) if env_size.isdigit() else 1024)
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[str, OrderedDict[Hashable, EncodedContent]]] = {}
+
+    def get(self, lang: str, version: str, key: Hashable, build: Callable[[], Any]) -> EncodedContent:
+        with self._lock:
+            entry = self._entries.get(lang)
+            if entry and entry[0] == version and key in entry[1]:
+                entry[1].move_to_end(key)
+                CACHE_REQUESTS.inc(cache="content", result="hit")
+                return entry[1][key]
+        CACHE_REQUESTS.inc(cache="content", result="miss")
+        body = encode_json(build())
+        content = EncodedContent(etag=f'"{version}-{lang}-{hashlib.sha1(body).hexdigest()[:12]}"', body=body)
+        with self._lock:
+            entry = self._entries.get(lang)
+            if not entry or entry[0] != version:
+                entry = (version, OrderedDict())
+                self._entries[lang] = entry
+            entry[1][key] = content
+            while len(entry[1]) > self._max_entries:
+                entry[1].popitem(last=False)
+        return content
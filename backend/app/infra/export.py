@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import logging
+import time
+import zlib
+from typing import Iterable, Iterator
+
+from .store import SessionStore
+
+CHUNK_BYTES = 64 * 1024
+
+_logger = logging.getLogger("aiq.export")
+
+
+def export_sessions(
+    store: SessionStore, batch_size: int = 500, progress_seconds: float = 5.0
+) -> Iterator[bytes]:
+    """NDJSON lines, one per stored session, logging progress every ``progress_seconds``."""
+    started = last_report = time.perf_counter()
+    exported = 0
+    _logger.info("session_export_start backend=%s batch_size=%d", store.backend, batch_size)
+    for raw in store.iter_dumps(batch_size):
+        yield raw.encode("utf-8") + b"\n"
+        exported += 1
+        now = time.perf_counter()
+        if now - last_report >= progress_seconds:
+            last_report = now
+            elapsed = now - started
+            _logger.info("session_export exported=%d elapsed_s=%.1f rate=%.0f/s", exported, elapsed, exported / elapsed)
+    _logger.info("session_export_done exported=%d elapsed_s=%.1f", exported, time.perf_counter() - started)
+
+
+def chunked(lines: Iterable[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    buffer: list[bytes] = []
+    buffered = 0
+    for line in lines:
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Streaming gzip: output can be written or sent as it is produced."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
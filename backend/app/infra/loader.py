@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import re
 import time
 from pathlib import Path
@@ -7,7 +8,10 @@ from typing import Any
 
 import yaml
 
-from ..domain.models import Engine, ModuleDef, QuestionDef, RouterRuleDef, VariableDef, VariableRuleDef
+from .metrics import CACHE_REQUESTS, ENGINE_RELOAD_DURATION, ENGINE_RELOADS
+from ..domain.models import Engine, ModuleDef, QuestionDef, RouterRuleDef, TemplateDef, VariableDef, VariableRuleDef
+
+_TEMPLATE_PATTERN = re.compile(r"\{\{\s*([A-Za-z0-9_.\-]+)\s*\}\}")
 
 
 class EngineLoader:
@@ -20,12 +24,17 @@ class EngineLoader:
     def get_engine(self) -> Engine:
         now = time.time()
         if self._cache and self._cache_ttl_seconds > 0 and (now - self._last_checked) < self._cache_ttl_seconds:
+            CACHE_REQUESTS.inc(cache="engine", result="hit")
             return self._cache[1]
         signature = tuple(sorted((p.name, p.stat().st_mtime) for p in self.data_dir.glob("*.yaml")))
         self._last_checked = now
         if self._cache and self._cache[0] == signature:
+            CACHE_REQUESTS.inc(cache="engine", result="hit")
             return self._cache[1]
-        engine = self._load_engine()
+        CACHE_REQUESTS.inc(cache="engine", result="miss")
+        with ENGINE_RELOAD_DURATION.time(source=self.data_dir.name):
+            engine = self._load_engine()
+        ENGINE_RELOADS.inc(source=self.data_dir.name)
         self._cache = (signature, engine)
         return engine
 
@@ -40,8 +49,11 @@ class EngineLoader:
             constants = const_raw.get("constants") if isinstance(const_raw, dict) else {}
         modules: list[ModuleDef] = []
         questions_by_id: dict[str, QuestionDef] = {}
+        digest = hashlib.sha256()
         for path in files:
             raw_text = path.read_text(encoding="utf-8")
+            digest.update(path.name.encode("utf-8"))
+            digest.update(raw_text.encode("utf-8"))
             raw_text = raw_text.replace("[cite_end]", "")
             raw_text = re.sub(r"\[cite:[^\]]*\]", "", raw_text)
             raw = yaml.safe_load(raw_text) or {}
@@ -63,6 +75,7 @@ class EngineLoader:
                         dependency=q.get("dependency"),
                         options=q.get("options"),
                         raw=q,
+                        dependency_id=f"{module_id}/dependency/{qid}",
                     )
                 )
             questions_by_id_local = {q.id: q for q in questions}
@@ -74,8 +87,12 @@ class EngineLoader:
                     continue
                 rules_raw = var.get("rules") or []
                 rules = [
-                    VariableRuleDef(condition=str(rule.get("condition") or ""), value=rule.get("value"))
-                    for rule in rules_raw
+                    VariableRuleDef(
+                        condition=str(rule.get("condition") or ""),
+                        value=rule.get("value"),
+                        rule_id=f"{module_id}/variable/{name}/{index}",
+                    )
+                    for index, rule in enumerate(rules_raw)
                 ]
                 variables.append(
                     VariableDef(
@@ -87,7 +104,7 @@ class EngineLoader:
                 )
             router_raw = raw.get("router") or []
             router: list[RouterRuleDef] = []
-            for rule in router_raw:
+            for index, rule in enumerate(router_raw):
                 target_module_id = None
                 if "target_module_id" in rule:
                     target_module_id = str(rule.get("target_module_id"))
@@ -99,6 +116,7 @@ class EngineLoader:
                         action=str(rule.get("action") or ""),
                         target_module_id=target_module_id,
                         message=rule.get("message"),
+                        rule_id=f"{module_id}/router/{index}",
                     )
                 )
             modules.append(
@@ -116,7 +134,60 @@ class EngineLoader:
             questions_by_id.update(questions_by_id_local)
         modules.sort(key=lambda m: m.module_num)
         modules_by_id = {m.module_id: m for m in modules}
-        return Engine(modules=modules, modules_by_id=modules_by_id, questions_by_id=questions_by_id, constants=constants)
+        templates, templated_params = self._compile_templates(modules, constants)
+        return Engine(
+            modules=modules,
+            modules_by_id=modules_by_id,
+            questions_by_id=questions_by_id,
+            constants=constants,
+            templates=templates,
+            templated_params=templated_params,
+            version=digest.hexdigest()[:16],
+        )
+
+    def _compile_templates(
+        self, modules: list[ModuleDef], constants: dict[str, Any]
+    ) -> tuple[dict[str, TemplateDef], list[str]]:
+        templates: dict[str, TemplateDef] = {}
+        templated_params: list[str] = []
+        sources: list[tuple[str, list[Any]]] = [(name, [value]) for name, value in constants.items()]
+        for module in modules:
+            for variable in module.variables:
+                values = [variable.initial_value] + [rule.value for rule in variable.rules]
+                sources.append((variable.name, values))
+        for name, values in sources:
+            found = False
+            for value in values:
+                for item in value if isinstance(value, list) else [value]:
+                    if not isinstance(item, str):
+                        continue
+                    if item not in templates:
+                        template = self._parse_template(item)
+                        if template is None:
+                            continue
+                        templates[item] = template
+                    found = True
+            if found and name not in templated_params:
+                templated_params.append(name)
+        return templates, templated_params
+
+    @staticmethod
+    def _parse_template(text: str) -> TemplateDef | None:
+        segments: list[tuple[str, str]] = []
+        placeholders: list[str] = []
+        pos = 0
+        for match in _TEMPLATE_PATTERN.finditer(text):
+            if match.start() > pos:
+                segments.append(("literal", text[pos:match.start()]))
+            segments.append(("placeholder", match.group(1)))
+            if match.group(1) not in placeholders:
+                placeholders.append(match.group(1))
+            pos = match.end()
+        if not placeholders:
+            return None
+        if pos < len(text):
+            segments.append(("literal", text[pos:]))
+        return TemplateDef(source=text, segments=segments, placeholders=placeholders)
 
     @staticmethod
     def _parse_module_number(module_id: Any, filename: str) -> int:
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s rid=%(request_id)s %(message)s"
+FILE_ONLY_LOGGERS = ("uvicorn.error", "uvicorn.access", "uvicorn.asgi")
+_SINK_ATTR = "aiq_sink"
+
+_listener: QueueListener | None = None
+
+
+def event_name(record: logging.LogRecord) -> str:
+    msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+    return msg.split(" ", 1)[0]
+
+
+def parse_rates(raw: str | None) -> dict[str, float]:
+    rates: dict[str, float] = {}
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            rates[name.strip()] = max(0.0, min(1.0, float(value)))
+    return rates
+
+
+def parse_limits(raw: str | None) -> dict[str, tuple[int, float]]:
+    limits: dict[str, tuple[int, float]] = {}
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        count, _, window = value.partition("/")
+        if name.strip() and count.strip():
+            limits[name.strip()] = (int(count), float(window or 60))
+    return limits
+
+
+class EventSampler(logging.Filter):
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(event_name(record))
+        if rate is None or rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            return zlib.crc32(request_id.encode("utf-8")) % 10000 < rate * 10000
+        return random.random() < rate
+
+
+class RepeatRateLimiter(logging.Filter):
+    def __init__(self, limits: dict[str, tuple[int, float]]) -> None:
+        super().__init__()
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._windows: dict[str, list[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.limits:
+            return True
+        event = event_name(record)
+        limit = self.limits.get(event)
+        if limit is None:
+            return True
+        max_count, window_seconds = limit
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(event, [now, 0, 0])
+            if now - window[0] >= window_seconds:
+                window[0], window[1] = now, 0
+            if window[1] >= max_count:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = int(window[2]), 0
+        if suppressed and isinstance(record.args, tuple):
+            record.msg = f"{record.msg} suppressed=%d"
+            record.args = (*record.args, suppressed)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "rid": getattr(record, "request_id", "-"),
+            "event": event_name(record),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def _reaches_root(name: str) -> bool:
+    logger: logging.Logger | None = logging.getLogger(name)
+    while logger is not None and logger.parent is not None:
+        if not logger.propagate:
+            return False
+        logger = logger.parent
+    return True
+
+
+class _SinkTagger(logging.Filter):
+    def __init__(self, file_only: bool) -> None:
+        super().__init__()
+        self.file_only = file_only
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if hasattr(record, _SINK_ATTR):
+            # Already queued by a file-only handler further down the hierarchy.
+            return False
+        if self.file_only:
+            # Stream output is left to whatever handles the record on its way up (uvicorn's own handlers under
+            # its LOGGING_CONFIG); only a record that reaches the root logger goes to the stream sink as well.
+            setattr(record, _SINK_ATTR, "all" if _reaches_root(record.name) else "file")
+        else:
+            aiq = record.name == "aiq" or record.name.startswith("aiq.")
+            setattr(record, _SINK_ATTR, "all" if aiq else "stream")
+        return True
+
+
+class _SinkFilter(logging.Filter):
+    def __init__(self, accepted: set[str]) -> None:
+        super().__init__()
+        self.accepted = accepted
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return getattr(record, _SINK_ATTR, "all") in self.accepted
+
+
+def configure_logging(request_filters: list[logging.Filter]) -> logging.Logger:
+    global _listener
+    logger = logging.getLogger("aiq")
+    if _listener is not None:
+        return logger
+    log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    log_file = os.environ.get("LOG_FILE", "logs/app.log").strip()
+    max_bytes = int(os.environ.get("LOG_MAX_BYTES", "10485760"))
+    backup_count = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+    formatter: logging.Formatter = (
+        JsonFormatter() if os.environ.get("LOG_FORMAT", "text").lower() == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    stream_handler.addFilter(_SinkFilter({"all", "stream"}))
+    handlers: list[logging.Handler] = [stream_handler]
+    if log_file:
+        log_dir = os.path.dirname(log_file)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+        )
+        file_handler.setLevel(log_level)
+        file_handler.setFormatter(formatter)
+        file_handler.addFilter(_SinkFilter({"all", "file"}))
+        handlers.append(file_handler)
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(-1)
+    sampler = EventSampler(parse_rates(os.environ.get("LOG_SAMPLE_RATES")))
+    limiter = RepeatRateLimiter(parse_limits(os.environ.get("LOG_RATE_LIMITS", "session_not_found=20/60")))
+    routes = [(False, [logging.getLogger()])]
+    if log_file:
+        routes.append((True, [logging.getLogger(name) for name in FILE_ONLY_LOGGERS]))
+    for file_only, targets in routes:
+        queue_handler = QueueHandler(log_queue)
+        for request_filter in request_filters:
+            queue_handler.addFilter(request_filter)
+        # The tagger goes first: a record both routes see is dropped by the second one before it can be
+        # sampled or counted against a rate limit twice.
+        queue_handler.addFilter(_SinkTagger(file_only))
+        queue_handler.addFilter(sampler)
+        queue_handler.addFilter(limiter)
+        for target in targets:
+            target.addHandler(queue_handler)
+    logging.getLogger().setLevel(log_level)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return logger
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Iterable, TypeVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = tuple[str, ...]
+MetricT = TypeVar("MetricT", bound="_Metric")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count, sum]; buckets are not cumulative until rendered.
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def snapshot(self) -> dict[LabelValues, list[float]]:
+        with self._lock:
+            return {key: list(row) for key, row in self._values.items()}
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict[str, str]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Gauge(_Metric):
+    """Sampled at collection time; `aggregate` decides how worker values combine ("sum" or "max")."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), aggregate: str = "sum") -> None:
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+        self._callbacks: list[Callable[[], dict[LabelValues, float]]] = []
+
+    def set_function(self, callback: Callable[[], dict[LabelValues, float]]) -> None:
+        self._callbacks.append(callback)
+
+    def snapshot(self) -> dict[LabelValues, float]:
+        values: dict[LabelValues, float] = {}
+        for callback in self._callbacks:
+            try:
+                values.update(callback())
+            except Exception:
+                logging.getLogger("aiq.metrics").exception("gauge_callback_failed name=%s", self.name)
+        return values
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._multiproc_dir = os.environ.get("METRICS_MULTIPROC_DIR", "").strip() or None
+        self._flush_interval = float(os.environ.get("METRICS_FLUSH_SECONDS", "5") or 5)
+        self._flusher: threading.Thread | None = None
+        self._worker: tuple[int, int] | None = None
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), aggregate: str = "sum") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, aggregate))
+
+    def _register(self, metric: MetricT) -> MetricT:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing  # type: ignore[return-value]
+        self._metrics[metric.name] = metric
+        return metric
+
+    def collect(self) -> dict[str, dict[str, list]]:
+        data: dict[str, dict[str, list]] = {}
+        for name, metric in self._metrics.items():
+            data[name] = {"samples": [[list(key), value] for key, value in metric.snapshot().items()]}
+        return data
+
+    def start_flusher(self) -> None:
+        if not self._multiproc_dir or self._flusher is not None:
+            return
+        os.makedirs(self._multiproc_dir, exist_ok=True)
+        self._flusher = threading.Thread(target=self._flush_loop, name="aiq-metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self._flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logging.getLogger("aiq.metrics").exception("metrics_flush_failed dir=%s", self._multiproc_dir)
+
+    def _worker_id(self) -> tuple[int, int]:
+        # The pid plus when this process first flushed, so a reused pid never takes over a dead worker's file.
+        pid = os.getpid()
+        if self._worker is None or self._worker[0] != pid:
+            self._worker = (pid, time.time_ns())
+        return self._worker
+
+    def flush(self) -> None:
+        if not self._multiproc_dir:
+            return
+        pid, started = self._worker_id()
+        path = os.path.join(self._multiproc_dir, f"worker_{pid}_{started}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"pid": pid, "started": started, "metrics": self.collect()}, fh)
+        os.replace(tmp_path, path)
+
+    def render(self) -> str:
+        own = self.collect()
+        workers: list[dict[str, dict[str, list]]] = []
+        if self._multiproc_dir:
+            self.flush()
+            workers = self._live_workers()
+        return self._render(own, workers)
+
+    def _live_workers(self) -> list[dict[str, dict[str, list]]]:
+        """Metrics of the other live workers; files of exited workers are deleted, so their counts leave the
+        totals (a counter reset to Prometheus) instead of being summed forever."""
+        snapshots: list[tuple[str, int, int, dict[str, dict[str, list]]]] = []
+        for entry in sorted(os.listdir(self._multiproc_dir or "")):
+            if not entry.startswith("worker_") or not entry.endswith(".json"):
+                continue
+            path = os.path.join(self._multiproc_dir or "", entry)
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    payload = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((path, int(payload.get("pid") or 0), int(payload.get("started") or 0), payload["metrics"]))
+        # Of several files with one pid, only the newest can belong to the process now running under it.
+        newest: dict[int, int] = {}
+        for _, pid, started, _ in snapshots:
+            newest[pid] = max(newest.get(pid, started), started)
+        own = self._worker_id()
+        workers = []
+        for path, pid, started, data in snapshots:
+            if (pid, started) == own:
+                continue
+            if started == newest[pid] and pid != own[0] and _pid_alive(pid):
+                workers.append(data)
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return workers
+
+    def _render(self, own: dict[str, dict[str, list]], workers: list[dict[str, dict[str, list]]]) -> str:
+        lines: list[str] = []
+        for name, metric in self._metrics.items():
+            merged: dict[LabelValues, object] = {}
+            for data in (own, *workers):
+                for key, value in (data.get(name) or {}).get("samples", []):
+                    merged[tuple(key)] = _merge(metric, merged.get(tuple(key)), value)
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key in sorted(merged):
+                value = merged[key]
+                if isinstance(metric, Histogram):
+                    lines.extend(_histogram_lines(metric, key, value))
+                else:
+                    lines.append(f"{name}{_labels(metric.labelnames, key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge(metric: _Metric, current: object, value: object) -> object:
+    if current is None:
+        return value
+    if isinstance(metric, Histogram):
+        return [a + b for a, b in zip(current, value)]
+    if isinstance(metric, Gauge) and metric.aggregate == "max":
+        return max(current, value)
+    return current + value
+
+
+def _histogram_lines(metric: Histogram, key: LabelValues, row: list[float]) -> list[str]:
+    lines: list[str] = []
+    cumulative = 0.0
+    bounds = [*(_number(bound) for bound in metric.buckets), "+Inf"]
+    for bound, count in zip(bounds, row[:-1]):
+        cumulative += count
+        labels = _labels((*metric.labelnames, "le"), (*key, bound))
+        lines.append(f"{metric.name}_bucket{labels} {_number(cumulative)}")
+    plain = _labels(metric.labelnames, key)
+    lines.append(f"{metric.name}_sum{plain} {_number(row[-1])}")
+    lines.append(f"{metric.name}_count{plain} {_number(cumulative)}")
+    return lines
+
+
+def _labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+        return "+Inf" if value > 0 else ("-Inf" if value < 0 else "NaN")
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "aiq_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+STORE_OPERATION_DURATION = metrics.histogram(
+    "aiq_store_operation_duration_seconds", "Session store operation latency.", ("backend", "operation"), FAST_BUCKETS
+)
+ENGINE_RELOADS = metrics.counter("aiq_engine_reloads_total", "Engine (re)loads from YAML.", ("source",))
+ENGINE_RELOAD_DURATION = metrics.histogram(
+    "aiq_engine_reload_duration_seconds", "Time spent loading an engine from YAML.", ("source",)
+)
+EVALUATION_DURATION = metrics.histogram(
+    "aiq_evaluation_duration_seconds", "Rule evaluation time by phase.", ("phase",), FAST_BUCKETS
+)
+ACTIVE_SESSIONS = metrics.gauge("aiq_active_sessions", "Sessions currently held by the store.", ("backend",))
+CACHE_REQUESTS = metrics.counter("aiq_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
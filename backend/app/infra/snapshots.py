@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from .metrics import CACHE_REQUESTS
+
+
+def fingerprint(params: dict[str, Any]) -> str:
+    return hashlib.blake2b(
+        json.dumps(params, sort_keys=True, default=str).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class ParameterSnapshots:
+    """Parameter sets by key, least recently used dropped first, so history records only need the key.
+
+    Entries live in this process only: with several workers a back request served by another worker misses
+    and its caller recomputes the parameters."""
+
+    def __init__(self, max_entries: int | None = None) -> None:
+        env_size = os.environ.get("HISTORY_SNAPSHOTS", "")
+        self._max_entries = max_entries or (int(env_size) if env_size.isdigit() else 2048)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def put(self, key: str, params: dict[str, Any]) -> str:
+        with self._lock:
+            self._entries[key] = params
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            params = self._entries.get(key)
+            if params is not None:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(cache="parameter_snapshot", result="hit" if params is not None else "miss")
+        return dict(params) if params is not None else None
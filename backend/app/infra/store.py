@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import threading
 import time
-from typing import Any
+from dataclasses import replace
+from typing import Any, Iterator
 from uuid import uuid4
 import os
 import json
@@ -10,7 +11,11 @@ import logging
 
 from fastapi import HTTPException
 
-from ..domain.models import Session
+from .metrics import ACTIVE_SESSIONS, STORE_OPERATION_DURATION
+from ..domain.models import Session, SessionBase
+
+# Outside aiq:sessions:* so that SCANs over session keys never see it.
+ACTIVE_KEY = "aiq:active_sessions"
 
 
 class SessionStore:
@@ -24,6 +29,16 @@ class SessionStore:
         self._sessions: dict[str, Session] = {}
         self._last_access: dict[str, float] = {}
         self._redis = None
+        self._counters: dict[str, dict[str, int]] = {}
+        self._documents: dict[str, dict[str, Any]] = {}
+        self._items: dict[str, list[str]] = {}
+        self._leases: dict[str, tuple[str, float]] = {}
+        # Expiry times of memory-backend documents and item lists written with a TTL, purged by the cleanup loop.
+        self._expires: dict[tuple[str, str], float] = {}
+        self._indexes: dict[str, dict[str, dict[str, float]]] = {}
+        # Bases are immutable and content-addressed, so a process-wide cache of them never goes stale.
+        self._bases: dict[str, SessionBase] = {}
+        self._bases_cache_size = 1024
         url = os.environ.get("REDIS_URL") or os.environ.get("SESSION_REDIS_URL")
         if url:
             try:
@@ -37,6 +52,13 @@ class SessionStore:
             self._logger.info("redis_enabled=false")
             self._cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
             self._cleanup_thread.start()
+        self._backend = "redis" if self._redis else "memory"
+
+    def register_metrics(self) -> None:
+        """Report this store's session count as ``aiq_active_sessions``; called once for the app's store."""
+        # Redis counts are global, so every worker reports the same number and the max must be taken.
+        ACTIVE_SESSIONS.aggregate = "max" if self._redis else "sum"
+        ACTIVE_SESSIONS.set_function(lambda: {(self._backend,): float(self.active_count())})
 
     def _cleanup_loop(self) -> None:
         while True:
@@ -47,27 +69,63 @@ class SessionStore:
                 for sid in expired:
                     self._sessions.pop(sid, None)
                     self._last_access.pop(sid, None)
+                referenced = {session.base.id for session in self._sessions.values() if session.base}
+                for base_id in [base_id for base_id in self._bases if base_id not in referenced]:
+                    self._bases.pop(base_id, None)
+                for kind, key in [entry for entry, expires_at in self._expires.items() if expires_at <= now]:
+                    del self._expires[(kind, key)]
+                    (self._documents if kind == "documents" else self._items).pop(key, None)
+                for name in [name for name, (_, expires_at) in self._leases.items() if expires_at <= now]:
+                    del self._leases[name]
 
-    def create(self, first_module_id: str, lang: str) -> Session:
-        session_id = uuid4().hex
-        session = Session(id=session_id, current_module_id=first_module_id, lang=lang)
+    @property
+    def backend(self) -> str:
+        return self._backend
+
+    def active_count(self) -> int:
         if self._redis:
-            self._redis.setex(self._key(session_id), self._ttl_seconds, self._dump(session))
-        else:
-            with self._lock:
-                self._sessions[session_id] = session
-                self._last_access[session_id] = time.time()
+            # Sessions are tracked by last access in one sorted set, so counting never touches the keyspace.
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.zremrangebyscore(ACTIVE_KEY, "-inf", time.time() - self._ttl_seconds)
+            pipe.zcard(ACTIVE_KEY)
+            return int(pipe.execute()[1])
+        with self._lock:
+            return len(self._sessions)
+
+    def create(self, first_module_id: str, lang: str, owner: str | None = None) -> Session:
+        session_id = uuid4().hex
+        session = Session(id=session_id, current_module_id=first_module_id, lang=lang, owner=owner)
+        with STORE_OPERATION_DURATION.time(backend=self._backend, operation="create"):
+            if self._redis:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.setex(self._key(session_id), self._ttl_seconds, self._dump(session))
+                pipe.zadd(ACTIVE_KEY, {session_id: time.time()})
+                pipe.execute()
+            else:
+                with self._lock:
+                    self._sessions[session_id] = _copy(session)
+                    self._last_access[session_id] = time.time()
         self._logger.info("session_create id=%s module=%s lang=%s", session_id, first_module_id, lang)
         return session
 
     def get(self, session_id: str) -> Session:
+        with STORE_OPERATION_DURATION.time(backend=self._backend, operation="get"):
+            return self._get(session_id)
+
+    def _get(self, session_id: str) -> Session:
         if self._redis:
             raw = self._redis.get(self._key(session_id))
             if not raw:
                 self._logger.warning("session_not_found id=%s backend=redis", session_id)
                 raise HTTPException(status_code=404, detail="session_not_found")
             session = self._load(raw)
-            self._redis.expire(self._key(session_id), self._ttl_seconds)
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.expire(self._key(session_id), self._ttl_seconds)
+            if session.base:
+                # A fork that is only read must not outlive the base its answers are stored against.
+                pipe.expire(f"aiq:bases:{session.base.id}", self._ttl_seconds)
+            pipe.zadd(ACTIVE_KEY, {session_id: time.time()})
+            pipe.execute()
             return session
         else:
             with self._lock:
@@ -76,19 +134,34 @@ class SessionStore:
                     self._logger.warning("session_not_found id=%s backend=memory", session_id)
                     raise HTTPException(status_code=404, detail="session_not_found")
                 self._last_access[session_id] = time.time()
-                return session
+                # A copy, as Redis would return: the stored session only changes when a save goes through.
+                return _copy(session)
 
     def update_parameters(self, session: Session, params: dict[str, Any]) -> None:
         with self._lock:
             session.parameters = params
+            session.revision += 1
 
-    def save(self, session: Session) -> None:
-        if self._redis:
-            self._redis.setex(self._key(session.id), self._ttl_seconds, self._dump(session))
-        else:
-            with self._lock:
-                self._sessions[session.id] = session
-                self._last_access[session.id] = time.time()
+    def save(self, session: Session, expected_revision: int | None = None) -> None:
+        """Store ``session``; with ``expected_revision``, only if the stored session is still at that revision,
+        otherwise 409 ``revision_conflict`` with the stored revision."""
+        with STORE_OPERATION_DURATION.time(backend=self._backend, operation="save"):
+            if self._redis and expected_revision is not None:
+                self._save_if_revision(session, expected_revision)
+            elif self._redis:
+                pipe = self._redis.pipeline(transaction=False)
+                self._queue_save(pipe, session)
+                pipe.execute()
+            else:
+                with self._lock:
+                    stored = self._sessions.get(session.id)
+                    if expected_revision is not None:
+                        if stored is None:
+                            raise HTTPException(status_code=404, detail="session_not_found")
+                        if stored.revision != expected_revision:
+                            raise _revision_conflict(stored.revision)
+                    self._sessions[session.id] = _copy(session)
+                    self._last_access[session.id] = time.time()
         self._logger.info(
             "session_save id=%s module=%s answers=%d params=%d",
             session.id,
@@ -97,28 +170,415 @@ class SessionStore:
             len(session.parameters),
         )
 
+    def _queue_save(self, pipe: Any, session: Session) -> None:
+        pipe.setex(self._key(session.id), self._ttl_seconds, self._dump(session))
+        if session.base:
+            pipe.expire(f"aiq:bases:{session.base.id}", self._ttl_seconds)
+        pipe.zadd(ACTIVE_KEY, {session.id: time.time()})
+
+    def _save_if_revision(self, session: Session, expected_revision: int) -> None:
+        from redis.exceptions import WatchError
+
+        key = self._key(session.id)
+        with self._redis.pipeline() as pipe:
+            try:
+                # WATCH aborts the MULTI below if another worker writes the session after the revision is read.
+                pipe.watch(key)
+                raw = pipe.get(key)
+                if not raw:
+                    raise HTTPException(status_code=404, detail="session_not_found")
+                revision = int(json.loads(raw).get("revision") or 0)
+                if revision != expected_revision:
+                    raise _revision_conflict(revision)
+                pipe.multi()
+                self._queue_save(pipe, session)
+                pipe.execute()
+            except WatchError:
+                raw = self._redis.get(key)
+                raise _revision_conflict(int(json.loads(raw).get("revision") or 0) if raw else None) from None
+
+    def fork(self, parent: Session, base: SessionBase, parameters: dict[str, Any]) -> Session:
+        """A new session that starts at ``base.module_id`` with the answers of ``base``; only its own changes
+        relative to the base are written out."""
+        session = Session(
+            id=uuid4().hex,
+            answers=dict(base.answers),
+            parameters=parameters,
+            current_module_id=base.module_id,
+            lang=base.lang,
+            owner=parent.owner,
+            parent_id=parent.id,
+            base=base,
+        )
+        self.save(session)
+        self._logger.info(
+            "session_fork id=%s parent=%s base=%s module=%s", session.id, parent.id, base.id, base.module_id
+        )
+        return session
+
+    def put_base(self, base: SessionBase) -> None:
+        if self._redis:
+            # Forks refresh the base's TTL whenever they are read or saved.
+            self._redis.set(
+                f"aiq:bases:{base.id}",
+                json.dumps(
+                    {
+                        "lang": base.lang,
+                        "version": base.version,
+                        "module_id": base.module_id,
+                        "module_index": base.module_index,
+                        "answers": base.answers,
+                        "parameters": base.parameters,
+                        "rendered": base.rendered,
+                    }
+                ),
+                ex=self._ttl_seconds,
+                nx=True,
+            )
+        with self._lock:
+            self._remember_base(base)
+
+    def get_base(self, base_id: str) -> SessionBase | None:
+        with self._lock:
+            base = self._bases.get(base_id)
+        if base is not None or not self._redis:
+            return base
+        raw = self._redis.get(f"aiq:bases:{base_id}")
+        if not raw:
+            return None
+        data = json.loads(raw)
+        base = SessionBase(
+            id=base_id,
+            lang=data["lang"],
+            version=data["version"],
+            module_id=data["module_id"],
+            module_index=int(data["module_index"]),
+            answers=data["answers"],
+            parameters=data["parameters"],
+            # Bases written before forks diffed against the rendered parameters: their forks diffed the prefix.
+            rendered=data.get("rendered", data["parameters"]),
+        )
+        with self._lock:
+            self._remember_base(base)
+        return base
+
+    def _remember_base(self, base: SessionBase) -> None:
+        if self._redis and len(self._bases) >= self._bases_cache_size:
+            self._bases.clear()
+        self._bases[base.id] = base
+
+    def iter_dumps(self, batch_size: int = 500) -> Iterator[str]:
+        """Every stored session as its JSON serialization, fetched ``batch_size`` at a time.
+
+        Redis is walked with SCAN (never KEYS) and each batch is read with one MGET, so neither the server
+        nor this process ever holds more than a batch. The memory backend snapshots the session ids once
+        and serializes a batch at a time under the store lock; sessions created afterwards are not included."""
+        if self._redis:
+            batch: list[str] = []
+            for key in self._redis.scan_iter(match=self._key("*"), count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    yield from self._mget(batch)
+                    batch = []
+            if batch:
+                yield from self._mget(batch)
+            return
+        with self._lock:
+            session_ids = list(self._sessions)
+        for start in range(0, len(session_ids), batch_size):
+            # Serialized under the lock, which every write of a stored session holds, so no dump sees one mid-save.
+            with self._lock:
+                dumps = [
+                    self._dump(session, full=True)
+                    for session in (self._sessions.get(sid) for sid in session_ids[start:start + batch_size])
+                    if session is not None
+                ]
+            yield from dumps
+
+    def _mget(self, keys: list[str]) -> Iterator[str]:
+        with STORE_OPERATION_DURATION.time(backend=self._backend, operation="mget"):
+            values = self._redis.mget(keys)
+        # Keys that expired between SCAN and MGET come back as None; forks are expanded to their full answers.
+        return (self._expand(value) for value in values if value)
+
+    def _expand(self, raw: str) -> str:
+        session = self._load(raw)
+        return self._dump(session, full=True) if session.base else raw
+
+    def add_counters(self, name: str, deltas: dict[str, int]) -> None:
+        """Add ``deltas`` to the named counter hash; on Redis every worker adds into the same hash."""
+        if self._redis:
+            pipe = self._redis.pipeline(transaction=False)
+            for key, amount in deltas.items():
+                pipe.hincrby(f"aiq:counters:{name}", key, amount)
+            pipe.execute()
+            return
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            for key, amount in deltas.items():
+                counters[key] = counters.get(key, 0) + amount
+
+    def read_counters(self, name: str) -> dict[str, int]:
+        if self._redis:
+            return {key: int(value) for key, value in self._redis.hgetall(f"aiq:counters:{name}").items()}
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    # Small generic records next to the sessions (e.g. bulk jobs), stored in whichever backend is configured.
+
+    def put_document(self, namespace: str, doc_id: str, value: dict[str, Any], ttl_seconds: int | None) -> None:
+        """Store a JSON document; ``ttl_seconds=None`` keeps it until it is overwritten."""
+        if self._redis:
+            self._redis.set(f"aiq:{namespace}:{doc_id}", json.dumps(value), ex=ttl_seconds)
+            return
+        key = f"{namespace}:{doc_id}"
+        with self._lock:
+            self._documents[key] = value
+            if ttl_seconds is None:
+                self._expires.pop(("documents", key), None)
+            else:
+                self._expires[("documents", key)] = time.time() + ttl_seconds
+
+    def get_document(self, namespace: str, doc_id: str) -> dict[str, Any] | None:
+        if self._redis:
+            raw = self._redis.get(f"aiq:{namespace}:{doc_id}")
+            return json.loads(raw) if raw else None
+        with self._lock:
+            value = self._documents.get(f"{namespace}:{doc_id}")
+            return dict(value) if value is not None else None
+
+    def get_documents(self, namespace: str, doc_ids: list[str]) -> list[dict[str, Any] | None]:
+        if not doc_ids:
+            return []
+        if self._redis:
+            with STORE_OPERATION_DURATION.time(backend=self._backend, operation="mget"):
+                values = self._redis.mget([f"aiq:{namespace}:{doc_id}" for doc_id in doc_ids])
+            return [json.loads(raw) if raw else None for raw in values]
+        with self._lock:
+            values = [self._documents.get(f"{namespace}:{doc_id}") for doc_id in doc_ids]
+        return [dict(value) if value is not None else None for value in values]
+
+    def append_items(self, namespace: str, doc_id: str, items: list[str], ttl_seconds: int) -> int:
+        """Append to an ordered list of strings; returns the new length."""
+        if self._redis:
+            key = f"aiq:{namespace}:{doc_id}:items"
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.rpush(key, *items)
+            pipe.expire(key, ttl_seconds)
+            return int(pipe.execute()[0])
+        key = f"{namespace}:{doc_id}"
+        with self._lock:
+            entries = self._items.setdefault(key, [])
+            entries.extend(items)
+            self._expires[("items", key)] = time.time() + ttl_seconds
+            return len(entries)
+
+    def read_items(self, namespace: str, doc_id: str, start: int, count: int) -> list[str]:
+        if self._redis:
+            return self._redis.lrange(f"aiq:{namespace}:{doc_id}:items", start, start + count - 1)
+        with self._lock:
+            return self._items.get(f"{namespace}:{doc_id}", [])[start:start + count]
+
+    def item_count(self, namespace: str, doc_id: str) -> int:
+        if self._redis:
+            return int(self._redis.llen(f"aiq:{namespace}:{doc_id}:items"))
+        with self._lock:
+            return len(self._items.get(f"{namespace}:{doc_id}", []))
+
+    def touch_items(self, namespace: str, doc_id: str, ttl_seconds: int) -> None:
+        """Restart an item list's TTL without appending to it."""
+        if self._redis:
+            self._redis.expire(f"aiq:{namespace}:{doc_id}:items", ttl_seconds)
+            return
+        key = f"{namespace}:{doc_id}"
+        with self._lock:
+            if key in self._items:
+                self._expires[("items", key)] = time.time() + ttl_seconds
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: int) -> bool:
+        """Take or renew an expiring lock; only ``owner`` can renew it until it expires."""
+        if self._redis:
+            key = f"aiq:leases:{name}"
+            if self._redis.set(key, owner, nx=True, ex=ttl_seconds):
+                return True
+            if self._redis.get(key) == owner:
+                self._redis.expire(key, ttl_seconds)
+                return True
+            return False
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder and holder[0] != owner and holder[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl_seconds)
+            return True
+
+    def release_lease(self, name: str, owner: str) -> None:
+        if self._redis:
+            key = f"aiq:leases:{name}"
+            if self._redis.get(key) == owner:
+                self._redis.delete(key)
+            return
+        with self._lock:
+            if self._leases.get(name, ("",))[0] == owner:
+                self._leases.pop(name, None)
+
+    # Secondary indexes: named sets of members ordered by a score (Redis sorted sets ``aiq:{ns}:idx:{name}``).
+
+    def reindex(self, namespace: str, member: str, score: float, add: list[str], remove: list[str]) -> None:
+        """Put ``member`` into the ``add`` indexes with ``score`` and take it out of ``remove``, atomically."""
+        if self._redis:
+            pipe = self._redis.pipeline(transaction=True)
+            for name in remove:
+                pipe.zrem(f"aiq:{namespace}:idx:{name}", member)
+            for name in add:
+                pipe.zadd(f"aiq:{namespace}:idx:{name}", {member: score})
+            if add:
+                # Registry of index names, so facet sizes never need a key scan.
+                pipe.sadd(f"aiq:{namespace}:idx", *add)
+            pipe.execute()
+            return
+        with self._lock:
+            indexes = self._indexes.setdefault(namespace, {})
+            for name in remove:
+                indexes.get(name, {}).pop(member, None)
+            for name in add:
+                indexes.setdefault(name, {})[member] = score
+
+    def page_index(
+        self,
+        namespace: str,
+        names: list[str],
+        offset: int,
+        count: int,
+        min_score: float | None = None,
+        max_score: float | None = None,
+    ) -> tuple[int, list[str]]:
+        """Members present in every index of ``names``, highest score first, and how many there are in total."""
+        low = "-inf" if min_score is None else min_score
+        high = "+inf" if max_score is None else max_score
+        if self._redis:
+            keys = sorted(f"aiq:{namespace}:idx:{name}" for name in names)
+            if len(keys) == 1:
+                key = keys[0]
+            else:
+                # Members carry the same score in every index, so MAX keeps it. The intersection is reused for a
+                # few seconds so paging through it does not rebuild it per page.
+                key = f"aiq:{namespace}:tmp:{'|'.join(sorted(names))}"
+                if not self._redis.exists(key):
+                    pipe = self._redis.pipeline(transaction=True)
+                    pipe.zinterstore(key, keys, aggregate="MAX")
+                    pipe.expire(key, 5)
+                    pipe.execute()
+            with STORE_OPERATION_DURATION.time(backend=self._backend, operation="page_index"):
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.zcount(key, low, high)
+                pipe.zrevrangebyscore(key, high, low, start=offset, num=count)
+                total, members = pipe.execute()
+            return int(total), list(members)
+        with self._lock:
+            indexes = self._indexes.get(namespace, {})
+            sets = sorted((indexes.get(name, {}) for name in names), key=len)
+            smallest, rest = sets[0], sets[1:]
+            matches = [
+                (score, member)
+                for member, score in smallest.items()
+                if (min_score is None or score >= min_score)
+                and (max_score is None or score <= max_score)
+                and all(member in other for other in rest)
+            ]
+        matches.sort(reverse=True)
+        return len(matches), [member for _, member in matches[offset:offset + count]]
+
+    def index_sizes(self, namespace: str) -> dict[str, int]:
+        if self._redis:
+            names = sorted(self._redis.smembers(f"aiq:{namespace}:idx"))
+            pipe = self._redis.pipeline(transaction=False)
+            for name in names:
+                pipe.zcard(f"aiq:{namespace}:idx:{name}")
+            return {name: int(size) for name, size in zip(names, pipe.execute()) if size}
+        with self._lock:
+            return {name: len(members) for name, members in self._indexes.get(namespace, {}).items() if members}
+
     def _key(self, session_id: str) -> str:
         return f"aiq:sessions:{session_id}"
 
-    def _dump(self, session: Session) -> str:
-        return json.dumps(
-            {
-                "id": session.id,
-                "answers": session.answers,
-                "parameters": session.parameters,
-                "current_module_id": session.current_module_id,
-                "lang": session.lang,
-                "conclusion": session.conclusion,
-            }
-        )
+    def _dump(self, session: Session, full: bool = False) -> str:
+        data = {
+            "id": session.id,
+            "answers": session.answers,
+            "parameters": session.parameters,
+            "current_module_id": session.current_module_id,
+            "lang": session.lang,
+            "conclusion": session.conclusion,
+            "revision": session.revision,
+            "owner": session.owner,
+        }
+        if session.history:
+            data["history"] = session.history
+        if session.funnel:
+            data["funnel"] = sorted(session.funnel)
+        if session.parent_id:
+            data["parent_id"] = session.parent_id
+        if session.base and not full:
+            # Only what differs from the shared base is written; _load merges it back.
+            base = session.base
+            data["base_id"] = base.id
+            data["answers"] = _changed(session.answers, base.answers)
+            data["parameters"] = _changed(session.parameters, base.rendered)
+            data["removed"] = [qid for qid in base.answers if qid not in session.answers]
+            dropped = [name for name in base.rendered if name not in session.parameters]
+            if dropped:
+                data["removed_parameters"] = dropped
+        return json.dumps(data)
 
     def _load(self, raw: str) -> Session:
         data = json.loads(raw)
+        answers = data.get("answers") or {}
+        parameters = data.get("parameters") or {}
+        base = None
+        if data.get("base_id"):
+            base = self.get_base(data["base_id"])
+            if base is None:
+                self._logger.warning("session_base_missing id=%s base=%s", data.get("id"), data["base_id"])
+                raise HTTPException(status_code=404, detail="session_not_found")
+            removed = set(data.get("removed") or ())
+            answers = {**{qid: value for qid, value in base.answers.items() if qid not in removed}, **answers}
+            dropped = set(data.get("removed_parameters") or ())
+            parameters = {
+                **{name: value for name, value in base.rendered.items() if name not in dropped},
+                **parameters,
+            }
         return Session(
             id=data.get("id"),
-            answers=data.get("answers") or {},
-            parameters=data.get("parameters") or {},
+            answers=answers,
+            parameters=parameters,
             current_module_id=data.get("current_module_id"),
             lang=data.get("lang") or "en",
             conclusion=data.get("conclusion"),
+            revision=int(data.get("revision") or 0),
+            owner=data.get("owner"),
+            parent_id=data.get("parent_id"),
+            base=base,
+            history=data.get("history") or [],
+            funnel=set(data.get("funnel") or ()),
         )
+
+
+def _copy(session: Session) -> Session:
+    # History records are never changed once appended, so copying the list is enough.
+    return replace(
+        session,
+        answers=dict(session.answers),
+        parameters=dict(session.parameters),
+        history=list(session.history),
+        funnel=set(session.funnel),
+    )
+
+
+def _revision_conflict(revision: int | None) -> HTTPException:
+    return HTTPException(status_code=409, detail={"revision_conflict": True, "revision": revision})
+
+
+def _changed(values: dict[str, Any], base: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in values.items() if key not in base or base[key] != value}
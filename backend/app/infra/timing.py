@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from contextvars import ContextVar, Token
+from typing import Any
+
+
+class PhaseTimings:
+    __slots__ = ("phases", "lang", "answers")
+
+    def __init__(self) -> None:
+        # name -> [seconds, count]; phases may repeat within a request (e.g. lookahead branches).
+        self.phases: dict[str, list[float]] = {}
+        self.lang: str | None = None
+        self.answers: dict[str, Any] | None = None
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.phases.get(name)
+        if entry is None:
+            self.phases[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header_value(self, total_ms: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, (seconds, _) in self.phases.items()]
+        parts.append(f"total;dur={total_ms:.3f}")
+        return ", ".join(parts)
+
+    def describe(self) -> str:
+        return ",".join(
+            f"{name}:{seconds * 1000:.2f}ms/{int(count)}" for name, (seconds, count) in self.phases.items()
+        )
+
+
+request_timings: ContextVar[PhaseTimings | None] = ContextVar("aiq_request_timings", default=None)
+
+
+class _Phase:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: PhaseTimings, name: str) -> None:
+        self.timings = timings
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "_Phase":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.timings.add(self.name, time.perf_counter() - self.start)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullPhase":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name: str) -> _Phase | _NullPhase:
+    timings = request_timings.get()
+    if timings is None:
+        return _NULL_PHASE
+    return _Phase(timings, name)
+
+
+def start_timings() -> tuple[PhaseTimings, Token]:
+    timings = PhaseTimings()
+    return timings, request_timings.set(timings)
+
+
+def note_answers(lang: str, answers: dict[str, Any]) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.lang = lang
+        timings.answers = dict(answers)
+
+
+def answers_fingerprint(answers: dict[str, Any]) -> str:
+    canonical = json.dumps(answers, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
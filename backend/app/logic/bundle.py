@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Any
+
+from ..domain.models import Engine, ModuleDef, QuestionDef, VariableDef
+from .evaluator import Evaluator
+
+BUNDLE_FORMAT = 2
+
+
+class RuleBundleBuilder:
+    def __init__(self, evaluator: Evaluator) -> None:
+        self.evaluator = evaluator
+
+    def build(self, engine: Engine, lang: str) -> dict[str, Any]:
+        return {
+            "format": BUNDLE_FORMAT,
+            "lang": lang,
+            "version": engine.version,
+            "constants": engine.constants,
+            "modules": [self._module(module) for module in engine.modules],
+        }
+
+    def _module(self, module: ModuleDef) -> dict[str, Any]:
+        return {
+            "id": module.module_id,
+            "questions": [self._question(q) for q in module.questions],
+            "variables": [self._variable(v) for v in module.variables],
+        }
+
+    def _question(self, question: QuestionDef) -> dict[str, Any]:
+        options = question.options or []
+        payload: dict[str, Any] = {"id": question.id, "type": question.qtype}
+        if question.dependency:
+            payload["dependency"] = self.evaluator.compile_condition(question.dependency)
+        if options:
+            payload["values"] = [opt.get("value") for opt in options]
+            exclusive = [opt.get("value") for opt in options if opt.get("exclusive")]
+            if exclusive:
+                payload["exclusive"] = exclusive
+        return payload
+
+    def _variable(self, variable: VariableDef) -> dict[str, Any]:
+        return {
+            "name": variable.name,
+            "type": variable.var_type,
+            "initial": variable.initial_value,
+            "rules": [[self.evaluator.compile_condition(rule.condition), rule.value] for rule in variable.rules],
+        }
@@ -1,18 +1,46 @@
 from __future__ import annotations
 
+import ast
 import re
+import threading
+import time
 from typing import Any
 
 from fastapi import HTTPException
 from simpleeval import AttributeDoesNotExist, NameNotDefined, SimpleEval
 
-from ..domain.models import Engine, ModuleDef, QuestionDef
+from ..domain.models import Engine, ModuleDef, QuestionDef, TemplateDef, VariableDef, VariableRuleDef
+from ..infra.metrics import CACHE_REQUESTS, EVALUATION_DURATION
+from .profiler import RuleProfiler
+
+# ast.parse is not thread-safe on CPython 3.11 ("AST constructor recursion depth mismatch") and the
+# sync endpoints run in a thread pool, so every parse goes through this lock.
+_PARSE_LOCK = threading.Lock()
 
 
 class Evaluator:
-    def __init__(self) -> None:
+    _compare_symbols: dict[type, str] = {
+        ast.Eq: "==",
+        ast.NotEq: "!=",
+        ast.Lt: "<",
+        ast.LtE: "<=",
+        ast.Gt: ">",
+        ast.GtE: ">=",
+        ast.In: "in",
+        ast.NotIn: "not in",
+        ast.Is: "is",
+        ast.IsNot: "is not",
+    }
+
+    def __init__(self, render_cache_size: int = 4096) -> None:
         self._contains_pattern = re.compile(r"([A-Za-z0-9_.\-]+)\s+contains\s+('.*?'|\".*?\"|[A-Za-z0-9_.\-]+)")
-        self._template_pattern = re.compile(r"\{\{\s*([A-Za-z0-9_.\-]+)\s*\}\}")
+        self._render_cache: dict[tuple[str, tuple[str, ...]], str] = {}
+        self._render_cache_size = render_cache_size
+        self.profiler: RuleProfiler | None = None
+        self._parsed_conditions: dict[str, tuple[str, ast.AST, tuple[str, ...]]] = {}
+        self._normalized_names: dict[str, str] = {}
+        self._variable_reads: dict[tuple[str, ...], frozenset[str]] = {}
+        self._local = threading.local()
 
     def validate_answer(self, question: QuestionDef, value: Any) -> Any:
         if question.qtype == "boolean":
@@ -45,9 +73,13 @@ class Evaluator:
     def question_visible(self, question: QuestionDef, answers: dict[str, Any], params: dict[str, Any]) -> bool:
         if not question.dependency:
             return True
-        return self.eval_condition(question.dependency, answers, params)
+        return self._eval_rule(question.dependency_id, question.dependency, answers, params)
 
     def module_payload(self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+        with EVALUATION_DURATION.time(phase="visibility"):
+            return self._module_payload(module, answers, params)
+
+    def _module_payload(self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
         visible: list[dict[str, Any]] = []
         last_answered: dict[str, Any] | None = None
         last_visible: dict[str, Any] | None = None
@@ -72,24 +104,26 @@ class Evaluator:
         }
 
     def module_complete(self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]) -> bool:
-        for q in module.questions:
-            if self.question_visible(q, answers, params) and q.id not in answers:
-                return False
-        return True
+        with EVALUATION_DURATION.time(phase="visibility"):
+            for q in module.questions:
+                if self.question_visible(q, answers, params) and q.id not in answers:
+                    return False
+            return True
 
     def prune_hidden_answers(self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]) -> bool:
         removed = False
-        for q in module.questions:
-            if q.id in answers and not self.question_visible(q, answers, params):
-                del answers[q.id]
-                removed = True
+        with EVALUATION_DURATION.time(phase="visibility"):
+            for q in module.questions:
+                if q.id in answers and not self.question_visible(q, answers, params):
+                    del answers[q.id]
+                    removed = True
         return removed
 
     def next_action(self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]) -> tuple[str, str | None, str | None]:
         module_done = self.module_complete(module, answers, params)
         params_with_flag = {**params, "Module_finished": module_done}
         for rule in module.router:
-            if rule.condition and not self.eval_condition(rule.condition, answers, params_with_flag):
+            if rule.condition and not self._eval_rule(rule.rule_id, rule.condition, answers, params_with_flag):
                 continue
             action_lower = (rule.action or "").lower()
             if action_lower in {"jump", "next", "else"}:
@@ -100,66 +134,184 @@ class Evaluator:
                 return ("result", None, rule.message)
         return ("module", module.module_id, None)
 
-    def compute_parameters(self, engine: Engine, answers: dict[str, Any]) -> dict[str, Any]:
+    def compute_parameters(
+        self, engine: Engine, answers: dict[str, Any], resume: tuple[int, dict[str, Any]] | None = None
+    ) -> dict[str, Any]:
+        """All parameters for ``answers``; ``resume=(index, prefix)`` continues from :meth:`compute_prefix`
+        output for ``engine.modules[:index]`` instead of re-evaluating those modules."""
+        with EVALUATION_DURATION.time(phase="compute_parameters"):
+            if resume is None:
+                params = self._compute_variables(engine, answers, dict(engine.constants), engine.modules)
+            else:
+                index, prefix = resume
+                params = self._compute_variables(engine, answers, dict(prefix), engine.modules[index:])
+            for key in engine.templated_params:
+                if key in params:
+                    params[key] = self._render_template(engine, params[key], answers, params)
+            return params
+
+    def compute_prefix(self, engine: Engine, answers: dict[str, Any], stop: int) -> dict[str, Any]:
+        """Unrendered parameters after evaluating ``engine.modules[:stop]`` only."""
+        with EVALUATION_DURATION.time(phase="compute_parameters"):
+            return self._compute_variables(engine, answers, dict(engine.constants), engine.modules[:stop])
+
+    def _compute_variables(
+        self, engine: Engine, answers: dict[str, Any], params: dict[str, Any], modules: list[ModuleDef]
+    ) -> dict[str, Any]:
+        env, shadowed = self._build_env(answers, params), self._answer_names(answers)
+        for module in modules:
+            for variable in module.variables:
+                self._assign(params, env, shadowed, variable.name, self._variable_value(variable, answers, params, env))
+        return params
+
+    def trace_variables(self, engine: Engine, answers: dict[str, Any]) -> tuple[dict[str, Any], list[Any]]:
+        """Unrendered parameters plus the value each variable was assigned, in evaluation order, for
+        :meth:`replay_variables`."""
         params: dict[str, Any] = dict(engine.constants)
+        env, shadowed = self._build_env(answers, params), self._answer_names(answers)
+        trace: list[Any] = []
         for module in engine.modules:
             for variable in module.variables:
-                value = (
-                    variable.initial_value
-                    if variable.initial_value is not None
-                    else self._default_for_type(variable.var_type)
-                )
-                if (variable.var_type or "").lower() in {"string_list", "list"}:
-                    collected: list[Any] = []
-                    else_value: Any | None = None
-                    for rule in variable.rules:
-                        if rule.condition.strip().lower() == "else":
-                            else_value = rule.value
-                            continue
-                        if self.eval_condition(rule.condition, answers, params):
-                            collected.append(rule.value)
-                    if collected:
-                        value = collected
-                    elif else_value is not None:
-                        value = else_value if isinstance(else_value, list) else [else_value]
+                value = self._variable_value(variable, answers, params, env)
+                self._assign(params, env, shadowed, variable.name, value)
+                trace.append(value)
+        return params, trace
+
+    def replay_variables(
+        self, engine: Engine, answers: dict[str, Any], trace: list[Any], changed: set[str]
+    ) -> tuple[dict[str, Any], set[str]]:
+        """Unrendered parameters for ``answers``, which differ from the traced run only in the ``changed``
+        (normalized) names. Only variables reading a name whose value differs at that point are evaluated;
+        the others take their traced value. Also returns the normalized names that ended up different."""
+        params: dict[str, Any] = dict(engine.constants)
+        env, shadowed = self._build_env(answers, params), self._answer_names(answers)
+        dirty = set(changed)
+        position = 0
+        for module in engine.modules:
+            for variable in module.variables:
+                traced = trace[position]
+                position += 1
+                name = self._normalize_name(variable.name)
+                value = traced
+                if dirty and not dirty.isdisjoint(self.variable_reads(variable)):
+                    value = self._variable_value(variable, answers, params, env)
+                if value != traced:
+                    dirty.add(name)
                 else:
-                    for rule in variable.rules:
-                        if self.eval_condition(rule.condition, answers, params):
-                            value = rule.value
-                            break
-                params[variable.name] = value
-        for key in list(params.keys()):
-            params[key] = self._render_template(params[key], answers, params)
-        return params
+                    dirty.discard(name)
+                self._assign(params, env, shadowed, variable.name, value)
+        return params, dirty
+
+    def variable_reads(self, variable: VariableDef) -> frozenset[str]:
+        conditions = tuple(rule.condition for rule in variable.rules)
+        reads = self._variable_reads.get(conditions)
+        if reads is None:
+            reads = frozenset(name for condition in conditions for name in self.condition_names(condition))
+            self._variable_reads[conditions] = reads
+        return reads
+
+    def render_parameter(self, engine: Engine, name: str, answers: dict[str, Any], params: dict[str, Any]) -> Any:
+        value = params.get(name)
+        if name in engine.templated_params and value is not None:
+            return self._render_template(engine, value, answers, params)
+        return value
+
+    def _answer_names(self, answers: dict[str, Any]) -> set[str]:
+        return {self._normalize_name(qid) for qid in answers}
+
+    def _assign(
+        self, params: dict[str, Any], env: dict[str, Any], shadowed: set[str], name: str, value: Any
+    ) -> None:
+        """Set a variable in ``params`` and keep the condition environment in step (answers win on a clash)."""
+        params[name] = value
+        normalized = self._normalize_name(name)
+        if normalized not in shadowed:
+            env[normalized] = value
+
+    def _variable_value(
+        self, variable: VariableDef, answers: dict[str, Any], params: dict[str, Any], env: dict[str, Any]
+    ) -> Any:
+        value = (
+            variable.initial_value
+            if variable.initial_value is not None
+            else self._default_for_type(variable.var_type)
+        )
+        if (variable.var_type or "").lower() in {"string_list", "list"}:
+            collected: list[Any] = []
+            else_rule: VariableRuleDef | None = None
+            for rule in variable.rules:
+                if rule.condition.strip().lower() == "else":
+                    else_rule = rule
+                    continue
+                if self._eval_rule(rule.rule_id, rule.condition, answers, params, env):
+                    collected.append(rule.value)
+            if else_rule is not None and self.profiler is not None:
+                # Not a condition to evaluate: the fallback applies exactly when no other rule fired.
+                self.profiler.record(else_rule.rule_id, else_rule.condition, not collected, 0.0)
+            if collected:
+                value = collected
+            elif else_rule is not None and else_rule.value is not None:
+                else_value = else_rule.value
+                value = else_value if isinstance(else_value, list) else [else_value]
+        else:
+            for rule in variable.rules:
+                if self._eval_rule(rule.rule_id, rule.condition, answers, params, env):
+                    value = rule.value
+                    break
+        return value
 
     def compute_conclusion(self, params: dict[str, Any]) -> dict[str, Any] | None:
-        return {
-            "Role": params.get("Role"),
-            "Role_CN": params.get("Role_CN"),
-            "Type": params.get("Type"),
-            "Type_CN": params.get("Type_CN"),
-            "Risk_level": params.get("Risk_level"),
-            "Risk_level_CN": params.get("Risk_level_CN"),
-            "View": params.get("View"),
-        }
+        with EVALUATION_DURATION.time(phase="conclusion"):
+            return {
+                "Role": params.get("Role"),
+                "Role_CN": params.get("Role_CN"),
+                "Type": params.get("Type"),
+                "Type_CN": params.get("Type_CN"),
+                "Risk_level": params.get("Risk_level"),
+                "Risk_level_CN": params.get("Risk_level_CN"),
+                "View": params.get("View"),
+            }
+
+    def _eval_rule(
+        self,
+        rule_id: str,
+        expr: str,
+        answers: dict[str, Any],
+        params: dict[str, Any],
+        env: dict[str, Any] | None = None,
+    ) -> bool:
+        profiler = self.profiler
+        if profiler is None:
+            return self._evaluate(expr, answers, params, env)
+        start = time.perf_counter()
+        result = self._evaluate(expr, answers, params, env)
+        profiler.record(rule_id, expr, result, time.perf_counter() - start)
+        return result
 
     def eval_condition(self, expr: str, answers: dict[str, Any], params: dict[str, Any]) -> bool:
+        return self._evaluate(expr, answers, params, None)
+
+    def _evaluate(
+        self, expr: str, answers: dict[str, Any], params: dict[str, Any], env: dict[str, Any] | None
+    ) -> bool:
+        """``env`` is a prepared name environment shared across a variable pass; without one it is built here."""
         if not expr:
             return True
         if expr.strip().lower() == "else":
             return True
-        evaluator = SimpleEval()
-        normalized = self._normalize_expr(self._rewrite_contains(self._rewrite_in_list(expr)))
-        env = self._build_env(answers, params)
-        keywords = {"and", "or", "not", "in", "is", "True", "False", "None"}
-        for name in re.findall(r"\b[A-Za-z_][A-Za-z0-9_]*\b", normalized):
-            if name in keywords:
-                continue
-            if name not in env:
-                env[name] = None
-        evaluator.names = env
+        # One interpreter per thread; only its names change between conditions.
+        evaluator = getattr(self._local, "simple_eval", None)
+        if evaluator is None:
+            evaluator = self._local.simple_eval = SimpleEval()
+        if env is None:
+            env = self._build_env(answers, params)
         try:
-            return bool(evaluator.eval(normalized))
+            normalized, node, names = self._parse_condition(expr)
+            for name in names:
+                if name not in env:
+                    env[name] = None
+            evaluator.names = env
+            return bool(evaluator.eval(normalized, previously_parsed=node))
         except (NameNotDefined, AttributeDoesNotExist, TypeError):
             return False
         except Exception as exc:
@@ -168,10 +320,84 @@ class Evaluator:
                 detail={"invalid_condition": expr, "error": str(exc)},
             )
 
+    def condition_names(self, expr: str) -> tuple[str, ...]:
+        """Names a condition reads, in the normalized form :meth:`normalize_name` produces."""
+        if not expr or expr.strip().lower() == "else":
+            return ()
+        return self._parse_condition(expr)[2]
+
+    def normalize_name(self, name: str) -> str:
+        return self._normalize_name(name)
+
+    def _parse_condition(self, expr: str) -> tuple[str, ast.AST, tuple[str, ...]]:
+        parsed = self._parsed_conditions.get(expr)
+        if parsed is not None:
+            return parsed
+        normalized = self._normalize_expr(self._rewrite_contains(self._rewrite_in_list(expr)))
+        keywords = {"and", "or", "not", "in", "is", "True", "False", "None"}
+        names = tuple(
+            dict.fromkeys(
+                name for name in re.findall(r"\b[A-Za-z_][A-Za-z0-9_]*\b", normalized) if name not in keywords
+            )
+        )
+        with _PARSE_LOCK:
+            node = SimpleEval.parse(normalized)
+        parsed = (normalized, node, names)
+        self._parsed_conditions[expr] = parsed
+        return parsed
+
+    def compile_condition(self, expr: str) -> Any:
+        if not expr or not expr.strip():
+            return True
+        if expr.strip().lower() == "else":
+            # An operator node rather than the bare string, which a quoted literal "else" would also compile to.
+            return ["else"]
+        normalized = self._normalize_expr(self._rewrite_contains(self._rewrite_in_list(expr)))
+        try:
+            with _PARSE_LOCK:
+                tree = ast.parse(normalized, mode="eval")
+            return self._compile_node(tree.body)
+        except (SyntaxError, ValueError) as exc:
+            raise HTTPException(
+                status_code=500,
+                detail={"invalid_condition": expr, "error": str(exc)},
+            )
+
+    def _compile_node(self, node: ast.AST) -> Any:
+        if isinstance(node, ast.BoolOp):
+            op = "and" if isinstance(node.op, ast.And) else "or"
+            return [op, *(self._compile_node(value) for value in node.values)]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ["not", self._compile_node(node.operand)]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+            return -node.operand.value
+        if isinstance(node, ast.Compare):
+            pairs: list[Any] = []
+            left = self._compile_node(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                symbol = self._compare_symbols.get(type(op))
+                if symbol is None:
+                    raise ValueError(f"unsupported_operator:{type(op).__name__}")
+                right = self._compile_node(comparator)
+                pairs.append([symbol, left, right])
+                left = right
+            return pairs[0] if len(pairs) == 1 else ["and", *pairs]
+        if isinstance(node, ast.Name):
+            return ["var", node.id]
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return ["list", *(self._compile_node(item) for item in node.elts)]
+        raise ValueError(f"unsupported_node:{type(node).__name__}")
+
     def _normalize_name(self, name: str) -> str:
+        normalized = self._normalized_names.get(name)
+        if normalized is not None:
+            return normalized
         normalized = re.sub(r"[^0-9A-Za-z_]", "_", name)
         if normalized and normalized[0].isdigit():
             normalized = f"_{normalized}"
+        self._normalized_names[name] = normalized
         return normalized
 
     def _normalize_expr(self, expr: str) -> str:
@@ -302,16 +528,31 @@ class Evaluator:
             env[self._normalize_name(key)] = value
         return env
 
-    def _render_template(self, value: Any, answers: dict[str, Any], params: dict[str, Any]) -> Any:
+    def _render_template(self, engine: Engine, value: Any, answers: dict[str, Any], params: dict[str, Any]) -> Any:
         if isinstance(value, str):
-            return self._template_pattern.sub(
-                lambda match: self._stringify_placeholder(match.group(1), answers, params),
-                value,
-            )
+            template = engine.templates.get(value)
+            if template is None:
+                return value
+            return self._render_segments(template, answers, params)
         if isinstance(value, list):
-            return [self._render_template(item, answers, params) for item in value]
+            return [self._render_template(engine, item, answers, params) for item in value]
         return value
 
+    def _render_segments(self, template: TemplateDef, answers: dict[str, Any], params: dict[str, Any]) -> str:
+        inputs = tuple(self._stringify_placeholder(name, answers, params) for name in template.placeholders)
+        cache_key = (template.source, inputs)
+        cached = self._render_cache.get(cache_key)
+        if cached is not None:
+            CACHE_REQUESTS.inc(cache="template_render", result="hit")
+            return cached
+        CACHE_REQUESTS.inc(cache="template_render", result="miss")
+        lookup = dict(zip(template.placeholders, inputs))
+        rendered = "".join(lookup[text] if kind == "placeholder" else text for kind, text in template.segments)
+        if len(self._render_cache) >= self._render_cache_size:
+            self._render_cache.clear()
+        self._render_cache[cache_key] = rendered
+        return rendered
+
     def _stringify_placeholder(self, name: str, answers: dict[str, Any], params: dict[str, Any]) -> str:
         if name in params:
             raw = params[name]
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from ..domain.models import Engine
+
+
+@dataclass
+class RuleStats:
+    expr: str
+    evaluations: int = 0
+    true_count: int = 0
+    total_seconds: float = 0.0
+
+
+def iter_rules(engine: Engine) -> Iterator[tuple[str, str]]:
+    for module in engine.modules:
+        for question in module.questions:
+            if question.dependency:
+                yield question.dependency_id, question.dependency
+        for variable in module.variables:
+            for rule in variable.rules:
+                yield rule.rule_id, rule.condition
+        for rule in module.router:
+            if rule.condition:
+                yield rule.rule_id, rule.condition
+
+
+class RuleProfiler:
+    """Per-rule evaluation counts and timings.
+
+    Rule ids repeat across languages and rule versions, so statistics are kept per scope: the service calls
+    :meth:`use` with the language and engine version a thread is about to evaluate against."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str, str], RuleStats] = {}
+        self._local = threading.local()
+        self.started_at = time.time()
+
+    def use(self, lang: str, version: str) -> None:
+        self._local.scope = (lang, version)
+
+    def record(self, rule_id: str, expr: str, result: bool, seconds: float) -> None:
+        lang, version = getattr(self._local, "scope", ("", ""))
+        key = (lang, version, rule_id)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = RuleStats(expr=expr)
+            stats.evaluations += 1
+            stats.true_count += 1 if result else 0
+            stats.total_seconds += seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def report(self, engine: Engine | None = None, lang: str | None = None) -> dict[str, Any]:
+        """Statistics for ``engine`` as used for ``lang`` (every rule, evaluated or not), or summed over all
+        scopes by rule id when no engine is given."""
+        stats: dict[str, RuleStats] = {}
+        with self._lock:
+            for (scope_lang, version, rule_id), entry in self._stats.items():
+                if engine is not None and (version != engine.version or lang is not None and scope_lang != lang):
+                    continue
+                total = stats.setdefault(rule_id, RuleStats(expr=entry.expr))
+                total.evaluations += entry.evaluations
+                total.true_count += entry.true_count
+                total.total_seconds += entry.total_seconds
+        if engine is not None:
+            stats = {rule_id: stats.get(rule_id) or RuleStats(expr=expr) for rule_id, expr in iter_rules(engine)}
+        rules = []
+        for rule_id, entry in stats.items():
+            module_id, kind, _ = rule_id.split("/", 2)
+            rules.append(
+                {
+                    "rule_id": rule_id,
+                    "module_id": module_id,
+                    "kind": kind,
+                    "condition": entry.expr,
+                    "evaluations": entry.evaluations,
+                    "true": entry.true_count,
+                    "true_ratio": entry.true_count / entry.evaluations if entry.evaluations else None,
+                    "total_ms": entry.total_seconds * 1000,
+                    "mean_us": entry.total_seconds / entry.evaluations * 1_000_000 if entry.evaluations else None,
+                }
+            )
+        rules.sort(key=lambda row: (-row["total_ms"], row["rule_id"]))
+        return {
+            "since": self.started_at,
+            "evaluations": sum(row["evaluations"] for row in rules),
+            "never_evaluated": [row["rule_id"] for row in rules if not row["evaluations"]],
+            "never_true": [row["rule_id"] for row in rules if row["evaluations"] and not row["true"]],
+            "rules": rules,
+        }
+
+    def dump(self, path: str, engine: Engine | None = None, lang: str | None = None) -> dict[str, Any]:
+        report = self.report(engine, lang)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        return report
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from typing import Any
+
+from ..domain.models import Engine, QuestionDef
+from .evaluator import Evaluator
+
+FIELDS = ("Risk_level", "Type", "Role")
+LABEL_FIELDS = ("Risk_level_CN", "Type_CN", "Role_CN")
+
+
+class SensitivityAnalyzer:
+    """Which single answer changes would flip ``Risk_level``, ``Type`` or ``Role``.
+
+    The answered set is evaluated once with a variable trace; every alternative is then replayed against that
+    trace, so only the variables downstream of the changed answer are re-evaluated. Answers the change would
+    hide are dropped (and replayed again), as the questionnaire would prune them."""
+
+    def __init__(self, evaluator: Evaluator) -> None:
+        self.evaluator = evaluator
+        # engine version -> normalized name -> questions whose dependency reads it
+        self._readers: dict[str, dict[str, list[QuestionDef]]] = {}
+
+    def analyze(self, engine: Engine, answers: dict[str, Any]) -> dict[str, Any]:
+        evaluator = self.evaluator
+        params, trace = evaluator.trace_variables(engine, answers)
+        base = self._fields(engine, answers, params)
+        base_visible: dict[str, bool] = {}
+
+        def visible_before(question: QuestionDef) -> bool:
+            if question.id not in base_visible:
+                base_visible[question.id] = evaluator.question_visible(question, answers, params)
+            return base_visible[question.id]
+
+        questions: list[dict[str, Any]] = []
+        evaluations = 0
+        for qid, value in answers.items():
+            question = engine.questions_by_id.get(qid)
+            if question is None:
+                continue
+            alternatives: list[dict[str, Any]] = []
+            for alternative in self.alternatives(question, value):
+                candidate = {**answers, qid: alternative}
+                changed = {evaluator.normalize_name(qid)}
+                hidden: list[str] = []
+                for _ in range(5):
+                    replayed, dirty = evaluator.replay_variables(engine, candidate, trace, changed)
+                    evaluations += 1
+                    newly_hidden = [
+                        other.id
+                        for other in self._affected(engine, dirty)
+                        if other.id in candidate
+                        and other.id != qid
+                        and visible_before(other)
+                        and not evaluator.question_visible(other, candidate, replayed)
+                    ]
+                    if not newly_hidden:
+                        break
+                    for other_id in newly_hidden:
+                        del candidate[other_id]
+                        changed.add(evaluator.normalize_name(other_id))
+                    hidden.extend(newly_hidden)
+                revealed = [
+                    other.id
+                    for other in self._affected(engine, dirty)
+                    if other.id not in candidate
+                    and not visible_before(other)
+                    and evaluator.question_visible(other, candidate, replayed)
+                ]
+                fields = self._fields(engine, candidate, replayed)
+                alternatives.append(
+                    {
+                        "value": alternative,
+                        "flips": {
+                            name: {"from": base[name], "to": fields[name]}
+                            for name in FIELDS
+                            if fields[name] != base[name]
+                        },
+                        "conclusion": fields,
+                        "hides": hidden,
+                        "reveals": revealed,
+                    }
+                )
+            flipped = sorted({name for option in alternatives for name in option["flips"]})
+            questions.append({"question_id": qid, "value": value, "flips": flipped, "alternatives": alternatives})
+        drivers = sorted(
+            (entry for entry in questions if entry["flips"]),
+            key=lambda entry: (-len(entry["flips"]), entry["question_id"]),
+        )
+        return {
+            "conclusion": base,
+            "evaluations": evaluations,
+            "drivers": [{"question_id": entry["question_id"], "flips": entry["flips"]} for entry in drivers],
+            "questions": questions,
+        }
+
+    @staticmethod
+    def alternatives(question: QuestionDef, value: Any) -> list[Any]:
+        """Every answer one step away: the other boolean, each other single choice, or one option toggled."""
+        if question.qtype == "boolean":
+            return [not value]
+        options = question.options or []
+        if question.qtype == "single_choice":
+            return [opt.get("value") for opt in options if opt.get("value") != value]
+        if question.qtype not in {"multi_choice", "multiple_choice"} or not isinstance(value, list):
+            return []
+        exclusives = {opt.get("value") for opt in options if opt.get("exclusive")}
+        result: list[Any] = []
+        for opt in options:
+            option = opt.get("value")
+            if option in exclusives:
+                if value != [option]:
+                    result.append([option])
+            elif option in value:
+                remaining = [item for item in value if item != option]
+                if remaining:
+                    result.append(remaining)
+            else:
+                added = {*value, option} - exclusives
+                result.append([item.get("value") for item in options if item.get("value") in added])
+        return result
+
+    def _affected(self, engine: Engine, dirty: set[str]) -> list[QuestionDef]:
+        readers = self._readers.get(engine.version)
+        if readers is None:
+            readers = {}
+            for question in engine.questions_by_id.values():
+                for name in self.evaluator.condition_names(question.dependency or ""):
+                    readers.setdefault(name, []).append(question)
+            self._readers = {engine.version: readers, **self._readers}
+        affected = {question.id: question for name in dirty for question in readers.get(name, ())}
+        return list(affected.values())
+
+    def _fields(self, engine: Engine, answers: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+        return {
+            name: self.evaluator.render_parameter(engine, name, answers, params) for name in FIELDS + LABEL_FIELDS
+        }
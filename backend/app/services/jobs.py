@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator
+from uuid import uuid4
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from ..config import DATA_DIR_CN, DATA_DIR_EN
+from ..domain.models import QuestionDef
+from ..infra.loader import EngineLoader
+from ..infra.store import SessionStore
+from ..logic.evaluator import Evaluator
+
+NAMESPACE = "jobs"
+FINISHED = {"done", "failed"}
+# Index of jobs not yet done or failed, scored by creation time; the only thing the resume scan reads.
+PENDING_INDEX = "pending"
+CSV_COLUMNS = [
+    "row", "id", "lang", "error", "Role", "Type", "Risk_level", "Role_CN", "Type_CN", "Risk_level_CN", "View"
+]
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name, "")
+    return int(raw) if raw.isdigit() else default
+
+
+def _lang(raw: Any, default: str) -> str:
+    value = str(raw or default).lower()
+    return "cn" if value in {"zh", "cn", "zh-cn", "zh-hans", "zh-hans-cn"} else "en"
+
+
+def parse_rows(body: bytes, fmt: str, lang: str) -> list[dict[str, Any]]:
+    """Answer sets from a JSONL upload (``{"id", "lang", "answers"}`` or a bare answers object per line) or a
+    CSV with optional ``id``/``lang`` columns and one column per question id."""
+    text = body.decode("utf-8-sig")
+    rows: list[dict[str, Any]] = []
+    if fmt == "csv":
+        for index, record in enumerate(csv.DictReader(io.StringIO(text))):
+            answers = {
+                key.strip(): value.strip()
+                for key, value in record.items()
+                if key and key.strip() not in {"id", "lang"} and value is not None and value.strip()
+            }
+            row_id = record.get("id") or str(index)
+            rows.append({"id": row_id, "lang": _lang(record.get("lang"), lang), "answers": answers})
+        return rows
+    if fmt != "jsonl":
+        raise HTTPException(status_code=400, detail={"unsupported_format": fmt})
+    for index, line in enumerate(text.splitlines()):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail={"invalid_jsonl_line": index + 1})
+        if not isinstance(record, dict):
+            raise HTTPException(status_code=400, detail={"invalid_jsonl_line": index + 1})
+        answers = record.get("answers") if isinstance(record.get("answers"), dict) else record
+        row_id = record.get("id") or str(len(rows))
+        rows.append({"id": row_id, "lang": _lang(record.get("lang"), lang), "answers": answers})
+    return rows
+
+
+# Worker-process side: one engine per language, loaded once per process.
+_WORKER: dict[str, Any] = {}
+
+
+def _init_worker(niceness: int) -> None:
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+    _WORKER["loaders"] = {"en": EngineLoader(DATA_DIR_EN), "cn": EngineLoader(DATA_DIR_CN)}
+    _WORKER["evaluator"] = Evaluator()
+
+
+def _coerce(question: QuestionDef, value: Any) -> Any:
+    """CSV cells arrive as text; map them onto the question's option values."""
+    if not isinstance(value, str):
+        return value
+    if question.qtype == "boolean":
+        return value.lower() in {"true", "yes", "1"}
+    values = [opt.get("value") for opt in question.options or []]
+    by_text = {str(option).lower(): option for option in values}
+    if question.qtype in {"multi_choice", "multiple_choice"}:
+        if value.startswith("["):
+            return json.loads(value)
+        parts = [part.strip() for part in value.replace(",", ";").split(";") if part.strip()]
+        return [by_text.get(part.lower(), part) for part in parts]
+    return by_text.get(value.lower(), value)
+
+
+def evaluate_rows(rows: list[tuple[int, dict[str, Any]]]) -> list[str]:
+    evaluator: Evaluator = _WORKER["evaluator"]
+    results = []
+    for index, row in rows:
+        result: dict[str, Any] = {"row": index, "id": row.get("id"), "lang": row["lang"]}
+        engine = _WORKER["loaders"][row["lang"]].get_engine()
+        try:
+            answers = {}
+            for qid, value in (row.get("answers") or {}).items():
+                question = engine.questions_by_id.get(qid)
+                if not question:
+                    raise HTTPException(status_code=400, detail={"unknown_question": qid})
+                answers[qid] = evaluator.validate_answer(question, _coerce(question, value))
+            params = evaluator.compute_parameters(engine, answers)
+            result["conclusion"] = evaluator.compute_conclusion(params)
+        except HTTPException as exc:
+            result["error"] = exc.detail
+        except (ValueError, TypeError) as exc:
+            result["error"] = str(exc)
+        results.append(json.dumps(result, ensure_ascii=False))
+    return results
+
+
+class BulkJobs:
+    """Bulk assessment jobs: rows and results live in the session store, evaluation runs in a small pool of
+    low-priority worker processes fed by one background thread per web worker."""
+
+    def __init__(self, store: SessionStore) -> None:
+        self._logger = logging.getLogger("aiq.jobs")
+        self.store = store
+        self.processes = _env_int("JOBS_PROCESSES", 1)
+        self.chunk_rows = _env_int("JOBS_CHUNK_ROWS", 100)
+        self.max_rows = _env_int("JOBS_MAX_ROWS", 5000)
+        self.ttl_seconds = _env_int("JOBS_TTL_SECONDS", 86400)
+        self.niceness = _env_int("JOBS_NICE", 10)
+        self.lease_seconds = 60
+        self.scan_seconds = 30.0
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._queue: queue.Queue[str] = queue.Queue()
+        self._runner: threading.Thread | None = None
+        self._pool: ProcessPoolExecutor | None = None
+
+    def create(self, body: bytes, fmt: str, lang: str) -> dict[str, Any]:
+        rows = parse_rows(body, fmt, lang)
+        if not rows:
+            raise HTTPException(status_code=400, detail="job_empty")
+        if len(rows) > self.max_rows:
+            raise HTTPException(status_code=413, detail={"job_too_large": len(rows), "max_rows": self.max_rows})
+        job_id = uuid4().hex
+        for start in range(0, len(rows), 1000):
+            batch = [json.dumps(row, ensure_ascii=False) for row in rows[start:start + 1000]]
+            self.store.append_items(NAMESPACE, f"{job_id}:rows", batch, self.ttl_seconds)
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "format": fmt,
+            "total": len(rows),
+            "done": 0,
+            "errors": 0,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        self.store.put_document(NAMESPACE, job_id, job, self.ttl_seconds)
+        self.store.reindex(NAMESPACE, job_id, job["created_at"], [PENDING_INDEX], [])
+        self._logger.info("job_create id=%s format=%s rows=%d", job_id, fmt, len(rows))
+        self._queue.put(job_id)
+        return job
+
+    def status(self, job_id: str) -> dict[str, Any]:
+        job = self.store.get_document(NAMESPACE, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job_not_found")
+        return job
+
+    async def iter_results(self, job_id: str, fmt: str = "ndjson", follow: bool = True) -> AsyncIterator[bytes]:
+        """Results as they are produced; with ``follow`` the stream stays open until the job finishes.
+
+        Only the store reads run in the threadpool; waiting between polls happens on the event loop, so idle
+        followers do not hold threads that interactive requests need."""
+        offset = 0
+        if fmt == "csv":
+            yield (",".join(CSV_COLUMNS) + "\r\n").encode("utf-8")
+        while True:
+            items, finished = await run_in_threadpool(self._poll_results, job_id, offset)
+            if items:
+                offset += len(items)
+                yield self._encode(items, fmt)
+                continue
+            if finished or not follow:
+                return
+            await asyncio.sleep(0.5)
+
+    def _poll_results(self, job_id: str, offset: int) -> tuple[list[str], bool]:
+        """Results from ``offset`` on, and whether no more will come."""
+        items = self.store.read_items(NAMESPACE, f"{job_id}:results", offset, 500)
+        if items:
+            return items, False
+        job = self.store.get_document(NAMESPACE, job_id)
+        if job is None:
+            return [], True
+        if job["status"] in FINISHED:
+            # The last results may have been appended between the read above and the status check.
+            items = self.store.read_items(NAMESPACE, f"{job_id}:results", offset, 500)
+            return items, not items
+        return [], False
+
+    @staticmethod
+    def _encode(items: list[str], fmt: str) -> bytes:
+        if fmt != "csv":
+            return ("\n".join(items) + "\n").encode("utf-8")
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for item in items:
+            result = json.loads(item)
+            conclusion = result.get("conclusion") or {}
+            error = result.get("error")
+            writer.writerow(
+                [result["row"], result.get("id"), result.get("lang"), json.dumps(error) if error else ""]
+                + [conclusion.get(column, "") for column in CSV_COLUMNS[4:]]
+            )
+        return buffer.getvalue().encode("utf-8")
+
+    def start(self) -> None:
+        if self._runner is not None:
+            return
+        self._runner = threading.Thread(target=self._run_loop, name="aiq-jobs", daemon=True)
+        self._runner.start()
+
+    def _run_loop(self) -> None:
+        self._resume()
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.scan_seconds)
+            except queue.Empty:
+                self._resume()
+                continue
+            self.run(job_id)
+
+    def _resume(self) -> None:
+        """Pick up queued or interrupted jobs whose previous owner stopped renewing its lease."""
+        try:
+            pending: list[str] = []
+            while True:
+                total, ids = self.store.page_index(NAMESPACE, [PENDING_INDEX], len(pending), 500)
+                pending.extend(ids)
+                if not ids or len(pending) >= total:
+                    break
+            # Oldest first; page_index returns the highest score first.
+            for job_id in reversed(pending):
+                self.run(job_id)
+        except Exception:
+            self._logger.exception("job_resume_failed backend=%s", self.store.backend)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn rather than fork: the web process has live threads and sockets.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.niceness,),
+            )
+        return self._pool
+
+    def run(self, job_id: str) -> None:
+        lease = f"{NAMESPACE}:{job_id}"
+        if not self.store.acquire_lease(lease, self.owner, self.lease_seconds):
+            return
+        try:
+            job = self.store.get_document(NAMESPACE, job_id)
+            if job is None or job["status"] in FINISHED:
+                # Expired, or finished by a worker that died before taking it off the index.
+                self.store.reindex(NAMESPACE, job_id, 0, [], [PENDING_INDEX])
+                return
+            offset = self.store.item_count(NAMESPACE, f"{job_id}:results")
+            resumed = job["status"] == "running"
+            job.update(status="running", done=offset, started_at=job["started_at"] or time.time())
+            self._save_progress(job)
+            self._logger.info("job_start id=%s offset=%d resumed=%s", job_id, offset, resumed)
+            try:
+                self._process(job, offset, lease)
+            except Exception as exc:
+                self._logger.exception("job_failed id=%s", job_id)
+                if isinstance(exc, BrokenProcessPool) and self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                job.update(status="failed", error=str(exc), finished_at=time.time())
+            else:
+                job.update(status="done", finished_at=time.time())
+                self._logger.info(
+                    "job_done id=%s rows=%d errors=%d duration_s=%.1f",
+                    job_id,
+                    job["done"],
+                    job["errors"],
+                    job["finished_at"] - job["started_at"],
+                )
+            self.store.put_document(NAMESPACE, job_id, job, self.ttl_seconds)
+            self.store.reindex(NAMESPACE, job_id, 0, [], [PENDING_INDEX])
+        finally:
+            self.store.release_lease(lease, self.owner)
+
+    def _save_progress(self, job: dict[str, Any]) -> None:
+        # The input rows live exactly as long as the job document, so a job that is still running or
+        # resumable never outlives the rows it reads.
+        self.store.put_document(NAMESPACE, job["id"], job, self.ttl_seconds)
+        self.store.touch_items(NAMESPACE, f"{job['id']}:rows", self.ttl_seconds)
+
+    def _process(self, job: dict[str, Any], offset: int, lease: str) -> None:
+        executor = self._executor()
+        inflight: deque[Future[list[str]]] = deque()
+        next_row = offset
+        while True:
+            while next_row < job["total"] and len(inflight) < self.processes * 2:
+                raw_rows = self.store.read_items(NAMESPACE, f"{job['id']}:rows", next_row, self.chunk_rows)
+                if not raw_rows:
+                    # The rows expired or were lost while the job document lived on: nothing left to resume.
+                    raise RuntimeError("rows_missing")
+                rows = [(next_row + index, json.loads(raw)) for index, raw in enumerate(raw_rows)]
+                inflight.append(executor.submit(evaluate_rows, rows))
+                next_row += len(rows)
+            if not inflight:
+                return
+            # Results are appended in row order, so the result count is also the resume offset.
+            results = inflight.popleft().result()
+            if results:
+                self.store.append_items(NAMESPACE, f"{job['id']}:results", results, self.ttl_seconds)
+            job["done"] += len(results)
+            job["errors"] += sum(1 for item in results if "error" in json.loads(item))
+            self._save_progress(job)
+            if not self.store.acquire_lease(lease, self.owner, self.lease_seconds):
+                raise RuntimeError("job_lease_lost")
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import re
+import secrets
+import time
+from typing import Any
+
+from fastapi import HTTPException
+
+from ..domain.models import Session
+from ..infra.store import SessionStore
+
+INDEXED_FIELDS = ("Risk_level", "Type", "Role")
+TOKENS_NAMESPACE = "portfolio_owners"
+OWNER_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def check_owner(owner: str) -> str:
+    if not OWNER_PATTERN.match(owner):
+        raise HTTPException(status_code=400, detail="invalid_owner")
+    return owner
+
+
+def index_names(record: dict[str, Any]) -> list[str]:
+    # A conclusion without a field value is left out of that field's indexes rather than filed under "None".
+    return ["all", f"lang:{record['lang']}"] + [
+        f"{name}:{record[name]}" for name in INDEXED_FIELDS if record.get(name) is not None
+    ]
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class Portfolio:
+    """Assessments persisted per owner (organization key), outliving the session TTL.
+
+    Every assessment sits in an ``all`` index plus one index per language and per ``Risk_level``/``Type``/
+    ``Role`` value, all scored by completion time, so listings page and filter by intersecting indexes rather
+    than scanning. Documents and indexes are only written when a session's conclusion changes.
+
+    Every owner has a secret token, issued by an admin; only its SHA-256 is stored, and every read of the
+    portfolio and every session added to it must present the token."""
+
+    def __init__(self, store: SessionStore) -> None:
+        self._logger = logging.getLogger("aiq.portfolio")
+        self.store = store
+
+    @staticmethod
+    def _namespace(owner: str) -> str:
+        return f"portfolio:{owner}"
+
+    def issue_token(self, owner: str) -> str:
+        """A new token for ``owner``, replacing any previous one; it is returned here and never again."""
+        check_owner(owner)
+        token = secrets.token_urlsafe(32)
+        rotated = self.store.get_document(TOKENS_NAMESPACE, owner) is not None
+        self.store.put_document(
+            TOKENS_NAMESPACE, owner, {"token_hash": _token_hash(token), "issued_at": time.time()}, None
+        )
+        self._logger.info("portfolio_token owner=%s rotated=%s", owner, rotated)
+        return token
+
+    def authorize(self, owner: str, token: str | None) -> str:
+        check_owner(owner)
+        entry = self.store.get_document(TOKENS_NAMESPACE, owner)
+        # An unknown owner and a wrong token look the same, so owner names cannot be probed.
+        if not entry or not token or not hmac.compare_digest(entry["token_hash"], _token_hash(token)):
+            self._logger.warning("portfolio_token_invalid owner=%s", owner)
+            raise HTTPException(status_code=401, detail="owner_token_invalid")
+        return owner
+
+    def record(self, session: Session) -> dict[str, Any] | None:
+        if not session.owner or session.conclusion is None:
+            return None
+        namespace = self._namespace(session.owner)
+        previous = self.store.get_document(namespace, session.id)
+        now = time.time()
+        record = {
+            "id": session.id,
+            "owner": session.owner,
+            "lang": session.lang,
+            **{name: session.conclusion.get(name) for name in INDEXED_FIELDS},
+            "completed_at": now,
+            "first_completed_at": previous["first_completed_at"] if previous else now,
+            "revision": session.revision,
+            "conclusion": session.conclusion,
+        }
+        added = index_names(record)
+        removed = [name for name in index_names(previous) if name not in added] if previous else []
+        self.store.put_document(namespace, session.id, record, None)
+        self.store.reindex(namespace, session.id, now, added, removed)
+        self._logger.info(
+            "portfolio_record owner=%s id=%s risk=%s reindexed=%d",
+            session.owner,
+            session.id,
+            record["Risk_level"],
+            len(removed),
+        )
+        return record
+
+    def claim(self, owner: str, session_id: str) -> dict[str, Any]:
+        """Attach an existing session to ``owner``; a concluded session is indexed straight away."""
+        check_owner(owner)
+        session = self.store.get(session_id)
+        if session.owner and session.owner != owner:
+            raise HTTPException(status_code=409, detail="assessment_owned")
+        session.owner = owner
+        self.store.save(session)
+        record = self.store.get_document(self._namespace(owner), session_id) or self.record(session)
+        return record or {"id": session.id, "owner": owner, "lang": session.lang, "completed_at": None}
+
+    def page(
+        self,
+        owner: str,
+        lang: str | None = None,
+        risk_level: str | None = None,
+        type_: str | None = None,
+        role: str | None = None,
+        completed_after: float | None = None,
+        completed_before: float | None = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> dict[str, Any]:
+        """Assessments matching every given filter, most recently completed first; ``lang`` is an engine
+        language (``en``/``cn``) as returned by ``normalize_lang``."""
+        namespace = self._namespace(check_owner(owner))
+        names = [f"lang:{lang}"] if lang else []
+        for name, value in zip(INDEXED_FIELDS, (risk_level, type_, role)):
+            if value is not None:
+                names.append(f"{name}:{value}")
+        total, ids = self.store.page_index(
+            namespace, names or ["all"], offset, limit, completed_after, completed_before
+        )
+        items = [record for record in self.store.get_documents(namespace, ids) if record is not None]
+        return {"total": total, "offset": offset, "items": items}
+
+    def summary(self, owner: str) -> dict[str, Any]:
+        """Assessment counts per language and per conclusion value, read from the index sizes."""
+        facets: dict[str, dict[str, int]] = {}
+        total = 0
+        for name, size in self.store.index_sizes(self._namespace(check_owner(owner))).items():
+            if name == "all":
+                total = size
+                continue
+            facet, value = name.split(":", 1)
+            facets.setdefault(facet, {})[value] = size
+        return {"owner": owner, "total": total, "facets": facets}
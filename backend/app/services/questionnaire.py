@@ -1,46 +1,129 @@
 from __future__ import annotations
 
-from typing import Any
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import hashlib
+import json
 import logging
+import os
+import threading
 
 from fastapi import HTTPException
 
-from ..domain.models import Engine, Session
+from ..domain.models import Engine, ModuleDef, Session, SessionBase
+from ..infra.analytics import FunnelAnalytics
+from ..infra.content_cache import ContentCache, EncodedContent
 from ..infra.loader import EngineLoader
+from ..infra.metrics import CACHE_REQUESTS
+from ..infra.snapshots import ParameterSnapshots, fingerprint
+from ..infra.timing import note_answers, phase
 from ..infra.store import SessionStore
+from ..logic.bundle import RuleBundleBuilder
 from ..logic.evaluator import Evaluator
+from ..logic.profiler import RuleProfiler
+from ..logic.sensitivity import SensitivityAnalyzer
+from .portfolio import Portfolio
+
+_MISSING = object()
+
+
+def normalize_lang(lang: str | None) -> str:
+    """The engine language for a ``lang`` parameter: ``cn`` for the Chinese aliases, ``en`` otherwise."""
+    if (lang or "en").lower() in {"zh", "cn", "zh-cn", "zh-hans", "zh-hans-cn"}:
+        return "cn"
+    return "en"
 
 
 class QuestionnaireService:
-    def __init__(self, loaders: dict[str, EngineLoader], evaluator: Evaluator, store: SessionStore) -> None:
+    def __init__(
+        self,
+        loaders: dict[str, EngineLoader],
+        evaluator: Evaluator,
+        store: SessionStore,
+        content_cache: ContentCache | None = None,
+        analytics: FunnelAnalytics | None = None,
+        portfolio: Portfolio | None = None,
+        snapshots: ParameterSnapshots | None = None,
+    ) -> None:
         self._logger = logging.getLogger("aiq.service")
         self.loaders = loaders
         self.evaluator = evaluator
         self.store = store
+        self.content_cache = content_cache or ContentCache()
+        self.analytics = analytics or FunnelAnalytics(store)
+        self.portfolio = portfolio or Portfolio(store)
+        self.snapshots = snapshots or ParameterSnapshots()
+        env_steps = os.environ.get("HISTORY_STEPS", "")
+        self.history_steps = int(env_steps) if env_steps.isdigit() else 50
+        self._sensitivity_analyzer = SensitivityAnalyzer(evaluator)
+        # Sensitivity reports by answer fingerprint (language, engine version and answers), least recent dropped.
+        self._sensitivity: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._sensitivity_lock = threading.Lock()
+        env_reports = os.environ.get("SENSITIVITY_CACHE", "")
+        self._sensitivity_size = int(env_reports) if env_reports.isdigit() else 1024
+        self._bundle_builder = RuleBundleBuilder(evaluator)
+        self._bundles: dict[str, tuple[str, dict[str, Any]]] = {}
+        # (engine version, module index) -> question ids before that module, or None when a variable there
+        # reads a later question and the prefix parameters cannot be reused.
+        self._prefixes: dict[tuple[str, int], frozenset[str] | None] = {}
 
-    def start(self, lang: str | None = None) -> tuple[str, dict[str, Any]]:
+    def start(
+        self,
+        lang: str | None = None,
+        lookahead: bool = False,
+        owner: str | None = None,
+        owner_token: str | None = None,
+    ) -> tuple[str, dict[str, Any]]:
         lang_value = self._normalize_lang(lang)
         engine = self._engine(lang_value)
         if not engine.modules:
             raise HTTPException(status_code=500, detail="no_modules_loaded")
-        session = self.store.create(engine.modules[0].module_id, lang_value)
-        session.parameters = self.evaluator.compute_parameters(engine, session.answers)
+        if owner is not None:
+            self.portfolio.authorize(owner, owner_token)
+        with phase("store_create"):
+            session = self.store.create(engine.modules[0].module_id, lang_value, owner)
+        with phase("compute_parameters"):
+            session.parameters = self.evaluator.compute_parameters(engine, session.answers)
         module = engine.modules_by_id[session.current_module_id]
-        self.store.save(session)
+        payload = self._module_payload(module, session.answers, session.parameters)
+        funnel = [
+            *self.analytics.session_started(session, lang_value, module.module_id),
+            *self.analytics.question_shown(session, lang_value, payload, session.answers),
+        ]
+        with phase("store_save"):
+            self.store.save(session)
         self._logger.info("start session=%s module=%s lang=%s", session.id, session.current_module_id, lang_value)
-        return session.id, self.evaluator.module_payload(module, session.answers, session.parameters)
+        note_answers(lang_value, session.answers)
+        self.analytics.count(funnel)
+        if lookahead:
+            payload["lookahead"] = self._lookahead(engine, module, session.answers, payload)
+        return session.id, payload
 
-    def get_module(self, session_id: str, module_id: str, lang: str | None = None) -> dict[str, Any]:
-        session = self.store.get(session_id)
+    def get_module(
+        self, session_id: str, module_id: str, lang: str | None = None, lookahead: bool = False
+    ) -> dict[str, Any]:
+        with phase("store_get"):
+            session = self.store.get(session_id)
         lang_value = self._normalize_lang(lang, session)
         engine = self._engine(lang_value)
-        session.lang = lang_value
         module = engine.modules_by_id.get(module_id)
         if not module:
             raise HTTPException(status_code=404, detail="module_not_found")
-        self.store.save(session)
+        if session.lang != lang_value:
+            # Only a language switch is written back, and never over a concurrent submit, which wins.
+            session.lang = lang_value
+            with phase("store_save"):
+                try:
+                    self.store.save(session, session.revision)
+                except HTTPException as exc:
+                    if exc.status_code != 409:
+                        raise
         self._logger.info("module_get session=%s module=%s lang=%s", session_id, module_id, lang_value)
-        return self.evaluator.module_payload(module, session.answers, session.parameters)
+        note_answers(lang_value, session.answers)
+        payload = self._module_payload(module, session.answers, session.parameters)
+        if lookahead:
+            payload["lookahead"] = self._lookahead(engine, module, session.answers, payload)
+        return payload
 
     def submit_answer(
         self,
@@ -49,8 +132,25 @@ class QuestionnaireService:
         answers: dict[str, Any],
         replace: bool = False,
         lang: str | None = None,
+        lookahead: bool = False,
+        removed: list[str] | None = None,
+        base_revision: int | None = None,
+        parameters_mode: str = "full",
     ) -> dict[str, Any]:
-        session = self.store.get(session_id)
+        with phase("store_get"):
+            session = self.store.get(session_id)
+        diff_base = session.revision if parameters_mode == "diff" and base_revision == session.revision else None
+        previous_parameters = session.parameters
+        previous_conclusion = session.conclusion
+        previous_answers = dict(session.answers)
+        previous_module_id = session.current_module_id
+        previous_revision = session.revision
+        previous_lang = session.lang
+        if base_revision is not None and base_revision != session.revision:
+            self._logger.info(
+                "submit_conflict session=%s base_revision=%d revision=%d", session_id, base_revision, session.revision
+            )
+            raise HTTPException(status_code=409, detail={"revision_conflict": True, "revision": session.revision})
         lang_value = self._normalize_lang(lang, session)
         engine = self._engine(lang_value)
         session.lang = lang_value
@@ -64,66 +164,353 @@ class QuestionnaireService:
             session.current_module_id = active_module_id
         if replace:
             session.answers = {}
+        for qid in removed or []:
+            session.answers.pop(qid, None)
+        # Against the answers before this submit: replace clears session.answers and re-sends the old ones.
+        newly_answered = [qid for qid in answers if qid not in previous_answers]
         for qid, value in answers.items():
             question = engine.questions_by_id.get(qid)
             if not question:
                 raise HTTPException(status_code=400, detail={"unknown_question": qid})
             session.answers[qid] = self.evaluator.validate_answer(question, value)
-        session.parameters = self.evaluator.compute_parameters(engine, session.answers)
-        for _ in range(5):
-            if not self.evaluator.prune_hidden_answers(module, session.answers, session.parameters):
-                break
-            session.parameters = self.evaluator.compute_parameters(engine, session.answers)
-        complete = self.evaluator.module_complete(module, session.answers, session.parameters)
-        if not complete:
-            next_type, next_module_id, message = ("module", module.module_id, None)
-        else:
-            next_type, next_module_id, message = self.evaluator.next_action(
-                module, session.answers, session.parameters
-            )
+        submitted = list(session.answers)
+        session.parameters = self._settle(engine, module, session.answers, session.base)
+        pruned = [qid for qid in submitted if qid not in session.answers]
+        session.revision += 1
+        complete, (next_type, next_module_id, message) = self._route(module, session.answers, session.parameters)
         next_module_payload = None
         conclusion = None
         if not complete:
-            next_module_payload = self.evaluator.module_payload(module, session.answers, session.parameters)
+            next_module_payload = self._module_payload(module, session.answers, session.parameters)
+            if lookahead:
+                next_module_payload["lookahead"] = self._lookahead(
+                    engine, module, session.answers, next_module_payload
+                )
         elif next_type == "module":
             session.current_module_id = next_module_id
             next_module = engine.modules_by_id.get(next_module_id) if next_module_id else None
             if next_module:
-                next_module_payload = self.evaluator.module_payload(next_module, session.answers, session.parameters)
+                next_module_payload = self._module_payload(next_module, session.answers, session.parameters)
+                if lookahead:
+                    next_module_payload["lookahead"] = self._lookahead(
+                        engine, next_module, session.answers, next_module_payload
+                    )
         if next_type == "result":
             session.current_module_id = None
             conclusion = self.evaluator.compute_conclusion(session.parameters)
             session.conclusion = conclusion
-        self.store.save(session)
+        # Marked on the session before it is saved, counted only once the save went through.
+        funnel = self.analytics.questions_answered(session, lang_value, newly_answered)
+        if complete and next_type == "module" and next_module_id and next_module_id != active_module_id:
+            funnel += self.analytics.module_reached(session, lang_value, next_module_id)
+        funnel += self.analytics.question_shown(session, lang_value, next_module_payload, session.answers)
+        if conclusion is not None:
+            funnel += self.analytics.completed(session, lang_value, conclusion)
+        self._record_step(
+            session,
+            previous_revision,
+            previous_module_id,
+            previous_answers,
+            previous_parameters,
+            previous_conclusion,
+            # Parameters from before a language switch were computed by the other language's engine.
+            (previous_lang, engine.version if previous_lang == lang_value else None),
+        )
+        with phase("store_save"):
+            # The check above only saw the revision at read time; the save re-checks it atomically.
+            self.store.save(session, previous_revision if base_revision is not None else None)
+        if conclusion is not None and conclusion != previous_conclusion:
+            with phase("portfolio"):
+                self.portfolio.record(session)
+        self.analytics.count(funnel)
         self._logger.info(
-            "submit session=%s module=%s next=%s next_module=%s complete=%s answers=%d",
+            "submit session=%s module=%s next=%s next_module=%s complete=%s answers=%d revision=%d",
             session_id,
             active_module_id,
             next_type,
             next_module_id,
             complete,
             len(answers),
+            session.revision,
         )
+        note_answers(lang_value, session.answers)
+        if diff_base is not None and not previous_parameters.keys() <= session.parameters.keys():
+            # A diff cannot drop keys (e.g. the *_CN labels after a switch to en), so send them all.
+            diff_base = None
         return {
             "session_id": session.id,
-            "parameters": session.parameters,
+            "revision": session.revision,
+            "pruned": pruned,
+            "parameters": self._parameters_diff(previous_parameters, session.parameters)
+            if diff_base is not None
+            else session.parameters,
+            "parameters_base": diff_base,
             "next": {"type": next_type, "module_id": next_module_id, "message": message},
             "module_complete": complete,
             "module": next_module_payload,
             "conclusion": conclusion,
         }
 
-    def result(self, session_id: str, lang: str | None = None) -> tuple[dict[str, Any], dict[str, Any] | None]:
-        session = self.store.get(session_id)
+    def result(
+        self, session_id: str, lang: str | None = None
+    ) -> tuple[dict[str, Any], dict[str, Any] | None, int]:
+        """Parameters and conclusion recomputed from the stored answers, and the session revision they are at."""
+        with phase("store_get"):
+            session = self.store.get(session_id)
+        lang_value = self._normalize_lang(lang, session)
+        engine = self._engine(lang_value)
+        with phase("compute_parameters"):
+            parameters = self._compute(engine, session.answers, session.base)
+        previous_conclusion = session.conclusion
+        conclusion = self.evaluator.compute_conclusion(parameters)
+        if parameters != session.parameters or conclusion != previous_conclusion or lang_value != session.lang:
+            # New parameters are a new revision, so a later diff response is never against ones the client lacks.
+            previous_revision = session.revision
+            session.lang = lang_value
+            session.parameters = parameters
+            session.conclusion = conclusion
+            session.revision += 1
+            with phase("store_save"):
+                self.store.save(session, previous_revision)
+        if conclusion != previous_conclusion:
+            with phase("portfolio"):
+                self.portfolio.record(session)
+        self._logger.info("result session=%s lang=%s revision=%d", session_id, lang_value, session.revision)
+        note_answers(lang_value, session.answers)
+        return session.parameters, conclusion, session.revision
+
+    def history(self, session_id: str) -> dict[str, Any]:
+        with phase("store_get"):
+            session = self.store.get(session_id)
+        steps = [
+            {
+                "steps": len(session.history) - index,
+                "revision": step["revision"],
+                "module_id": step["module_id"],
+                "question_ids": sorted({*step["set"], *step["unset"]}),
+            }
+            for index, step in enumerate(session.history)
+        ]
+        return {"session_id": session.id, "revision": session.revision, "steps": steps[::-1]}
+
+    def state(self, session_id: str, lang: str | None = None) -> dict[str, Any]:
+        """The stored answers, parameters and revision, for a client that has to resync (e.g. after a 409)."""
+        with phase("store_get"):
+            session = self.store.get(session_id)
+        engine = self._engine(self._normalize_lang(lang, session))
+        module = engine.modules_by_id.get(session.current_module_id or "")
+        return {
+            "session_id": session.id,
+            "revision": session.revision,
+            "history": len(session.history),
+            "answers": session.answers,
+            "parameters": session.parameters,
+            "module_id": session.current_module_id,
+            "module": self._module_payload(module, session.answers, session.parameters) if module else None,
+            "conclusion": session.conclusion,
+        }
+
+    def back(
+        self, session_id: str, steps: int = 1, base_revision: int | None = None, lang: str | None = None
+    ) -> dict[str, Any]:
+        """Return the session to its state ``steps`` submissions ago by undoing the recorded answer changes;
+        parameters come from this worker's snapshot cache when the step's entry is still there and they were
+        computed in this language by the current rules."""
+        with phase("store_get"):
+            session = self.store.get(session_id)
+        if base_revision is not None and base_revision != session.revision:
+            raise HTTPException(status_code=409, detail={"revision_conflict": True, "revision": session.revision})
+        if steps < 1 or steps > len(session.history):
+            raise HTTPException(status_code=409, detail={"history_too_short": True, "steps": len(session.history)})
         lang_value = self._normalize_lang(lang, session)
         engine = self._engine(lang_value)
         session.lang = lang_value
-        session.parameters = self.evaluator.compute_parameters(engine, session.answers)
-        conclusion = self.evaluator.compute_conclusion(session.parameters)
-        session.conclusion = conclusion
-        self.store.save(session)
-        self._logger.info("result session=%s lang=%s", session_id, lang_value)
-        return session.parameters, conclusion
+        previous_conclusion = session.conclusion
+        previous_revision = session.revision
+        undone = session.history[-steps:]
+        for step in reversed(undone):
+            for qid in step["unset"]:
+                session.answers.pop(qid, None)
+            session.answers.update(step["set"])
+        target = undone[0]
+        del session.history[-steps:]
+        same_rules = target.get("lang") == lang_value and target.get("version") == engine.version
+        params = self.snapshots.get(target["params"]) if same_rules else None
+        restored = "snapshot"
+        if params is None:
+            restored = "recomputed"
+            with phase("compute_parameters"):
+                params = self._compute(engine, session.answers, session.base)
+        session.parameters = params
+        session.current_module_id = target["module_id"]
+        session.conclusion = self.evaluator.compute_conclusion(params) if target["concluded"] else None
+        session.revision += 1
+        with phase("store_save"):
+            self.store.save(session, previous_revision if base_revision is not None else None)
+        if session.conclusion is not None and session.conclusion != previous_conclusion:
+            with phase("portfolio"):
+                self.portfolio.record(session)
+        module = engine.modules_by_id.get(session.current_module_id or "")
+        self._logger.info(
+            "back session=%s steps=%d module=%s restored=%s revision=%d",
+            session_id,
+            steps,
+            session.current_module_id,
+            restored,
+            session.revision,
+        )
+        note_answers(lang_value, session.answers)
+        return {
+            "session_id": session.id,
+            "revision": session.revision,
+            "restored": restored,
+            "history": len(session.history),
+            "answers": session.answers,
+            "parameters": session.parameters,
+            "module_id": session.current_module_id,
+            "module": self._module_payload(module, session.answers, session.parameters) if module else None,
+            "conclusion": session.conclusion,
+        }
+
+    def fork(self, session_id: str, module_id: str, lookahead: bool = False) -> tuple[Session, dict[str, Any]]:
+        """A child session that keeps the parent's answers before ``module_id`` and starts over from there.
+
+        The kept answers and the parameters they produce are stored once per distinct prefix and shared by
+        every fork of it; the child stores only its own changes and evaluates only the modules it re-answers."""
+        with phase("store_get"):
+            parent = self.store.get(session_id)
+        engine = self._engine(parent.lang)
+        module = engine.modules_by_id.get(module_id)
+        if not module:
+            raise HTTPException(status_code=404, detail="module_not_found")
+        index = engine.modules.index(module)
+        before = {question.id for earlier in engine.modules[:index] for question in earlier.questions}
+        answers = {qid: value for qid, value in parent.answers.items() if qid in before}
+        digest = hashlib.blake2b(
+            json.dumps([parent.lang, engine.version, module_id, answers], sort_keys=True).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        base = self.store.get_base(digest)
+        if base is None:
+            with phase("compute_parameters"):
+                prefix = self.evaluator.compute_prefix(engine, answers, index)
+                draft = SessionBase(digest, parent.lang, engine.version, module_id, index, answers, prefix, {})
+                parameters = self._compute(engine, dict(answers), draft)
+            # Forks are stored as changes against the parameters they are saved with, not the bare prefix.
+            base = SessionBase(digest, parent.lang, engine.version, module_id, index, answers, prefix, dict(parameters))
+            self.store.put_base(base)
+        else:
+            with phase("compute_parameters"):
+                parameters = self._compute(engine, dict(answers), base)
+        with phase("store_save"):
+            session = self.store.fork(parent, base, parameters)
+        note_answers(session.lang, session.answers)
+        payload = self._module_payload(module, session.answers, session.parameters)
+        if lookahead:
+            payload["lookahead"] = self._lookahead(engine, module, session.answers, payload)
+        return session, payload
+
+    def compare(self, session_id: str, other_id: str | None = None) -> dict[str, Any]:
+        """Two sessions side by side, by default a fork and its parent."""
+        with phase("store_get"):
+            session = self.store.get(session_id)
+            if not other_id and not session.parent_id:
+                raise HTTPException(status_code=400, detail="session_not_forked")
+            other = self.store.get(other_id or session.parent_id or "")
+        fields = ("Risk_level", "Type", "Role", "Risk_level_CN", "Type_CN", "Role_CN")
+        ours, theirs = session.conclusion or {}, other.conclusion or {}
+        shared = [qid for qid in session.answers if qid in other.answers]
+        return {
+            "session": self._side(session),
+            "other": self._side(other),
+            "differences": {
+                name: {"session": ours.get(name), "other": theirs.get(name)}
+                for name in fields
+                if ours.get(name) != theirs.get(name)
+            },
+            "answers": {
+                "changed": sorted(qid for qid in shared if session.answers[qid] != other.answers[qid]),
+                "only_session": sorted(qid for qid in session.answers if qid not in other.answers),
+                "only_other": sorted(qid for qid in other.answers if qid not in session.answers),
+            },
+        }
+
+    def _record_step(
+        self,
+        session: Session,
+        revision: int,
+        module_id: str | None,
+        answers: dict[str, Any],
+        parameters: dict[str, Any],
+        conclusion: dict[str, Any] | None,
+        rules: tuple[str, str | None],
+    ) -> None:
+        """Append what undoing this submission needs: the changed answers' previous values and a snapshot key
+        for the previous parameters, with the language and engine version they were computed under.
+
+        Revisions only grow, so the session id and revision name the parameters without serializing them."""
+        if not self.history_steps:
+            return
+        changed = {qid: value for qid, value in answers.items() if session.answers.get(qid, _MISSING) != value}
+        added = [qid for qid in session.answers if qid not in answers]
+        if not changed and not added and module_id == session.current_module_id:
+            return
+        session.history.append(
+            {
+                "revision": revision,
+                "module_id": module_id,
+                "set": changed,
+                "unset": added,
+                "params": self.snapshots.put(f"{session.id}:{revision}", parameters),
+                "lang": rules[0],
+                "version": rules[1],
+                "concluded": conclusion is not None,
+            }
+        )
+        del session.history[:-self.history_steps]
+
+    @staticmethod
+    def _side(session: Session) -> dict[str, Any]:
+        return {
+            "session_id": session.id,
+            "parent_id": session.parent_id,
+            "revision": session.revision,
+            "current_module_id": session.current_module_id,
+            "conclusion": session.conclusion,
+        }
+
+    def sensitivity(self, session_id: str, lang: str | None = None) -> dict[str, Any]:
+        """For a completed session, the conclusion under every single-answer change."""
+        with phase("store_get"):
+            session = self.store.get(session_id)
+        if session.conclusion is None:
+            raise HTTPException(status_code=409, detail="session_not_complete")
+        lang_value = self._normalize_lang(lang, session)
+        engine = self._engine(lang_value)
+        key = fingerprint({"lang": lang_value, "version": engine.version, "answers": session.answers})
+        with self._sensitivity_lock:
+            report = self._sensitivity.get(key)
+            if report is not None:
+                self._sensitivity.move_to_end(key)
+        if report is not None:
+            CACHE_REQUESTS.inc(cache="sensitivity", result="hit")
+        else:
+            CACHE_REQUESTS.inc(cache="sensitivity", result="miss")
+            # Analyzed outside the lock: concurrent misses on one key may both analyze, the last one stored wins.
+            with phase("sensitivity"):
+                report = self._sensitivity_analyzer.analyze(engine, dict(session.answers))
+            with self._sensitivity_lock:
+                self._sensitivity[key] = report
+                while len(self._sensitivity) > self._sensitivity_size:
+                    self._sensitivity.popitem(last=False)
+            self._logger.info(
+                "sensitivity session=%s lang=%s evaluations=%d drivers=%d",
+                session_id,
+                lang_value,
+                report["evaluations"],
+                len(report["drivers"]),
+            )
+        return {"session_id": session.id, "fingerprint": key, **report}
 
     def get_question(self, question_id: str, lang: str | None = None) -> dict[str, Any]:
         lang_value = self._normalize_lang(lang)
@@ -133,14 +520,168 @@ class QuestionnaireService:
             raise HTTPException(status_code=404, detail="question_not_found")
         return question.raw
 
+    def engine_version(self, lang: str | None = None) -> str:
+        return self._engine(self._normalize_lang(lang)).version
+
+    def cached_content(
+        self, lang: str | None, key: Hashable, build: Callable[[str], Any]
+    ) -> tuple[str, EncodedContent]:
+        lang_value = self._normalize_lang(lang)
+        version = self._engine(lang_value).version
+        return version, self.content_cache.get(lang_value, version, key, lambda: build(lang_value))
+
+    def rule_bundle(self, lang: str | None = None) -> dict[str, Any]:
+        lang_value = self._normalize_lang(lang)
+        engine = self._engine(lang_value)
+        cached = self._bundles.get(lang_value)
+        if cached and cached[0] == engine.version:
+            CACHE_REQUESTS.inc(cache="rule_bundle", result="hit")
+            return cached[1]
+        CACHE_REQUESTS.inc(cache="rule_bundle", result="miss")
+        bundle = self._bundle_builder.build(engine, lang_value)
+        self._bundles[lang_value] = (engine.version, bundle)
+        self._logger.info("rule_bundle_build lang=%s version=%s", lang_value, engine.version)
+        return bundle
+
+    def set_rule_profiling(self, enabled: bool) -> None:
+        if enabled and self.evaluator.profiler is None:
+            self.evaluator.profiler = RuleProfiler()
+        elif not enabled:
+            self.evaluator.profiler = None
+        self._logger.info("rule_profiling enabled=%s", enabled)
+
+    def reset_rule_profile(self) -> None:
+        if self.evaluator.profiler is not None:
+            self.evaluator.profiler.reset()
+
+    def rule_profile(self, lang: str | None = None) -> dict[str, Any]:
+        lang_value = self._normalize_lang(lang)
+        profiler = self.evaluator.profiler
+        return {
+            "enabled": profiler is not None,
+            "lang": lang_value,
+            "profile": (profiler or RuleProfiler()).report(self._engine(lang_value), lang_value),
+        }
+
+    def dump_rule_profile(self, lang: str | None = None) -> dict[str, Any]:
+        lang_value = self._normalize_lang(lang)
+        profiler = self.evaluator.profiler
+        if profiler is None:
+            raise HTTPException(status_code=409, detail="rule_profiling_disabled")
+        path = os.environ.get("RULE_PROFILE_FILE", "logs/rule_profile_{lang}.json").format(lang=lang_value)
+        report = profiler.dump(path, self._engine(lang_value), lang_value)
+        self._logger.info("rule_profile_dump lang=%s path=%s rules=%d", lang_value, path, len(report["rules"]))
+        return {"enabled": True, "lang": lang_value, "profile": report, "path": path}
+
+    def analytics_report(self, lang: str | None = None, flush: bool = False) -> dict[str, Any]:
+        if flush:
+            self.analytics.flush()
+        return self.analytics.report(self._normalize_lang(lang) if lang else None)
+
+    @staticmethod
+    def _parameters_diff(previous: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+        return {key: value for key, value in current.items() if key not in previous or previous[key] != value}
+
+    def _settle(
+        self, engine: Engine, module: ModuleDef, answers: dict[str, Any], base: SessionBase | None = None
+    ) -> dict[str, Any]:
+        with phase("compute_parameters"):
+            params = self._compute(engine, answers, base)
+        for _ in range(5):
+            with phase("prune"):
+                pruned = self.evaluator.prune_hidden_answers(module, answers, params)
+            if not pruned:
+                break
+            with phase("compute_parameters"):
+                params = self._compute(engine, answers, base)
+        return params
+
+    def _compute(self, engine: Engine, answers: dict[str, Any], base: SessionBase | None) -> dict[str, Any]:
+        """Parameters for ``answers``, continuing from a fork's base while its answers are still untouched."""
+        if base is None or base.version != engine.version:
+            return self.evaluator.compute_parameters(engine, answers)
+        before = self._prefix_questions(engine, base.module_index)
+        if before is None or {qid: value for qid, value in answers.items() if qid in before} != base.answers:
+            return self.evaluator.compute_parameters(engine, answers)
+        return self.evaluator.compute_parameters(engine, answers, resume=(base.module_index, base.parameters))
+
+    def _prefix_questions(self, engine: Engine, index: int) -> frozenset[str] | None:
+        key = (engine.version, index)
+        if key not in self._prefixes:
+            before = frozenset(question.id for module in engine.modules[:index] for question in module.questions)
+            later = {
+                self.evaluator.normalize_name(qid) for qid in engine.questions_by_id if qid not in before
+            }
+            reads = {
+                name
+                for module in engine.modules[:index]
+                for variable in module.variables
+                for rule in variable.rules
+                for name in self.evaluator.condition_names(rule.condition)
+            }
+            self._prefixes[key] = None if reads & later else before
+        return self._prefixes[key]
+
+    def _route(
+        self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]
+    ) -> tuple[bool, tuple[str, str | None, str | None]]:
+        complete = self.evaluator.module_complete(module, answers, params)
+        if not complete:
+            return complete, ("module", module.module_id, None)
+        return complete, self.evaluator.next_action(module, answers, params)
+
+    def _lookahead(
+        self, engine: Engine, module: ModuleDef, answers: dict[str, Any], payload: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        questions = payload.get("questions") or []
+        if not questions:
+            return None
+        question = module.questions_by_id.get(str(questions[0].get("id")))
+        if not question or question.id in answers:
+            return None
+        if question.qtype == "boolean":
+            values: list[Any] = [True, False]
+        elif question.qtype == "single_choice":
+            values = [opt.get("value") for opt in question.options or []]
+        else:
+            return None
+        branches: list[dict[str, Any]] = []
+        for value in values:
+            candidate = {**answers, question.id: value}
+            params = self._settle(engine, module, candidate)
+            complete, (next_type, next_module_id, message) = self._route(module, candidate, params)
+            next_payload = None
+            if not complete:
+                next_payload = self._module_payload(module, candidate, params)
+            elif next_type == "module":
+                next_module = engine.modules_by_id.get(next_module_id) if next_module_id else None
+                if next_module:
+                    next_payload = self._module_payload(next_module, candidate, params)
+            branches.append(
+                {
+                    "value": value,
+                    "next": {"type": next_type, "module_id": next_module_id, "message": message},
+                    "module_complete": complete,
+                    "module": next_payload,
+                }
+            )
+        return {"question_id": question.id, "options": branches}
+
+    def _module_payload(self, module: ModuleDef, answers: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+        with phase("module_payload"):
+            return self.evaluator.module_payload(module, answers, params)
+
     def _engine(self, lang: str) -> Engine:
         loader = self.loaders.get(lang) or self.loaders.get("en")
         if not loader:
             raise HTTPException(status_code=500, detail="engine_loader_missing")
-        return loader.get_engine()
+        with phase("engine"):
+            engine = loader.get_engine()
+        profiler = self.evaluator.profiler
+        if profiler is not None:
+            # Everything this thread evaluates next runs against this engine.
+            profiler.use(lang, engine.version)
+        return engine
 
     def _normalize_lang(self, lang: str | None, session: Session | None = None) -> str:
-        raw = (lang or (session.lang if session else "") or "en").lower()
-        if raw in {"zh", "cn", "zh-cn", "zh-hans", "zh-hans-cn"}:
-            return "cn"
-        return "en"
+        return normalize_lang(lang or (session.lang if session else None))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.app.tools.bench",
+        description="Hot-path benchmarks for the loader, evaluator, session store and HTTP walks.",
+    )
+    parser.add_argument("--suite", action="append", help="loader, evaluator, store or http (default: all)")
+    parser.add_argument("--lang", action="append", choices=["en", "cn"], help="default: en and cn")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--walks", type=int, default=20, help="random walks used to build answer sets")
+    parser.add_argument("--min-time", type=float, default=0.3, help="seconds spent timing each case")
+    parser.add_argument("--redis-url", help="also benchmark a real Redis backend")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output run")
+    parser.add_argument("--threshold", type=float, help="exit 1 if any case regresses by more than this percent")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    # Keep request logging out of the numbers unless explicitly configured.
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from .harness import compare, environment
+    from .suites import SUITES, BenchContext
+
+    suites = args.suite or list(SUITES)
+    unknown = [name for name in suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite: {', '.join(unknown)}")
+    ctx = BenchContext(args.lang or ["en", "cn"], args.seed, args.walks, args.min_time, args.redis_url)
+    results = [result.as_dict() for name in suites for result in SUITES[name](ctx)]
+    report = {
+        "environment": environment(),
+        "engine_versions": {lang: ctx.engine(lang).version for lang in ctx.langs},
+        "results": results,
+    }
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            comparison = compare(results, json.load(fh)["results"])
+        report["comparison"] = comparison
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        rows = comparison or results
+        for row in rows:
+            line = f"{row['name']:<48} {row['median_us']:12.1f}us"
+            if comparison is not None and row["change_pct"] is not None:
+                line += f"  {row['change_pct']:+7.1f}% vs {row['baseline_us']:.1f}us"
+            print(line)
+    if args.threshold is not None and comparison:
+        regressions = [row for row in comparison if (row["change_pct"] or 0) > args.threshold]
+        if regressions:
+            names = ", ".join(row["name"] for row in regressions)
+            print(f"regressions over {args.threshold}%: {names}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
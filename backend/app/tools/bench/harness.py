@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+
+@dataclass
+class BenchResult:
+    name: str
+    median_us: float
+    min_us: float
+    stdev_us: float
+    ops: int
+    repeats: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def measure(name: str, op: Callable[[], Any], min_time: float = 0.2, repeats: int = 5) -> BenchResult:
+    """Times `op` in batches sized so that every repeat runs for about `min_time / repeats` seconds."""
+    op()
+    target = min_time / repeats
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * target / max(elapsed, 1e-9)))
+    samples = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter() - start) / number)
+    return BenchResult(
+        name=name,
+        median_us=statistics.median(samples) * 1_000_000,
+        min_us=min(samples) * 1_000_000,
+        stdev_us=(statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1_000_000,
+        ops=number * len(samples),
+        repeats=len(samples),
+    )
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    previous = {row["name"]: row for row in baseline}
+    rows = []
+    for row in results:
+        before = previous.get(row["name"])
+        change = None
+        if before and before["median_us"]:
+            change = (row["median_us"] - before["median_us"]) / before["median_us"] * 100
+        rows.append(
+            {
+                "name": row["name"],
+                "median_us": row["median_us"],
+                "baseline_us": before["median_us"] if before else None,
+                "change_pct": change,
+            }
+        )
+    return rows
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import random
+import time
+from typing import Any, Callable, Iterator
+
+import httpx
+
+from .harness import BenchResult, measure
+from ..walker import Walk, walk_http, walk_service
+from ...config import DATA_DIR_CN, DATA_DIR_EN
+from ...domain.models import Engine
+from ...infra.content_cache import ContentCache
+from ...infra.loader import EngineLoader
+from ...infra.store import SessionStore
+from ...logic.evaluator import Evaluator
+from ...services.questionnaire import QuestionnaireService
+
+DATA_DIRS = {"en": DATA_DIR_EN, "cn": DATA_DIR_CN}
+
+
+class LocalRedis:
+    """In-process stand-in for the handful of redis-py calls SessionStore makes; values stay serialized strings."""
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[str, float]] = {}
+        self._zsets: dict[str, dict[str, float]] = {}
+
+    def setex(self, key: str, ttl: int, value: str) -> None:
+        self._data[key] = (value, time.time() + ttl)
+
+    def get(self, key: str) -> str | None:
+        entry = self._data.get(key)
+        return entry[0] if entry and entry[1] > time.time() else None
+
+    def mget(self, keys: list[str]) -> list[str | None]:
+        return [self.get(key) for key in keys]
+
+    def expire(self, key: str, ttl: int) -> None:
+        entry = self._data.get(key)
+        if entry:
+            self._data[key] = (entry[0], time.time() + ttl)
+
+    def scan_iter(self, match: str = "*", count: int = 1000) -> Iterator[str]:
+        return (key for key in list(self._data) if fnmatch.fnmatchcase(key, match))
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> None:
+        self._zsets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key: str, low: Any, high: float) -> int:
+        members = self._zsets.get(key, {})
+        removed = [member for member, score in members.items() if score <= high]
+        for member in removed:
+            del members[member]
+        return len(removed)
+
+    def zcard(self, key: str) -> int:
+        return len(self._zsets.get(key, {}))
+
+    def pipeline(self, transaction: bool = True) -> "LocalPipeline":
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """Queues calls and runs them in order on :meth:`execute`, like a redis-py pipeline."""
+
+    def __init__(self, client: LocalRedis) -> None:
+        self._client = client
+        self._calls: list[tuple[str, tuple[Any, ...]]] = []
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        def queue(*args: Any) -> None:
+            self._calls.append((name, args))
+
+        return queue
+
+    def execute(self) -> list[Any]:
+        calls, self._calls = self._calls, []
+        return [getattr(self._client, name)(*args) for name, args in calls]
+
+
+class BenchContext:
+    def __init__(self, langs: list[str], seed: int, walks: int, min_time: float, redis_url: str | None) -> None:
+        self.langs = langs
+        self.seed = seed
+        self.min_time = min_time
+        self.redis_url = redis_url
+        self.loaders = {lang: EngineLoader(DATA_DIRS[lang]) for lang in DATA_DIRS}
+        self.evaluator = Evaluator()
+        self.service = QuestionnaireService(self.loaders, self.evaluator, SessionStore(), ContentCache())
+        rnd = random.Random(seed)
+        self.walks: dict[str, list[Walk]] = {
+            lang: [walk_service(self.service, lang, rnd) for _ in range(walks)] for lang in langs
+        }
+
+    def engine(self, lang: str) -> Engine:
+        return self.loaders[lang].get_engine()
+
+    def measure(self, name: str, op: Callable[[], Any], min_time: float | None = None) -> BenchResult:
+        return measure(name, op, min_time=min_time or self.min_time)
+
+
+def _cycle(items: list[Any]) -> Callable[[], Any]:
+    state = {"index": -1}
+
+    def next_item() -> Any:
+        state["index"] = (state["index"] + 1) % len(items)
+        return items[state["index"]]
+
+    return next_item
+
+
+def loader_suite(ctx: BenchContext) -> list[BenchResult]:
+    results = []
+    for lang in ctx.langs:
+        loader = EngineLoader(DATA_DIRS[lang])
+        results.append(ctx.measure(f"loader.cold.{lang}", loader._load_engine, min_time=max(ctx.min_time, 1.0)))
+        loader.get_engine()
+        results.append(ctx.measure(f"loader.cached.{lang}", loader.get_engine))
+    return results
+
+
+def evaluator_suite(ctx: BenchContext) -> list[BenchResult]:
+    results = []
+    evaluator = ctx.evaluator
+    for lang in ctx.langs:
+        engine = ctx.engine(lang)
+        steps = [step for walk in ctx.walks[lang] for step in walk.steps]
+        answer_sets = {
+            "empty": [{}],
+            "partial": [walk.steps[len(walk.steps) // 2].answers for walk in ctx.walks[lang]],
+            "complete": [walk.steps[-1].answers for walk in ctx.walks[lang]],
+        }
+        for label, sets in answer_sets.items():
+            next_answers = _cycle(sets)
+            results.append(
+                ctx.measure(
+                    f"evaluator.compute_parameters.{label}.{lang}",
+                    lambda: evaluator.compute_parameters(engine, next_answers()),
+                )
+            )
+        module_steps = [
+            (engine.modules_by_id[step.module_id], step.answers, step.parameters)
+            for step in steps
+            if step.module_id in engine.modules_by_id
+        ]
+        next_step = _cycle(module_steps)
+        results.append(
+            ctx.measure(f"evaluator.module_payload.{lang}", lambda: evaluator.module_payload(*next_step()))
+        )
+        results.append(
+            ctx.measure(f"evaluator.module_complete.{lang}", lambda: evaluator.module_complete(*next_step()))
+        )
+    return results
+
+
+def store_suite(ctx: BenchContext) -> list[BenchResult]:
+    backends: dict[str, Any] = {"memory": None, "redis_standin": LocalRedis()}
+    if ctx.redis_url:
+        import redis
+
+        backends["redis"] = redis.Redis.from_url(ctx.redis_url, decode_responses=True)
+    walk = max((walk for walks in ctx.walks.values() for walk in walks), key=lambda item: len(item.steps))
+    results = []
+    for name, client in backends.items():
+        store = SessionStore()
+        if client is not None:
+            store._redis = client
+            store._backend = "redis"
+        session = store.create(walk.steps[0].module_id, walk.lang)
+        session.answers = dict(walk.steps[-1].answers)
+        session.parameters = dict(walk.steps[-1].parameters)
+        store.save(session)
+        results.append(ctx.measure(f"store.{name}.save", lambda: store.save(session)))
+        results.append(ctx.measure(f"store.{name}.get", lambda: store.get(session.id)))
+    return results
+
+
+def http_suite(ctx: BenchContext) -> list[BenchResult]:
+    from ...app_factory import create_app
+
+    app = create_app()
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    results = []
+    try:
+        for lang in ctx.langs:
+            rnd = random.Random(ctx.seed)
+            requests: list[int] = []
+
+            def op() -> None:
+                requests.append(loop.run_until_complete(walk_http(client, lang, rnd)))
+
+            result = ctx.measure(f"http.walk.{lang}", op, min_time=max(ctx.min_time, 1.0))
+            results.append(result)
+            per_request = result.median_us / (sum(requests) / len(requests))
+            results.append(
+                BenchResult(
+                    name=f"http.request.{lang}",
+                    median_us=per_request,
+                    min_us=result.min_us / (sum(requests) / len(requests)),
+                    stdev_us=result.stdev_us / (sum(requests) / len(requests)),
+                    ops=sum(requests),
+                    repeats=result.repeats,
+                )
+            )
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    return results
+
+
+SUITES: dict[str, Callable[[BenchContext], list[BenchResult]]] = {
+    "loader": loader_suite,
+    "evaluator": evaluator_suite,
+    "store": store_suite,
+    "http": http_suite,
+}
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+import httpx
+from fastapi import FastAPI
+
+from ..api.middleware import RequestIdFilter, RequestLoggingMiddleware
+from ..api.routers import router as api_router
+from ..infra.log_pipeline import TEXT_FORMAT, configure_logging
+
+VARIANTS = {
+    "sync": {},
+    "queue": {},
+    "queue_sampled": {"LOG_SAMPLE_RATES": "request_start=0.1,request_end=0.1,module_get=0.1"},
+}
+
+
+def _sync_logging(log_file: str) -> logging.Logger:
+    request_id_filter = RequestIdFilter()
+    logging.basicConfig(level="INFO", format=TEXT_FORMAT)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(request_id_filter)
+    file_handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=5, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    file_handler.addFilter(request_id_filter)
+    logger = logging.getLogger("aiq")
+    logger.addHandler(file_handler)
+    return logger
+
+
+def _app(variant: str, log_file: str) -> FastAPI:
+    os.environ["LOG_FILE"] = log_file
+    os.environ.update(VARIANTS[variant])
+    logger = _sync_logging(log_file) if variant == "sync" else configure_logging([RequestIdFilter()])
+    app = FastAPI()
+    app.add_middleware(RequestLoggingMiddleware, logger=logger)
+    app.include_router(api_router)
+    return app
+
+
+async def _run(app: FastAPI, requests: int, rate: float) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    latencies: list[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = (await client.post("/start")).json()
+        session_id = started["session_id"]
+        question_id = started["module"]["questions"][0]["id"]
+        start = time.perf_counter()
+        for index in range(requests):
+            delay = start + index / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent = time.perf_counter()
+            if index % 2:
+                response = await client.get(f"/question/{question_id}")
+            else:
+                response = await client.get("/module/1", params={"session_id": session_id})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - sent) * 1000)
+    return latencies
+
+
+def _measure(variant: str, requests: int, rate: float) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, "app.log")
+        latencies = asyncio.run(_run(_app(variant, log_file), requests, rate))
+        logging.shutdown()
+        with open(log_file, "rb") as fh:
+            data = fh.read()
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+        "log_lines": data.count(b"\n"),
+        "log_bytes_per_request": len(data) / requests,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Request latency and log volume of the logging pipeline variants.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000.0, help="paced requests per second")
+    parser.add_argument("--variant", choices=sorted(VARIANTS), help="run a single variant in this process")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    if args.variant:
+        print(json.dumps(_measure(args.variant, args.requests, args.rate)))
+        return
+    results = {}
+    for variant in VARIANTS:
+        # Logging configuration is process-global, so every variant gets a fresh interpreter.
+        completed = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--variant", variant, "--requests", str(args.requests),
+             "--rate", str(args.rate)],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        results[variant] = json.loads(completed.stdout)
+    if args.json:
+        print(json.dumps(results))
+        return
+    for name, values in results.items():
+        print(
+            f"{name:<14} p50={values['p50_ms']:.3f}ms p99={values['p99_ms']:.3f}ms "
+            f"lines={values['log_lines']} bytes/request={values['log_bytes_per_request']:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request
+
+from ..api.middleware import RequestIdFilter, RequestLoggingMiddleware
+
+
+def _logger() -> logging.Logger:
+    logger = logging.getLogger("aiq.bench_middleware")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler(open(os.devnull, "w", encoding="utf-8"))
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s rid=%(request_id)s %(message)s"))
+        handler.addFilter(RequestIdFilter())
+        logger.addHandler(handler)
+    return logger
+
+
+def _base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    return app
+
+
+def _legacy_app(logger: logging.Logger) -> FastAPI:
+    app = _base_app()
+
+    @app.middleware("http")
+    async def request_logging(request: Request, call_next):
+        request_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        logger.info(
+            "request_start id=%s method=%s path=%s query=%s client=%s ua=%s",
+            request_id,
+            request.method,
+            request.url.path,
+            request.url.query,
+            request.client.host if request.client else "",
+            request.headers.get("user-agent", ""),
+        )
+        response = await call_next(request)
+        duration_ms = (time.perf_counter() - start) * 1000
+        logger.info("request_end id=%s status=%s duration_ms=%.2f", request_id, response.status_code, duration_ms)
+        return response
+
+    return app
+
+
+def _asgi_app(logger: logging.Logger) -> FastAPI:
+    app = _base_app()
+    app.add_middleware(RequestLoggingMiddleware, logger=logger)
+    return app
+
+
+async def _run(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/health")
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/health")
+        return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Per-request cost of the request logging middleware.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    logger = _logger()
+    results = {
+        "none_us": asyncio.run(_run(_base_app(), args.requests)),
+        "base_http_middleware_us": asyncio.run(_run(_legacy_app(logger), args.requests)),
+        "asgi_middleware_us": asyncio.run(_run(_asgi_app(logger), args.requests)),
+    }
+    if args.json:
+        print(json.dumps(results))
+        return
+    for name, value in results.items():
+        print(f"{name:<26} {value:8.1f}us/request")
+
+
+if __name__ == "__main__":
+    main()
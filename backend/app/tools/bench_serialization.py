@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable
+
+from pydantic import BaseModel
+
+from ..api.schemas import ModuleResponse, QuestionResponse, ResultResponse, StartResponse, SubmitResponse
+from ..config import DATA_DIR_EN
+from ..infra.loader import EngineLoader
+from ..infra.serialization import encode_json, encode_msgpack, msgpack_available
+from ..logic.evaluator import Evaluator
+
+
+def _sample_payloads() -> dict[str, tuple[type[BaseModel], dict[str, Any]]]:
+    engine = EngineLoader(DATA_DIR_EN).get_engine()
+    evaluator = Evaluator()
+    answers: dict[str, Any] = {}
+    for question in engine.questions_by_id.values():
+        options = question.options or []
+        if question.qtype == "boolean":
+            answers[question.id] = False
+        elif options:
+            value = options[0].get("value")
+            answers[question.id] = [value] if question.qtype in {"multi_choice", "multiple_choice"} else value
+    params = evaluator.compute_parameters(engine, answers)
+    module = evaluator.module_payload(engine.modules[4], {}, params)
+    conclusion = evaluator.compute_conclusion(params)
+    question = next(iter(engine.questions_by_id.values())).raw
+    return {
+        "/start": (
+            StartResponse,
+            {"session_id": "0" * 32, "module": module, "revision": 0, "engine_version": engine.version},
+        ),
+        "/module/{module_id}": (ModuleResponse, {"module": module}),
+        "/submit-answer": (
+            SubmitResponse,
+            {
+                "session_id": "0" * 32,
+                "revision": 3,
+                "pruned": [],
+                "parameters": params,
+                "parameters_base": None,
+                "next": {"type": "module", "module_id": "5", "message": None},
+                "module_complete": False,
+                "module": module,
+                "conclusion": conclusion,
+            },
+        ),
+        "/result": (ResultResponse, {"parameters": params, "conclusion": conclusion, "revision": 3}),
+        "/question/{question_id}": (QuestionResponse, {"question": question}),
+    }
+
+
+def _pydantic_path(model: type[BaseModel], payload: dict[str, Any]) -> bytes:
+    content = model.model_validate(payload).model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _timed(fn: Callable[[], bytes], iterations: int) -> tuple[float, int]:
+    size = len(fn())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000, size
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare response serialization paths per endpoint.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    results: list[dict[str, Any]] = []
+    for endpoint, (model, payload) in _sample_payloads().items():
+        row: dict[str, Any] = {"endpoint": endpoint}
+        row["pydantic_us"], row["json_bytes"] = _timed(lambda: _pydantic_path(model, payload), args.iterations)
+        row["fast_us"], _ = _timed(lambda: encode_json(payload), args.iterations)
+        if msgpack_available():
+            row["msgpack_us"], row["msgpack_bytes"] = _timed(lambda: encode_msgpack(payload), args.iterations)
+        results.append(row)
+    if args.json:
+        print(json.dumps(results))
+        return
+    for row in results:
+        print(
+            f"{row['endpoint']:<26} pydantic={row['pydantic_us']:8.1f}us fast={row['fast_us']:7.1f}us "
+            f"msgpack={row.get('msgpack_us', float('nan')):7.1f}us json={row['json_bytes']}B "
+            f"msgpack={row.get('msgpack_bytes', 0)}B"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+
+from fastapi import HTTPException
+
+from .walker import pick_answer, walk_service
+from ..config import DATA_DIR_CN, DATA_DIR_EN
+from ..domain.models import Engine, QuestionDef
+from ..infra.loader import EngineLoader
+from ..infra.store import SessionStore
+from ..logic.evaluator import Evaluator
+from ..services.questionnaire import QuestionnaireService
+
+DATA_DIRS = {"en": DATA_DIR_EN, "cn": DATA_DIR_CN}
+REPO_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_RUNNER = "npx --no-install jiti"
+DEFAULT_SCRIPT = "src/logic/__tests__/ruleEngine.conformance.ts"
+MULTI_TYPES = {"multi_choice", "multiple_choice"}
+
+
+def _question_spec(question: QuestionDef) -> dict[str, Any]:
+    return {"type": question.qtype, "options": question.options or []}
+
+
+def answer_sets(
+    service: QuestionnaireService, engine: Engine, lang: str, walks: int, rnd: random.Random
+) -> Iterator[dict[str, Any]]:
+    """Answer sets taken from random valid walks, each step also perturbed: answers dropped (leaving later
+    answers without the ones their visibility hangs on) and arbitrary questions answered out of turn."""
+    questions = list(engine.questions_by_id.values())
+    for _ in range(walks):
+        for step in walk_service(service, lang, rnd).steps:
+            yield dict(step.answers)
+            perturbed = dict(step.answers)
+            for qid in rnd.sample(sorted(perturbed), min(len(perturbed), rnd.randint(0, 2))):
+                del perturbed[qid]
+            for question in rnd.sample(questions, rnd.randint(1, 3)):
+                perturbed[question.id] = pick_answer(_question_spec(question), rnd)
+            yield perturbed
+
+
+def probes(question: QuestionDef, rnd: random.Random) -> list[Any]:
+    """One valid answer and a handful of invalid ones for ``validate_answer``."""
+    values = [opt.get("value") for opt in question.options or []]
+    result = [pick_answer(_question_spec(question), rnd)]
+    if question.qtype == "boolean":
+        result += [1, "true", None]
+    elif question.qtype == "single_choice":
+        result += ["__not_an_option__", True]
+    elif question.qtype in MULTI_TYPES and values:
+        exclusives = [opt.get("value") for opt in question.options or [] if opt.get("exclusive")]
+        result += [values[0], [values[0], values[0]], [values[0], "__not_an_option__"], []]
+        if exclusives and len(values) > 1:
+            result.append([exclusives[0], next(value for value in values if value != exclusives[0])])
+    return result
+
+
+class Expected:
+    """What the server evaluator decides for one answer set, in the shape the TypeScript runner reports."""
+
+    def __init__(self, engine: Engine, evaluator: Evaluator) -> None:
+        self.engine = engine
+        self.evaluator = evaluator
+
+    def parameters(self, answers: dict[str, Any]) -> dict[str, Any]:
+        # The bundle carries no templates, so templated parameters are compared before rendering.
+        params = self.evaluator.compute_parameters(self.engine, answers)
+        if self.engine.templated_params:
+            raw = self.evaluator.compute_prefix(self.engine, answers, len(self.engine.modules))
+            params.update({key: raw[key] for key in self.engine.templated_params if key in raw})
+        return params
+
+    def case(self, answers: dict[str, Any], module_id: str, values: list[list[Any]]) -> dict[str, Any]:
+        evaluator = self.evaluator
+        params = self.parameters(answers)
+        modules = {}
+        for module in self.engine.modules:
+            questions = evaluator.module_payload(module, answers, params)["questions"]
+            modules[module.module_id] = {
+                "current": questions[0]["id"] if questions else None,
+                "complete": evaluator.module_complete(module, answers, params),
+            }
+        settled = dict(answers)
+        module = self.engine.modules_by_id[module_id]
+        settled_params = params
+        for _ in range(5):
+            if not evaluator.prune_hidden_answers(module, settled, settled_params):
+                break
+            settled_params = self.parameters(settled)
+        errors = []
+        for qid, value in values:
+            try:
+                evaluator.validate_answer(self.engine.questions_by_id[qid], value)
+                errors.append(None)
+            except HTTPException as exc:
+                errors.append(exc.detail)
+        return {
+            "parameters": params,
+            "visible": {
+                question.id: evaluator.question_visible(question, answers, params)
+                for question in self.engine.questions_by_id.values()
+            },
+            "modules": modules,
+            "settled": {"answers": settled, "parameters": settled_params},
+            "errors": errors,
+        }
+
+
+def build_cases(lang: str, walks: int, seed: int) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    evaluator = Evaluator()
+    loader = EngineLoader(DATA_DIRS[lang])
+    service = QuestionnaireService({lang: loader}, evaluator, SessionStore())
+    engine = loader.get_engine()
+    expected = Expected(engine, evaluator)
+    rnd = random.Random(seed)
+    questions = list(engine.questions_by_id.values())
+    cases = []
+    for answers in answer_sets(service, engine, lang, walks, rnd):
+        module_id = rnd.choice(engine.modules).module_id
+        values = [[question.id, value] for question in rnd.sample(questions, 3) for value in probes(question, rnd)]
+        case = {"answers": answers, "module_id": module_id, "values": values}
+        # JSON round trip, so both sides compare what the client would actually receive.
+        case["expected"] = json.loads(json.dumps(expected.case(answers, module_id, values)))
+        cases.append(case)
+    return service.rule_bundle(lang), cases
+
+
+def diff(expected: Any, actual: Any, path: str = "") -> list[str]:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        problems = []
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual or key not in expected:
+                problems.append(f"{path}.{key}: expected {expected.get(key)!r}, got {actual.get(key)!r}")
+            else:
+                problems.extend(diff(expected[key], actual[key], f"{path}.{key}"))
+        return problems
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        return [
+            problem for index, pair in enumerate(zip(expected, actual)) for problem in diff(*pair, f"{path}[{index}]")
+        ]
+    # bool is an int subclass: True and 1 are different answers to the client.
+    if expected != actual or (type(expected) is bool) != (type(actual) is bool):
+        return [f"{path}: expected {expected!r}, got {actual!r}"]
+    return []
+
+
+def run_runner(runner: str, script: str, bundle: dict[str, Any], cases: list[dict[str, Any]]) -> list[Any]:
+    with tempfile.NamedTemporaryFile("w", suffix=".json", encoding="utf-8", delete=False) as fh:
+        inputs = [{key: case[key] for key in ("answers", "module_id", "values")} for case in cases]
+        json.dump({"bundle": bundle, "cases": inputs}, fh, ensure_ascii=False)
+        path = fh.name
+    try:
+        completed = subprocess.run(
+            [*shlex.split(runner), script, path], cwd=REPO_ROOT, capture_output=True, text=True, check=False
+        )
+    finally:
+        os.unlink(path)
+    if completed.returncode != 0:
+        raise SystemExit(f"runner failed ({completed.returncode}): {completed.stderr.strip()}")
+    return json.loads(completed.stdout)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check the TypeScript bundle evaluator (src/logic/ruleEngine.ts) against the Python evaluator "
+        "on the same randomized answer sets."
+    )
+    parser.add_argument("--lang", action="append", choices=["en", "cn"], help="default: en and cn")
+    parser.add_argument("--walks", type=int, default=200, help="random walks per language")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runner", default=DEFAULT_RUNNER, help="command that executes a TypeScript file")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT)
+    parser.add_argument("--show", type=int, default=20, help="mismatches to print")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    failures = 0
+    for lang in args.lang or ["en", "cn"]:
+        bundle, cases = build_cases(lang, args.walks, args.seed)
+        results = run_runner(args.runner, args.script, bundle, cases)
+        mismatched = 0
+        for index, (case, actual) in enumerate(zip(cases, results)):
+            problems = diff(case["expected"], actual)
+            if problems:
+                mismatched += 1
+                if failures < args.show:
+                    print(f"{lang} case {index} answers={json.dumps(case['answers'], ensure_ascii=False)}")
+                    for problem in problems[:10]:
+                        print(f"  {problem}")
+                failures += 1
+        if len(results) != len(cases):
+            print(f"{lang}: runner returned {len(results)} results for {len(cases)} cases")
+            failures += 1
+        print(f"{lang} {bundle['version']}: {len(cases)} answer sets, {mismatched} mismatched")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,647 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from .walker import MAX_STEPS
+from ..config import DATA_DIR_CN, DATA_DIR_EN
+from ..domain.models import Engine, ModuleDef, QuestionDef
+from ..infra.loader import EngineLoader
+from ..infra.store import SessionStore
+from ..logic.evaluator import Evaluator
+from ..logic.profiler import RuleProfiler, iter_rules
+from ..services.questionnaire import QuestionnaireService
+
+DATA_DIRS = {"en": DATA_DIR_EN, "cn": DATA_DIR_CN}
+MULTI_TYPES = {"multi_choice", "multiple_choice"}
+_MISSING = "<missing>"
+
+
+@dataclass(frozen=True)
+class AnswerClass:
+    """Answers a question accepts that no condition can tell apart; ``value`` is the one explored."""
+
+    label: Any
+    value: Any
+    weight: int
+
+
+@dataclass(frozen=True)
+class Refs:
+    questions: frozenset[str]
+    variables: frozenset[str]
+    dynamic: bool
+
+
+@dataclass
+class State:
+    module_id: str
+    answers: dict[str, Any]
+    parameters: dict[str, Any]
+
+
+class EngineAnalysis:
+    """Static facts about an engine: what each condition reads, which modules stay reachable, and how
+    multi-choice answers collapse into the classes the conditions can observe."""
+
+    def __init__(self, engine: Engine, evaluator: Evaluator) -> None:
+        self.engine = engine
+        self.evaluator = evaluator
+        normalize = evaluator._normalize_name
+        self._question_names = {normalize(qid): qid for qid in engine.questions_by_id}
+        self.variables = [variable for module in engine.modules for variable in module.variables]
+        self._variable_names = {normalize(variable.name): variable.name for variable in self.variables}
+        self.variable_order = {variable.name: index for index, variable in enumerate(self.variables)}
+        self.refs: dict[str, Refs] = {}
+        self.probes: dict[str, list[Any]] = {}
+        self._opaque: set[str] = set()
+        self._observed: dict[str, set[Any]] = {}
+        for _, expr in iter_rules(engine):
+            self._analyse(expr)
+        for template in engine.templates.values():
+            for name in template.placeholders:
+                if name in engine.questions_by_id:
+                    self._opaque.add(name)
+        self._close_variables()
+        self.classes = {qid: self._answer_classes(question) for qid, question in engine.questions_by_id.items()}
+        self.reachable = {module.module_id: self._reachable(module.module_id) for module in engine.modules}
+        self.open_questions = {
+            module_id: [
+                question
+                for module in engine.modules
+                if module.module_id in reachable
+                for question in module.questions
+            ]
+            for module_id, reachable in self.reachable.items()
+        }
+
+    def _analyse(self, expr: str) -> None:
+        if expr in self.refs:
+            return
+        tree = self.evaluator.compile_condition(expr)
+        questions: set[str] = set()
+        variables: set[str] = set()
+        dynamic = False
+
+        def visit(node: Any, parent: str | None) -> None:
+            nonlocal dynamic
+            if not isinstance(node, list) or not node:
+                return
+            if node[0] == "var":
+                name = node[1]
+                if name in self._question_names:
+                    qid = self._question_names[name]
+                    questions.add(qid)
+                    # Bare truthiness is fine: a valid multi-choice answer is never empty.
+                    if parent not in {"and", "or", "not"} and self._is_multi(qid):
+                        self._opaque.add(qid)
+                elif name in self._variable_names:
+                    variables.add(self._variable_names[name])
+                elif name == "Module_finished":
+                    dynamic = True
+                return
+            if node[0] in {"in", "not in"} and isinstance(node[2], list) and node[2][:1] == ["var"]:
+                qid = self._question_names.get(node[2][1])
+                if qid and self._is_multi(qid) and not isinstance(node[1], list):
+                    questions.add(qid)
+                    self._observed.setdefault(qid, set()).add(node[1])
+                    return
+            for child in node[1:]:
+                visit(child, node[0])
+
+        visit(tree, None)
+        self.refs[expr] = Refs(frozenset(questions), frozenset(variables), dynamic)
+
+    def _is_multi(self, qid: str) -> bool:
+        return self.engine.questions_by_id[qid].qtype in MULTI_TYPES
+
+    def _close_variables(self) -> None:
+        """Expand every variable to the answers it is ultimately computed from."""
+        placeholders = {name for template in self.engine.templates.values() for name in template.placeholders}
+        direct: dict[str, tuple[set[str], set[str], bool]] = {}
+        for variable in self.variables:
+            questions: set[str] = set()
+            variables: set[str] = set()
+            dynamic = False
+            for rule in variable.rules:
+                refs = self.refs[rule.condition]
+                questions |= refs.questions
+                variables |= refs.variables
+                dynamic = dynamic or refs.dynamic
+            if variable.name in self.engine.templated_params:
+                questions |= {name for name in placeholders if name in self.engine.questions_by_id}
+                variables |= {name for name in placeholders if name in self.variable_order}
+            direct[variable.name] = (questions, variables, dynamic)
+        self.variable_answers = {name: set(entry[0]) for name, entry in direct.items()}
+        self.variable_dynamic = {name: entry[2] for name, entry in direct.items()}
+        changed = True
+        while changed:
+            changed = False
+            for name, (_, variables, _) in direct.items():
+                for other in variables:
+                    if not self.variable_answers[other] <= self.variable_answers[name]:
+                        self.variable_answers[name] |= self.variable_answers[other]
+                        changed = True
+                    if self.variable_dynamic[other] and not self.variable_dynamic[name]:
+                        self.variable_dynamic[name] = True
+                        changed = True
+
+    def answers_of(self, refs: Refs) -> set[str]:
+        answers = set(refs.questions)
+        for name in refs.variables:
+            answers |= self.variable_answers[name]
+        return answers
+
+    def dynamic(self, refs: Refs) -> bool:
+        return refs.dynamic or any(self.variable_dynamic[name] for name in refs.variables)
+
+    def _answer_classes(self, question: QuestionDef) -> list[AnswerClass]:
+        values = [opt.get("value") for opt in question.options or []]
+        if question.qtype == "boolean":
+            return [AnswerClass(True, True, 1), AnswerClass(False, False, 1)]
+        if question.qtype == "single_choice":
+            return [AnswerClass(value, value, 1) for value in values]
+        if question.qtype not in MULTI_TYPES:
+            return [AnswerClass(None, None, 1)]
+        exclusives = [opt.get("value") for opt in question.options or [] if opt.get("exclusive")]
+        pool = [value for value in values if value not in exclusives]
+        if question.id in self._opaque:
+            probes = list(pool)
+        else:
+            observed = self._observed.get(question.id, set())
+            probes = [value for value in pool if value in observed]
+        self.probes[question.id] = probes + exclusives
+        free = [value for value in pool if value not in probes]
+        classes = [AnswerClass([value], [value], 1) for value in exclusives]
+        for mask in range(1 << len(probes)):
+            chosen = [value for bit, value in enumerate(probes) if mask >> bit & 1]
+            weight = 1 << len(free)
+            if not chosen:
+                if not free:
+                    continue
+                # Only non-empty answers validate, so the empty selection of the free options is not a path.
+                classes.append(AnswerClass([], [free[0]], weight - 1))
+            else:
+                classes.append(AnswerClass(chosen, chosen, weight))
+        return classes
+
+    def _reachable(self, module_id: str) -> set[str]:
+        seen = {module_id}
+        stack = [module_id]
+        while stack:
+            module = self.engine.modules_by_id.get(stack.pop())
+            for rule in module.router if module else []:
+                target = rule.target_module_id
+                if target and target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return seen
+
+
+class Explorer:
+    """Depth-first enumeration of every answer path, one submitted answer per step exactly like a client.
+
+    States are memoized on a canonical key: answers that can never change again (questions of modules the
+    router cannot return to, and questions whose visibility is already settled) are replaced by what the
+    remaining conditions can still observe of them, so prefixes that differ only in irrelevant detail share
+    one subtree."""
+
+    def __init__(self, lang: str) -> None:
+        self.lang = lang
+        self.evaluator = Evaluator()
+        loader = EngineLoader(DATA_DIRS[lang])
+        self.service = QuestionnaireService({lang: loader}, self.evaluator, SessionStore())
+        self.engine = loader.get_engine()
+        self.analysis = EngineAnalysis(self.engine, self.evaluator)
+        self.nodes: dict[str, dict[str, Any]] = {}
+        self.shown: set[str] = set()
+        self.entered: set[str] = set()
+        self.fired: set[str] = set()
+        self._truths: dict[tuple[str, str], bool] = {}
+        self._active: set[str] = set()
+
+    def root(self) -> State:
+        module = self.engine.modules[0]
+        return State(module.module_id, {}, self.evaluator.compute_parameters(self.engine, {}))
+
+    def explore(self, state: State) -> str:
+        key = self.key(state)
+        if key in self.nodes:
+            return key
+        if key in self._active:
+            return self._outcome({"error": "loop", "module_id": state.module_id})
+        self._active.add(key)
+        node, children = self.expand(state)
+        for edge, child in zip(node["edges"], children):
+            edge[2] = child if isinstance(child, str) else self.explore(child)
+        self._active.discard(key)
+        self.nodes[key] = node
+        return key
+
+    def expand(self, state: State) -> tuple[dict[str, Any], list[State | str]]:
+        """One step: the question the client is shown and where every class of answer to it leads."""
+        module = self.engine.modules_by_id[state.module_id]
+        self.entered.add(module.module_id)
+        payload = self.evaluator.module_payload(module, state.answers, state.parameters)
+        questions = [q for q in payload["questions"] if str(q.get("id")) not in state.answers]
+        node: dict[str, Any] = {"module": module.module_id, "question": None, "edges": []}
+        children: list[State | str] = []
+        if questions:
+            qid = str(questions[0]["id"])
+            node["question"] = qid
+            self.shown.add(qid)
+            classes = self.analysis.classes[qid]
+        else:
+            classes = [AnswerClass(None, None, 1)]
+        for answer in classes:
+            answers = dict(state.answers)
+            if node["question"] is not None:
+                answers[node["question"]] = answer.value
+            node["edges"].append([answer.label, answer.weight, None])
+            children.append(self._submit(module, answers))
+        return node, children
+
+    def _submit(self, module: ModuleDef, answers: dict[str, Any]) -> State | str:
+        params = self.service._settle(self.engine, module, answers)
+        self.evaluator.profiler = profiler = RuleProfiler()
+        try:
+            complete, (next_type, next_module_id, _) = self.service._route(module, answers, params)
+        finally:
+            self.evaluator.profiler = None
+        self._record(profiler, "router")
+        if not complete:
+            return State(module.module_id, answers, params)
+        if next_type == "result":
+            self.evaluator.profiler = profiler = RuleProfiler()
+            try:
+                self.evaluator.compute_parameters(self.engine, answers)
+            finally:
+                self.evaluator.profiler = None
+            self._record_variables(profiler)
+            return self._outcome(self.evaluator.compute_conclusion(params))
+        if next_module_id not in self.engine.modules_by_id:
+            return self._outcome({"error": "missing_module", "module_id": next_module_id})
+        return State(next_module_id, answers, params)
+
+    def _outcome(self, conclusion: dict[str, Any]) -> str:
+        key = "outcome:" + _digest(conclusion)
+        self.nodes.setdefault(key, {"outcome": conclusion})
+        return key
+
+    def _record(self, profiler: RuleProfiler, kind: str) -> None:
+        for row in profiler.report()["rules"]:
+            if row["true"] and row["kind"] == kind:
+                self.fired.add(row["rule_id"])
+
+    def _record_variables(self, profiler: RuleProfiler) -> None:
+        # List-variable "else" rules are recorded as true whenever their fallback applied.
+        self.fired |= {row["rule_id"] for row in profiler.report()["rules"] if row["true"]}
+
+    def _truth(self, expr: str, answers: dict[str, Any], params: dict[str, Any]) -> bool:
+        refs = self.analysis.refs[expr]
+        values = [answers.get(qid, _MISSING) for qid in sorted(refs.questions)]
+        values += [params.get(name) for name in sorted(refs.variables)]
+        cache_key = (expr, repr(values))
+        truth = self._truths.get(cache_key)
+        if truth is None:
+            truth = self._truths[cache_key] = self.evaluator.eval_condition(expr, answers, params)
+        return truth
+
+    def frozen(self, state: State) -> set[str]:
+        """Question ids whose answer (or absence) can no longer change on any path from ``state``."""
+        analysis = self.analysis
+        open_questions = analysis.open_questions[state.module_id]
+        frozen = set(self.engine.questions_by_id) - {question.id for question in open_questions}
+        changed = True
+        while changed:
+            changed = False
+            for question in open_questions:
+                if question.id in frozen:
+                    continue
+                visible = True
+                if question.dependency:
+                    refs = analysis.refs[question.dependency]
+                    if analysis.dynamic(refs) or not analysis.answers_of(refs) <= frozen:
+                        continue
+                    visible = self._truth(question.dependency, state.answers, state.parameters)
+                if (question.id in state.answers) == visible:
+                    frozen.add(question.id)
+                    changed = True
+        return frozen
+
+    def key(self, state: State) -> str:
+        analysis = self.analysis
+        answers, params = state.answers, state.parameters
+        frozen = self.frozen(state)
+        frozen_variables = [
+            variable.name
+            for variable in analysis.variables
+            if not analysis.variable_dynamic[variable.name] and analysis.variable_answers[variable.name] <= frozen
+        ]
+        conditions: list[Any] = []
+        live = [
+            rule.condition
+            for module_id in sorted(analysis.reachable[state.module_id])
+            for rule in self.engine.modules_by_id[module_id].router
+            if rule.condition
+        ]
+        live += [
+            question.dependency
+            for question in analysis.open_questions[state.module_id]
+            if question.dependency and question.id not in frozen
+        ]
+        frozen_set = set(frozen_variables)
+        for variable in analysis.variables:
+            if variable.name in frozen_set:
+                continue
+            order = analysis.variable_order[variable.name]
+            for rule in variable.rules:
+                refs = analysis.refs[rule.condition]
+                # compute_parameters only sees variables defined earlier; later ones keep the raw answers.
+                if any(analysis.variable_order[name] >= order for name in refs.variables):
+                    conditions.append([rule.condition, [answers.get(qid, _MISSING) for qid in sorted(refs.questions)]])
+                else:
+                    live.append(rule.condition)
+        for expr in live:
+            refs = analysis.refs[expr]
+            if not analysis.dynamic(refs) and analysis.answers_of(refs) <= frozen:
+                conditions.append([expr, self._truth(expr, answers, params)])
+            else:
+                conditions.append([expr, [answers.get(qid, _MISSING) for qid in sorted(refs.questions & frozen)]])
+        return _digest(
+            [
+                state.module_id,
+                [
+                    [question.id, answers[question.id]]
+                    for question in analysis.open_questions[state.module_id]
+                    if question.id in answers and question.id not in frozen
+                ],
+                [[name, params.get(name)] for name in frozen_variables],
+                conditions,
+            ]
+        )
+
+
+def _digest(value: Any) -> str:
+    encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=repr)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+_WORKERS: dict[str, Explorer] = {}
+
+
+def _explore_subtree(lang: str, states: list[State]) -> tuple[dict[str, dict[str, Any]], set[str], set[str], set[str]]:
+    explorer = _WORKERS.get(lang)
+    if explorer is None:
+        explorer = _WORKERS[lang] = Explorer(lang)
+    explorer.nodes, explorer.shown, explorer.entered, explorer.fired = {}, set(), set(), set()
+    for state in states:
+        explorer.explore(state)
+    return explorer.nodes, explorer.shown, explorer.entered, explorer.fired
+
+
+def explore(lang: str, processes: int = 1) -> tuple[Explorer, str]:
+    """Explore the whole answer space; returns the explorer holding the merged graph and the root key.
+
+    With more than one process the top of the graph is expanded breadth-first here and the frontier is
+    spread over worker processes; their subgraphs share canonical keys, so merging them is a dict union."""
+    explorer = Explorer(lang)
+    root_state = explorer.root()
+    if processes <= 1:
+        return explorer, explorer.explore(root_state)
+    root = explorer.key(root_state)
+    frontier: dict[str, State] = {root: root_state}
+    pending: dict[str, tuple[dict[str, Any], list[State | str]]] = {}
+    while frontier and len(frontier) < processes * 4:
+        next_frontier: dict[str, State] = {}
+        for key, state in frontier.items():
+            node, children = explorer.expand(state)
+            pending[key] = (node, children)
+            for edge, child in zip(node["edges"], children):
+                edge[2] = child if isinstance(child, str) else explorer.key(child)
+                if not isinstance(child, str) and edge[2] not in pending:
+                    next_frontier[edge[2]] = child
+        frontier = next_frontier
+    batches: list[list[State]] = [[] for _ in range(processes)]
+    for index, state in enumerate(frontier.values()):
+        batches[index % processes].append(state)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_explore_subtree, lang, batch) for batch in batches if batch]
+        for future in futures:
+            nodes, shown, entered, fired = future.result()
+            for key, node in nodes.items():
+                explorer.nodes.setdefault(key, node)
+            explorer.shown |= shown
+            explorer.entered |= entered
+            explorer.fired |= fired
+    for key, (node, _) in pending.items():
+        explorer.nodes[key] = node
+    return explorer, root
+
+
+def _topological(nodes: dict[str, dict[str, Any]], root: str) -> list[str]:
+    order: list[str] = []
+    seen = {root}
+    stack: list[tuple[str, Iterable[list[Any]]]] = [(root, iter(nodes[root].get("edges", [])))]
+    while stack:
+        key, edges = stack[-1]
+        for edge in edges:
+            if edge[2] not in seen:
+                seen.add(edge[2])
+                stack.append((edge[2], iter(nodes[edge[2]].get("edges", []))))
+                break
+        else:
+            stack.pop()
+            order.append(key)
+    order.reverse()
+    return order
+
+
+def summarize(explorer: Explorer, root: str) -> dict[str, Any]:
+    nodes = explorer.nodes
+    order = _topological(nodes, root)
+    # Bottom-up: path counts and longest/shortest distance to a result, in submitted answers.
+    paths: dict[str, int] = {}
+    raw_paths: dict[str, int] = {}
+    longest: dict[str, int] = {}
+    shortest: dict[str, int] = {}
+    for key in reversed(order):
+        edges = nodes[key].get("edges")
+        if edges is None:
+            paths[key] = raw_paths[key] = 1
+            longest[key] = shortest[key] = 0
+            continue
+        paths[key] = sum(paths[edge[2]] for edge in edges)
+        raw_paths[key] = sum(edge[1] * raw_paths[edge[2]] for edge in edges)
+        longest[key] = 1 + max(longest[edge[2]] for edge in edges)
+        shortest[key] = 1 + min(shortest[edge[2]] for edge in edges)
+    # Top-down: how many paths end in each outcome.
+    incoming: dict[str, int] = {root: 1}
+    raw_incoming: dict[str, int] = {root: 1}
+    for key in order:
+        for edge in nodes[key].get("edges", []):
+            incoming[edge[2]] = incoming.get(edge[2], 0) + incoming[key]
+            raw_incoming[edge[2]] = raw_incoming.get(edge[2], 0) + raw_incoming[key] * edge[1]
+    outcomes = sorted(
+        (
+            {"conclusion": nodes[key]["outcome"], "paths": incoming[key], "raw_paths": raw_incoming[key]}
+            for key in order
+            if "outcome" in nodes[key]
+        ),
+        key=lambda row: -row["raw_paths"],
+    )
+    engine = explorer.engine
+    unreachable_questions = [qid for qid in engine.questions_by_id if qid not in explorer.shown]
+    unreachable_rules: dict[str, list[str]] = {"dependency": [], "variable": [], "router": []}
+    for rule_id, _ in iter_rules(engine):
+        kind = rule_id.split("/")[1]
+        if kind == "dependency":
+            if rule_id.rsplit("/", 1)[1] not in explorer.shown:
+                unreachable_rules[kind].append(rule_id)
+        elif rule_id not in explorer.fired:
+            unreachable_rules[kind].append(rule_id)
+    return {
+        "lang": explorer.lang,
+        "engine_version": engine.version,
+        "states": sum(1 for node in nodes.values() if "edges" in node),
+        "paths": paths[root],
+        "raw_paths": raw_paths[root],
+        "longest_path": _path(nodes, root, longest, max),
+        "shortest_path": _path(nodes, root, shortest, min),
+        "outcomes": outcomes,
+        "errors": [row for row in outcomes if row["conclusion"] and "error" in row["conclusion"]],
+        "unreachable_modules": [
+            module.module_id for module in engine.modules if module.module_id not in explorer.entered
+        ],
+        "unreachable_questions": unreachable_questions,
+        "unreachable_rules": unreachable_rules,
+        "multi_choice_probes": explorer.analysis.probes,
+    }
+
+
+def _path(nodes: dict[str, dict[str, Any]], root: str, depth: dict[str, int], pick: Any) -> dict[str, Any]:
+    steps = []
+    key = root
+    while "edges" in nodes[key]:
+        node = nodes[key]
+        edge = pick(node["edges"], key=lambda item: depth[item[2]])
+        steps.append({"module_id": node["module"], "question_id": node["question"], "answer": edge[0]})
+        key = edge[2]
+    # Round trips: /start, one /submit-answer per step, then /result.
+    return {"submits": len(steps), "round_trips": len(steps) + 2, "steps": steps, "conclusion": nodes[key]["outcome"]}
+
+
+def outcome_table(explorer: Explorer, root: str) -> dict[str, Any]:
+    """Compact decision graph from answers to conclusion, usable as a precomputed cache via :func:`lookup`."""
+    nodes = explorer.nodes
+    order = _topological(nodes, root)
+    outcome_keys = [key for key in order if "outcome" in nodes[key]]
+    outcome_index = {key: index for index, key in enumerate(outcome_keys)}
+    state_keys = [key for key in order if "edges" in nodes[key]]
+    index = {key: position for position, key in enumerate(state_keys)}
+
+    def target(key: str) -> dict[str, int] | int:
+        return {"outcome": outcome_index[key]} if key in outcome_index else index[key]
+
+    return {
+        "lang": explorer.lang,
+        "engine_version": explorer.engine.version,
+        "probes": explorer.analysis.probes,
+        "root": 0,
+        "nodes": [
+            {
+                "module": nodes[key]["module"],
+                "question": nodes[key]["question"],
+                "edges": [[edge[0], target(edge[2])] for edge in nodes[key]["edges"]],
+            }
+            for key in state_keys
+        ],
+        "outcomes": [nodes[key]["outcome"] for key in outcome_keys],
+    }
+
+
+def lookup(table: dict[str, Any], answers: dict[str, Any]) -> dict[str, Any] | None:
+    """Conclusion for a complete answer set, or None if the answers do not follow a path in ``table``."""
+    target: dict[str, int] | int = table["root"]
+    for _ in range(MAX_STEPS):
+        if isinstance(target, dict):
+            return table["outcomes"][target["outcome"]]
+        node = table["nodes"][target]
+        label = None
+        question = node["question"]
+        if question is not None:
+            if question not in answers:
+                return None
+            label = answers[question]
+            if question in table["probes"]:
+                if not isinstance(label, list):
+                    return None
+                label = [value for value in table["probes"][question] if value in label]
+        for edge_label, edge_target in node["edges"]:
+            if edge_label == label:
+                target = edge_target
+                break
+        else:
+            return None
+    return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Enumerate every reachable answer path through the rule engine and tabulate the outcomes."
+    )
+    parser.add_argument("--lang", action="append", choices=["en", "cn"], help="default: en and cn")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="write the outcome table as JSON; {lang} is replaced per language")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    reports = []
+    for lang in args.lang or ["en", "cn"]:
+        started = time.perf_counter()
+        explorer, root = explore(lang, args.processes)
+        report = summarize(explorer, root)
+        report["elapsed_s"] = time.perf_counter() - started
+        if args.output:
+            path = args.output.format(lang=lang)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(outcome_table(explorer, root), fh, ensure_ascii=False, separators=(",", ":"))
+            report["output"] = path
+        reports.append(report)
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False))
+        return 0
+    for report in reports:
+        longest, shortest = report["longest_path"], report["shortest_path"]
+        print(
+            f"{report['lang']} {report['engine_version']}: {report['states']} states, "
+            f"{report['paths']} answer-class paths ({report['raw_paths']} raw), "
+            f"{len(report['outcomes'])} outcomes, {report['elapsed_s']:.1f}s"
+        )
+        print(
+            f"  longest path {longest['submits']} answers ({longest['round_trips']} round trips), "
+            f"shortest {shortest['submits']} answers"
+        )
+        for row in report["errors"]:
+            print(f"  error: {row['conclusion']} on {row['paths']} paths")
+        print(f"  unreachable modules: {', '.join(report['unreachable_modules']) or '-'}")
+        print(f"  unreachable questions: {', '.join(report['unreachable_questions']) or '-'}")
+        for kind, rules in report["unreachable_rules"].items():
+            print(f"  never-firing {kind} rules: {', '.join(rules) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
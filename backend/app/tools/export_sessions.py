@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from typing import BinaryIO, Iterator
+
+import httpx
+
+from ..infra.export import chunked, export_sessions, gzip_chunks
+
+
+def _from_server(url: str, token: str, batch_size: int, compress: bool) -> Iterator[bytes]:
+    params = {"batch_size": batch_size, "compress": compress}
+    with httpx.stream(
+        "GET", f"{url.rstrip('/')}/admin/sessions/export", params=params, headers={"X-Admin-Token": token}, timeout=None
+    ) as response:
+        response.raise_for_status()
+        yield from response.iter_raw()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream every stored session to NDJSON.")
+    parser.add_argument("--output", default="-", help="file to write (default: stdout); a .gz suffix compresses")
+    parser.add_argument("--gzip", action="store_true", help="compress even when the output name has no .gz")
+    parser.add_argument("--redis-url", help="read Redis directly (default: REDIS_URL / SESSION_REDIS_URL)")
+    parser.add_argument("--url", help="export through a running server's /admin/sessions/export instead")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN", ""), help="default: ADMIN_TOKEN")
+    parser.add_argument("--batch-size", type=int, default=500, help="keys per SCAN/MGET round trip")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines on stderr")
+    args = parser.parse_args(argv)
+    compress = args.gzip or args.output.endswith(".gz")
+
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING, format="%(asctime)s %(message)s")
+    logging.getLogger("aiq.export").setLevel(logging.INFO)
+    if args.url:
+        # The server compresses, so the bytes are written through unchanged.
+        body = _from_server(args.url, args.admin_token, args.batch_size, compress)
+    else:
+        if args.redis_url:
+            os.environ["REDIS_URL"] = args.redis_url
+        if not (os.environ.get("REDIS_URL") or os.environ.get("SESSION_REDIS_URL")):
+            parser.error("the memory backend lives in the server process: pass --redis-url or --url")
+        from ..infra.store import SessionStore
+
+        body = chunked(export_sessions(SessionStore(), args.batch_size, args.progress))
+        if compress:
+            body = gzip_chunks(body)
+    out: BinaryIO = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in body:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
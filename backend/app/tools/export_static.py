@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any
+
+from ..config import DATA_DIR_CN, DATA_DIR_EN
+from ..domain.models import Engine
+from ..infra.serialization import encode_json
+from ..infra.loader import EngineLoader
+
+logger = logging.getLogger("aiq.export_static")
+
+
+class StaticExporter:
+    def __init__(self, out_dir: Path, brotli_enabled: bool = True) -> None:
+        self.out_dir = out_dir
+        self._brotli = None
+        if brotli_enabled:
+            try:
+                import brotli
+                self._brotli = brotli
+            except ImportError:
+                logger.warning("brotli_unavailable=true install the 'brotli' package to write .br files")
+
+    def export(self, engine: Engine, lang: str) -> dict[str, Any]:
+        version_dir = self.out_dir / lang / engine.version
+        files: dict[str, str] = {}
+        for module in engine.modules:
+            header = {
+                "id": module.module_id,
+                "title": module.title,
+                "description": module.description,
+                "questions": [q.id for q in module.questions],
+            }
+            files[f"modules/{module.module_id}.json"] = self._write(
+                version_dir / "modules" / f"{module.module_id}.json", header
+            )
+            for question in module.questions:
+                files[f"questions/{question.id}.json"] = self._write(
+                    version_dir / "questions" / f"{question.id}.json", {"question": question.raw}
+                )
+        manifest = {"lang": lang, "version": engine.version, "base": f"{lang}/{engine.version}", "files": files}
+        self._write(self.out_dir / lang / "manifest.json", manifest)
+        logger.info("export_static lang=%s version=%s files=%d", lang, engine.version, len(files))
+        return manifest
+
+    def _write(self, path: Path, payload: Any) -> str:
+        body = encode_json(payload)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        path.with_name(path.name + ".gz").write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+        if self._brotli:
+            path.with_name(path.name + ".br").write_bytes(self._brotli.compress(body, quality=11))
+        return hashlib.sha1(body).hexdigest()[:12]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Export static question and module content per language.")
+    parser.add_argument("out_dir", type=Path, help="target directory served by nginx")
+    parser.add_argument("--lang", choices=["en", "cn"], action="append", help="language to export (default: all)")
+    parser.add_argument("--no-brotli", action="store_true", help="only write .gz alongside the plain files")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    data_dirs = {"en": DATA_DIR_EN, "cn": DATA_DIR_CN}
+    exporter = StaticExporter(args.out_dir, brotli_enabled=not args.no_brotli)
+    for lang in args.lang or list(data_dirs):
+        exporter.export(EngineLoader(data_dirs[lang]).get_engine(), lang)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from fastapi import HTTPException
+
+from ..config import DATA_DIR_CN, DATA_DIR_EN
+from ..domain.models import Engine
+from ..infra.loader import EngineLoader
+from ..logic.evaluator import Evaluator
+
+DEFAULT_FIELDS = ["Risk_level", "Type", "Role"]
+CHUNK_SIZE = 500
+
+
+def rule_dirs(path: str | Path) -> dict[str, Path]:
+    """Language -> YAML directory for a rule tree: a resources root with En/ and Cn/, or a single language dir."""
+    root = Path(path)
+    if any(root.glob("*.yaml")):
+        lang = root.name.lower()
+        return {lang: root} if lang in {"en", "cn"} else {"en": root, "cn": root}
+    dirs = {lang: root / name for lang, name in (("en", "En"), ("cn", "Cn")) if (root / name).is_dir()}
+    if not dirs:
+        raise SystemExit(f"no rule YAML under {root}")
+    return dirs
+
+
+def _open(path: str) -> Iterable[str]:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def read_corpus(paths: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """Stream session records (one JSON object per line, as exported from the session store)."""
+    for path in paths:
+        source = _open(path)
+        try:
+            for line in source:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+
+_WORKER: dict[str, Any] = {}
+
+
+def _init_worker(current: dict[str, str], candidate: dict[str, str], fields: list[str]) -> None:
+    _WORKER["current"] = {lang: EngineLoader(Path(path)) for lang, path in current.items()}
+    _WORKER["candidate"] = {lang: EngineLoader(Path(path)) for lang, path in candidate.items()}
+    _WORKER["fields"] = fields
+    _WORKER["evaluator"] = Evaluator()
+
+
+def session_lang(record: dict[str, Any]) -> str:
+    return "cn" if str(record.get("lang") or "en").lower() in {"cn", "zh", "zh-cn"} else "en"
+
+
+def _outcome(engines: dict[str, EngineLoader], lang: str, answers: dict[str, Any]) -> dict[str, Any]:
+    engine: Engine = engines[lang].get_engine()
+    evaluator: Evaluator = _WORKER["evaluator"]
+    # Same evaluation as GET /result: parameters recomputed from the stored answers.
+    return evaluator.compute_parameters(engine, answers)
+
+
+def _evaluate_chunk(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    fields = _WORKER["fields"]
+    results = []
+    for record in records:
+        lang = session_lang(record)
+        answers = record.get("answers") or {}
+        row: dict[str, Any] = {"id": record.get("id"), "lang": lang}
+        try:
+            before = _outcome(_WORKER["current"], lang, answers)
+            after = _outcome(_WORKER["candidate"], lang, answers)
+        except HTTPException as exc:
+            row["error"] = exc.detail
+            results.append(row)
+            continue
+        row["changes"] = {
+            name: [before.get(name), after.get(name)] for name in fields if before.get(name) != after.get(name)
+        }
+        results.append(row)
+    return results
+
+
+def _chunks(records: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    chunk: list[dict[str, Any]] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def evaluate(
+    records: Iterable[dict[str, Any]],
+    current: dict[str, Path],
+    candidate: dict[str, Path],
+    fields: list[str],
+    processes: int,
+) -> Iterator[dict[str, Any]]:
+    """Per-session results in corpus order; at most ``2 * processes`` chunks are held in memory."""
+    init_args = ({k: str(v) for k, v in current.items()}, {k: str(v) for k, v in candidate.items()}, fields)
+    if processes <= 1:
+        _init_worker(*init_args)
+        for chunk in _chunks(records, CHUNK_SIZE):
+            yield from _evaluate_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=init_args) as pool:
+        inflight: deque[Future[list[dict[str, Any]]]] = deque()
+        for chunk in _chunks(records, CHUNK_SIZE):
+            inflight.append(pool.submit(_evaluate_chunk, chunk))
+            if len(inflight) >= processes * 2:
+                yield from inflight.popleft().result()
+        while inflight:
+            yield from inflight.popleft().result()
+
+
+class ImpactSummary:
+    def __init__(self, fields: list[str]) -> None:
+        self.fields = fields
+        self.sessions = 0
+        self.skipped = 0
+        self.evaluated = 0
+        self.changed = 0
+        self.errors = 0
+        self.by_field = {name: 0 for name in fields}
+        self.transitions: dict[str, dict[tuple[str, str], int]] = {name: {} for name in fields}
+        self.by_lang: dict[str, dict[str, int]] = {}
+
+    def add(self, row: dict[str, Any]) -> None:
+        self.evaluated += 1
+        lang = self.by_lang.setdefault(row["lang"], {"evaluated": 0, "changed": 0, "errors": 0})
+        lang["evaluated"] += 1
+        if "error" in row:
+            self.errors += 1
+            lang["errors"] += 1
+            return
+        if not row["changes"]:
+            return
+        self.changed += 1
+        lang["changed"] += 1
+        for name, (before, after) in row["changes"].items():
+            self.by_field[name] += 1
+            pair = (json.dumps(before, ensure_ascii=False), json.dumps(after, ensure_ascii=False))
+            self.transitions[name][pair] = self.transitions[name].get(pair, 0) + 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "skipped": self.skipped,
+            "evaluated": self.evaluated,
+            "changed": self.changed,
+            "changed_ratio": self.changed / self.evaluated if self.evaluated else 0.0,
+            "errors": self.errors,
+            "by_field": self.by_field,
+            "by_lang": self.by_lang,
+            "transitions": {
+                name: [
+                    {"from": json.loads(before), "to": json.loads(after), "sessions": count}
+                    for (before, after), count in sorted(pairs.items(), key=lambda item: -item[1])
+                ]
+                for name, pairs in self.transitions.items()
+            },
+        }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Re-evaluate stored sessions under a candidate rule tree and report changed conclusions."
+    )
+    parser.add_argument("corpus", nargs="+", help="NDJSON session exports (.gz accepted, - for stdin)")
+    parser.add_argument("--candidate", required=True, help="candidate resources dir (En/ and Cn/) or language dir")
+    parser.add_argument("--current", help="current rule tree (default: the bundled resources)")
+    parser.add_argument(
+        "--field", action="append", help=f"parameters to compare (default: {', '.join(DEFAULT_FIELDS)})"
+    )
+    parser.add_argument("--include-incomplete", action="store_true", help="also evaluate sessions without a result")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--changes", help="write one NDJSON line per changed session to this file")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    current = rule_dirs(args.current) if args.current else {"en": DATA_DIR_EN, "cn": DATA_DIR_CN}
+    candidate = rule_dirs(args.candidate)
+    fields = args.field or DEFAULT_FIELDS
+    summary = ImpactSummary(fields)
+
+    def selected() -> Iterator[dict[str, Any]]:
+        for record in read_corpus(args.corpus):
+            summary.sessions += 1
+            incomplete = record.get("conclusion") is None and not args.include_incomplete
+            lang = session_lang(record)
+            if incomplete or lang not in current or lang not in candidate:
+                summary.skipped += 1
+                continue
+            yield record
+
+    started = time.perf_counter()
+    changes = open(args.changes, "w", encoding="utf-8") if args.changes else None
+    try:
+        for row in evaluate(selected(), current, candidate, fields, args.processes):
+            summary.add(row)
+            if changes is not None and (row.get("changes") or "error" in row):
+                changes.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        if changes is not None:
+            changes.close()
+    report = summary.as_dict()
+    report["elapsed_s"] = time.perf_counter() - started
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return 0
+    print(
+        f"{report['sessions']} sessions, {report['evaluated']} evaluated ({report['skipped']} skipped), "
+        f"{report['changed']} changed ({report['changed_ratio']:.2%}), {report['errors']} errors, "
+        f"{report['elapsed_s']:.1f}s"
+    )
+    for name in fields:
+        print(f"  {name}: {report['by_field'][name]} changed")
+        for row in report["transitions"][name][:10]:
+            print(f"    {row['from']!r} -> {row['to']!r}: {row['sessions']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from .walker import MAX_STEPS, next_answers
+
+
+@dataclass
+class EndpointStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[str, int] = field(default_factory=dict)
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+        count = len(ordered) + self.errors
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput_rps": count / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(ordered, 50),
+            "p90_ms": percentile(ordered, 90),
+            "p99_ms": percentile(ordered, 99),
+            "max_ms": ordered[-1] if ordered else None,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+def percentile(ordered: list[float], pct: float) -> float | None:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, langs: list[str], think_time: float) -> None:
+        self.client = client
+        self.langs = langs
+        self.think_time = think_time
+        self.stats: dict[str, EndpointStats] = {}
+        self.walks_completed = 0
+        self.walks_failed = 0
+
+    async def _request(self, endpoint: str, method: str, url: str, **kwargs: Any) -> dict[str, Any] | None:
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            stats.errors += 1
+            key = type(exc).__name__
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        key = str(response.status_code)
+        stats.statuses[key] = stats.statuses.get(key, 0) + 1
+        if response.status_code >= 400:
+            stats.errors += 1
+            return None
+        stats.latencies_ms.append(elapsed_ms)
+        return response.json()
+
+    async def _think(self) -> None:
+        if self.think_time > 0:
+            await asyncio.sleep(random.expovariate(1 / self.think_time))
+
+    async def walk(self, rnd: random.Random) -> bool:
+        lang = rnd.choice(self.langs)
+        body = await self._request("/start", "POST", "/start", params={"lang": lang})
+        if body is None:
+            return False
+        session_id, module = body["session_id"], body["module"]
+        for _ in range(MAX_STEPS):
+            await self._think()
+            body = await self._request(
+                "/submit-answer",
+                "POST",
+                "/submit-answer",
+                params={"lang": lang},
+                json={"session_id": session_id, "module_id": module["id"], "answers": next_answers(module, rnd)},
+            )
+            if body is None:
+                return False
+            if body["next"]["type"] == "result":
+                break
+            module = body["module"]
+        else:
+            return False
+        return await self._request("/result", "GET", "/result", params={"session_id": session_id}) is not None
+
+    async def user(self, index: int, seed: int, deadline: float, walks: int | None, start_delay: float) -> None:
+        rnd = random.Random(seed * 1_000_003 + index)
+        await asyncio.sleep(start_delay)
+        done = 0
+        while time.perf_counter() < deadline and (walks is None or done < walks):
+            if await self.walk(rnd):
+                self.walks_completed += 1
+            else:
+                self.walks_failed += 1
+            done += 1
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    if args.url:
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+        target = args.url
+    else:
+        from ..app_factory import create_app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=create_app()), base_url="http://loadgen", timeout=args.timeout
+        )
+        target = "in-process"
+    load = LoadRun(client, args.lang or ["en"], args.think_time)
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else float("inf")
+    try:
+        await asyncio.gather(
+            *(
+                load.user(index, args.seed, deadline, args.walks_per_user, args.ramp_up * index / args.users)
+                for index in range(args.users)
+            )
+        )
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - start
+    endpoints = {name: stats.summary(elapsed) for name, stats in sorted(load.stats.items())}
+    total = sum(item["requests"] for item in endpoints.values())
+    errors = sum(item["errors"] for item in endpoints.values())
+    return {
+        "target": target,
+        "users": args.users,
+        "elapsed_s": elapsed,
+        "walks_completed": load.walks_completed,
+        "walks_failed": load.walks_failed,
+        "requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "error_rate": errors / total if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Drive random valid questionnaire walks with concurrent virtual users."
+    )
+    parser.add_argument("--url", help="base URL of a running server (default: the ASGI app in-process)")
+    parser.add_argument("--users", type=int, default=100, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run; 0 to rely on --walks-per-user")
+    parser.add_argument("--walks-per-user", type=int, help="stop each user after this many walks")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which users are started")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between answers, in seconds")
+    parser.add_argument("--lang", action="append", choices=["en", "cn"], help="languages to mix (default: en)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    if not args.duration and not args.walks_per_user:
+        parser.error("set --duration or --walks-per-user")
+    if not args.url:
+        os.environ.setdefault("LOG_FILE", "")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(
+        f"{report['target']}: {report['users']} users, {report['elapsed_s']:.1f}s, "
+        f"{report['walks_completed']} walks ({report['walks_failed']} failed), "
+        f"{report['throughput_rps']:.1f} req/s, error rate {report['error_rate']:.2%}"
+    )
+    for name, item in report["endpoints"].items():
+        print(
+            f"  {name:<16} n={item['requests']:<7} err={item['errors']:<5} "
+            f"p50={item['p50_ms'] or 0:.1f}ms p90={item['p90_ms'] or 0:.1f}ms "
+            f"p99={item['p99_ms'] or 0:.1f}ms max={item['max_ms'] or 0:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+from .loadgen import EndpointStats, percentile
+from .walker import next_answers
+
+_LINE_PATTERN = re.compile(
+    r"^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) (?P<level>\w+) (?P<logger>\S+) (?:rid=(?P<rid>\S+) )?(?P<msg>.*)$"
+)
+_FIELD_PATTERN = re.compile(r"(\w+)=(\S*)")
+_ROUTE_PATTERNS = [
+    (re.compile(r"^/module/[^/]+$"), "/module/{module_id}"),
+    (re.compile(r"^/question/[^/]+$"), "/question/{question_id}"),
+]
+_SESSION_EVENTS = {"start", "submit", "module_get", "result"}
+MAX_PENDING = 100_000
+
+
+@dataclass
+class LoggedRequest:
+    ts: float
+    method: str
+    path: str
+    query: str
+    status: int
+    duration_ms: float
+    session: str | None = None
+
+    @property
+    def route(self) -> str:
+        return route_template(self.path)
+
+    @property
+    def params(self) -> dict[str, str]:
+        return dict(parse_qsl(self.query))
+
+
+def route_template(path: str) -> str:
+    for pattern, template in _ROUTE_PATTERNS:
+        if pattern.match(path):
+            return template
+    return path
+
+
+def rotated_files(path: str) -> list[Path]:
+    """`app.log` plus its RotatingFileHandler backups (optionally gzipped), oldest first."""
+    base = Path(path)
+    backups = []
+    for candidate in base.parent.glob(base.name + ".*"):
+        suffix = candidate.name[len(base.name) + 1:].removesuffix(".gz")
+        if suffix.isdigit():
+            backups.append((int(suffix), candidate))
+    files = [candidate for _, candidate in sorted(backups, reverse=True)]
+    if base.exists():
+        files.append(base)
+    return files
+
+
+def _open(path: Path) -> Iterable[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _parse_line(line: str) -> tuple[float, str, str] | None:
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+            ts = datetime.strptime(data["ts"], "%Y-%m-%d %H:%M:%S,%f").timestamp()
+            return ts, data.get("rid") or "-", data["message"]
+        except (ValueError, KeyError):
+            return None
+    match = _LINE_PATTERN.match(line.rstrip("\n"))
+    if not match:
+        return None
+    ts = datetime.strptime(match.group("ts"), "%Y-%m-%d %H:%M:%S,%f").timestamp()
+    return ts, match.group("rid") or "-", match.group("msg")
+
+
+def read_requests(files: Iterable[Path]) -> Iterator[LoggedRequest]:
+    """Streams completed requests out of the log, pairing request_start/request_end by request id."""
+    pending: dict[str, LoggedRequest] = {}
+    sessions_by_rid: dict[str, str] = {}
+    for path in files:
+        with _open(path) as fh:
+            for line in fh:
+                parsed = _parse_line(line)
+                if parsed is None:
+                    continue
+                ts, rid, msg = parsed
+                event, _, rest = msg.partition(" ")
+                fields = dict(_FIELD_PATTERN.findall(rest))
+                if event == "request_start" and "id" in fields:
+                    if len(pending) >= MAX_PENDING:
+                        # Requests that never logged request_end (crash, truncated file) are dropped.
+                        stale = next(iter(pending))
+                        pending.pop(stale)
+                        sessions_by_rid.pop(stale, None)
+                    pending[fields["id"]] = LoggedRequest(
+                        ts=ts,
+                        method=fields.get("method", "GET"),
+                        path=fields.get("path", "/"),
+                        query=fields.get("query", ""),
+                        status=0,
+                        duration_ms=0.0,
+                    )
+                elif event in _SESSION_EVENTS and rid != "-" and "session" in fields:
+                    sessions_by_rid[rid] = fields["session"]
+                elif event == "request_end" and fields.get("id") in pending:
+                    request = pending.pop(fields["id"])
+                    request.status = int(fields.get("status") or 0)
+                    request.duration_ms = float(fields.get("duration_ms") or 0)
+                    request.session = sessions_by_rid.pop(fields["id"], None) or request.params.get("session_id")
+                    yield request
+
+
+def traffic_profile(requests: Iterable[LoggedRequest]) -> dict[str, Any]:
+    routes: dict[str, EndpointStats] = {}
+    per_second: dict[int, int] = {}
+    first = last = None
+    for request in requests:
+        first = request.ts if first is None else first
+        last = request.ts
+        stats = routes.setdefault(f"{request.method} {request.route}", EndpointStats())
+        stats.latencies_ms.append(request.duration_ms)
+        key = str(request.status)
+        stats.statuses[key] = stats.statuses.get(key, 0) + 1
+        per_second[int(request.ts)] = per_second.get(int(request.ts), 0) + 1
+    span = (last - first) if first is not None and last is not None else 0.0
+    total = sum(len(stats.latencies_ms) for stats in routes.values())
+    return {
+        "requests": total,
+        "span_s": span,
+        "mean_rps": total / span if span else float(total),
+        "peak_rps": max(per_second.values(), default=0),
+        "mix": {name: len(stats.latencies_ms) / total for name, stats in sorted(routes.items())} if total else {},
+        "recorded": {name: _latency_summary(stats.latencies_ms) for name, stats in sorted(routes.items())},
+    }
+
+
+def _latency_summary(latencies: list[float]) -> dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(ordered, 50),
+        "p90_ms": percentile(ordered, 90),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else None,
+    }
+
+
+@dataclass
+class LocalSession:
+    id: str
+    lang: str
+    module: dict[str, Any] | None
+    done: bool = False
+
+
+class Replayer:
+    """Maps each production session onto a synthetic local one that advances along a random valid path."""
+
+    def __init__(self, client: httpx.AsyncClient, seed: int) -> None:
+        self.client = client
+        self.rnd = random.Random(seed)
+        self.sessions: dict[str, LocalSession] = {}
+        self.locks: OrderedDict[str, asyncio.Lock] = OrderedDict()
+        self.replayed: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.setup_requests = 0
+        self.skipped = 0
+
+    async def _timed(self, route: str, method: str, url: str, **kwargs: Any) -> dict[str, Any] | None:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        self.replayed.setdefault(route, []).append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        if "application/json" not in response.headers.get("content-type", ""):
+            return {}
+        return response.json()
+
+    async def _start(self, lang: str, route: str | None) -> LocalSession | None:
+        if route is None:
+            self.setup_requests += 1
+            response = await self.client.post("/start", params={"lang": lang})
+            body = response.json() if response.status_code < 400 else None
+        else:
+            body = await self._timed(route, "POST", "/start", params={"lang": lang})
+        if not body:
+            return None
+        return LocalSession(body["session_id"], lang, body["module"])
+
+    async def _session(self, request: LoggedRequest) -> LocalSession | None:
+        key = request.session or "-"
+        local = self.sessions.get(key)
+        if local is None or local.done:
+            local = await self._start(request.params.get("lang", "en"), None)
+            if local is None:
+                return None
+            self.sessions[key] = local
+        return local
+
+    def _lock(self, session: str) -> asyncio.Lock:
+        lock = self.locks.get(session)
+        if lock is None:
+            lock = self.locks[session] = asyncio.Lock()
+            if len(self.locks) > MAX_PENDING:
+                oldest, oldest_lock = next(iter(self.locks.items()))
+                if not oldest_lock.locked():
+                    self.locks.pop(oldest)
+                    self.sessions.pop(oldest, None)
+        else:
+            self.locks.move_to_end(session)
+        return lock
+
+    async def replay(self, request: LoggedRequest) -> None:
+        if not request.session:
+            await self._replay(request)
+            return
+        # Requests are dispatched in log order and asyncio locks are FIFO, so one session's
+        # requests (its /start included) replay in their original order.
+        async with self._lock(request.session):
+            await self._replay(request)
+
+    async def _replay(self, request: LoggedRequest) -> None:
+        route = f"{request.method} {request.route}"
+        params = request.params
+        if request.method == "POST" and request.route == "/start":
+            local = await self._start(params.get("lang", "en"), route)
+            if local is not None and request.session:
+                self.sessions[request.session] = local
+            return
+        if request.route in {"/submit-answer", "/module/{module_id}", "/result"}:
+            local = await self._session(request)
+            if local is None:
+                self.errors[route] = self.errors.get(route, 0) + 1
+                return
+            await self._replay_session_request(route, request, local)
+            return
+        if request.method != "GET":
+            self.skipped += 1
+            return
+        url = request.path + (f"?{urlencode(params)}" if params else "")
+        await self._timed(route, "GET", url)
+
+    async def _replay_session_request(self, route: str, request: LoggedRequest, local: LocalSession) -> None:
+        if request.route == "/submit-answer":
+            module = local.module or {}
+            body = await self._timed(
+                route,
+                "POST",
+                "/submit-answer",
+                params={"lang": local.lang},
+                json={"session_id": local.id, "module_id": module.get("id"), "answers": next_answers(module, self.rnd)},
+            )
+            if body:
+                local.module = body["module"]
+                local.done = body["next"]["type"] == "result"
+        elif request.route == "/module/{module_id}":
+            module_id = (local.module or {}).get("id") or request.path.rsplit("/", 1)[-1]
+            await self._timed(route, "GET", f"/module/{module_id}", params={"session_id": local.id})
+        else:
+            await self._timed(route, "GET", "/result", params={"session_id": local.id})
+
+
+async def replay(
+    requests: Iterator[LoggedRequest], client: httpx.AsyncClient, speed: float, max_inflight: int, seed: int
+) -> tuple[Replayer, dict[str, list[float]], float]:
+    replayer = Replayer(client, seed)
+    recorded: dict[str, list[float]] = {}
+    semaphore = asyncio.Semaphore(max_inflight)
+    tasks: set[asyncio.Task] = set()
+    origin: float | None = None
+    started = time.perf_counter()
+
+    async def run_one(request: LoggedRequest) -> None:
+        try:
+            await replayer.replay(request)
+        finally:
+            semaphore.release()
+
+    for request in requests:
+        origin = request.ts if origin is None else origin
+        delay = started + (request.ts - origin) / speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        recorded.setdefault(f"{request.method} {request.route}", []).append(request.duration_ms)
+        await semaphore.acquire()
+        task = asyncio.create_task(run_one(request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return replayer, recorded, time.perf_counter() - started
+
+
+def _comparison(recorded: dict[str, list[float]], replayer: Replayer) -> dict[str, Any]:
+    rows = {}
+    for route in sorted(set(recorded) | set(replayer.replayed)):
+        before = _latency_summary(recorded.get(route, []))
+        after = _latency_summary(replayer.replayed.get(route, []))
+        ratio = None
+        if before["p50_ms"] and after["p50_ms"] is not None:
+            ratio = after["p50_ms"] / before["p50_ms"]
+        rows[route] = {
+            "recorded": before,
+            "replayed": after,
+            "errors": replayer.errors.get(route, 0),
+            "p50_ratio": ratio,
+        }
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild traffic from app.log and replay it against an instance.")
+    parser.add_argument("log", nargs="+", help="log file(s); rotated siblings of a single file are picked up too")
+    parser.add_argument("--url", help="base URL of a local instance (default: the ASGI app in-process)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, e.g. 1 to 10")
+    parser.add_argument("--max-inflight", type=int, default=1000)
+    parser.add_argument("--profile-only", action="store_true", help="only print the reconstructed traffic profile")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    files = rotated_files(args.log[0]) if len(args.log) == 1 else [Path(item) for item in args.log]
+    if not files:
+        parser.error(f"no log files found for {args.log[0]}")
+    if args.profile_only:
+        report: dict[str, Any] = {"files": [str(item) for item in files], **traffic_profile(read_requests(files))}
+    else:
+        if not args.url:
+            os.environ.setdefault("LOG_FILE", "")
+            os.environ.setdefault("LOG_LEVEL", "WARNING")
+        report = asyncio.run(_replay_main(args, files))
+    if args.json:
+        print(json.dumps(report))
+        return
+    if args.profile_only:
+        print(f"{report['requests']} requests over {report['span_s']:.0f}s, "
+              f"mean {report['mean_rps']:.2f} req/s, peak {report['peak_rps']} req/s")
+        for route, share in report["mix"].items():
+            recorded = report["recorded"][route]
+            print(f"  {route:<32} {share:6.1%}  p50={recorded['p50_ms']:.1f}ms p99={recorded['p99_ms']:.1f}ms")
+        return
+    print(
+        f"replayed {report['requests']} requests at {args.speed}x in {report['elapsed_s']:.1f}s "
+        f"({report['setup_requests']} setup, {report['skipped']} skipped)"
+    )
+    for route, row in report["routes"].items():
+        before, after = row["recorded"], row["replayed"]
+        print(
+            f"  {route:<32} recorded p50={before['p50_ms'] or 0:.1f} p99={before['p99_ms'] or 0:.1f}ms  "
+            f"replayed p50={after['p50_ms'] or 0:.1f} p99={after['p99_ms'] or 0:.1f}ms  errors={row['errors']}"
+        )
+
+
+async def _replay_main(args: argparse.Namespace, files: list[Path]) -> dict[str, Any]:
+    if args.url:
+        limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+        client = httpx.AsyncClient(base_url=args.url, timeout=30.0, limits=limits)
+    else:
+        from ..app_factory import create_app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app()), base_url="http://replay")
+    try:
+        replayer, recorded, elapsed = await replay(
+            read_requests(files), client, args.speed, args.max_inflight, args.seed
+        )
+    finally:
+        await client.aclose()
+    return {
+        "files": [str(item) for item in files],
+        "speed": args.speed,
+        "requests": sum(len(items) for items in recorded.values()),
+        "elapsed_s": elapsed,
+        "setup_requests": replayer.setup_requests,
+        "skipped": replayer.skipped,
+        "routes": _comparison(recorded, replayer),
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from ..services.questionnaire import QuestionnaireService
+
+MAX_STEPS = 500
+
+
+@dataclass
+class WalkStep:
+    module_id: str
+    answers: dict[str, Any]
+    parameters: dict[str, Any]
+
+
+@dataclass
+class Walk:
+    lang: str
+    steps: list[WalkStep] = field(default_factory=list)
+    conclusion: dict[str, Any] | None = None
+
+
+def pick_answer(question: dict[str, Any], rnd: random.Random) -> Any:
+    """Random answer that passes Evaluator.validate_answer for the question's type."""
+    qtype = question.get("type")
+    values = [opt.get("value") for opt in question.get("options") or []]
+    if qtype == "boolean":
+        return rnd.random() < 0.5
+    if qtype == "single_choice":
+        return rnd.choice(values)
+    if qtype in {"multi_choice", "multiple_choice"}:
+        exclusives = [opt.get("value") for opt in question.get("options") or [] if opt.get("exclusive")]
+        pool = [value for value in values if value not in exclusives]
+        if exclusives and (not pool or rnd.random() < 0.3):
+            return [rnd.choice(exclusives)]
+        return rnd.sample(pool, rnd.randint(1, len(pool)))
+    return None
+
+
+def next_answers(module: dict[str, Any] | None, rnd: random.Random) -> dict[str, Any]:
+    questions = (module or {}).get("questions") or []
+    if not questions:
+        return {}
+    question = questions[0]
+    return {str(question["id"]): pick_answer(question, rnd)}
+
+
+def walk_service(service: QuestionnaireService, lang: str, rnd: random.Random) -> Walk:
+    """One random but valid path from /start to the result, driven through the service in-process."""
+    session_id, module = service.start(lang)
+    walk = Walk(lang=lang)
+    for _ in range(MAX_STEPS):
+        payload = service.submit_answer(session_id, module["id"], next_answers(module, rnd), lang=lang)
+        session = service.store.get(session_id)
+        walk.steps.append(WalkStep(module["id"], dict(session.answers), dict(session.parameters)))
+        if payload["next"]["type"] == "result":
+            walk.conclusion = payload["conclusion"]
+            return walk
+        module = payload["module"]
+    raise RuntimeError(f"walk_not_terminated:{lang}")
+
+
+async def walk_http(client: httpx.AsyncClient, lang: str, rnd: random.Random) -> int:
+    """Same walk over HTTP; returns the number of requests issued."""
+    response = await client.post("/start", params={"lang": lang})
+    response.raise_for_status()
+    body = response.json()
+    session_id, module = body["session_id"], body["module"]
+    requests = 1
+    for _ in range(MAX_STEPS):
+        response = await client.post(
+            "/submit-answer",
+            params={"lang": lang},
+            json={"session_id": session_id, "module_id": module["id"], "answers": next_answers(module, rnd)},
+        )
+        response.raise_for_status()
+        requests += 1
+        body = response.json()
+        if body["next"]["type"] == "result":
+            return requests
+        module = body["module"]
+    raise RuntimeError(f"walk_not_terminated:{lang}")
@@ -0,0 +1,50 @@
+// Runner for `python -m backend.app.tools.conformance`: evaluates each answer
+// set from the JSON file given on the command line with ruleEngine.ts and
+// prints the results, one per case, for comparison with the Python evaluator.
+
+import { readFileSync } from 'node:fs'
+
+import type { RuleBundle, RuleValue } from '@/types/questionnaire'
+import {
+  computeParameters,
+  currentQuestionId,
+  moduleComplete,
+  questionVisible,
+  settle,
+  validateAnswer,
+} from '../ruleEngine'
+
+type Answers = Record<string, RuleValue>
+type Case = { answers: Answers; module_id: string; values: [string, RuleValue][] }
+
+const input = JSON.parse(readFileSync(process.argv[process.argv.length - 1] as string, 'utf-8')) as {
+  bundle: RuleBundle
+  cases: Case[]
+}
+const { bundle } = input
+const questions = new Map(bundle.modules.flatMap((module) => module.questions.map((q) => [q.id, q] as const)))
+
+const results = input.cases.map(({ answers, module_id, values }) => {
+  const params = computeParameters(bundle, answers)
+  const visible: Record<string, boolean> = {}
+  for (const [id, question] of questions) visible[id] = questionVisible(question, answers, params)
+  const modules: Record<string, { current: string | null; complete: boolean }> = {}
+  for (const module of bundle.modules) {
+    modules[module.id] = {
+      current: currentQuestionId(module, answers, params),
+      complete: moduleComplete(module, answers, params),
+    }
+  }
+  const settled = { ...answers }
+  const module = bundle.modules.find((candidate) => candidate.id === module_id)
+  const settledParams = module ? settle(bundle, module, settled) : params
+  return {
+    parameters: params,
+    visible,
+    modules,
+    settled: { answers: settled, parameters: settledParams },
+    errors: values.map(([id, value]) => validateAnswer(questions.get(id)!, value)),
+  }
+})
+
+process.stdout.write(JSON.stringify(results))
@@ -0,0 +1,248 @@
+import type {
+  AnswerScalar,
+  BundleModule,
+  BundleQuestion,
+  RuleBundle,
+  RuleNode,
+  RuleValue,
+} from '@/types/questionnaire'
+
+// Client-side port of backend/app/logic/evaluator.py for bundles served by
+// GET /rules/bundle. Comparisons follow Python semantics (True == 1, list
+// equality, truthiness) and any type error fails the whole condition, as
+// SimpleEval does on the server. Template placeholders are not rendered.
+
+type Env = Record<string, RuleValue>
+type Answers = Record<string, RuleValue>
+export type AnswerError = Record<string, unknown>
+
+class PyTypeError extends Error {}
+
+export function normalizeName(name: string): string {
+  const normalized = name.replace(/[^0-9A-Za-z_]/g, '_')
+  return /^[0-9]/.test(normalized) ? `_${normalized}` : normalized
+}
+
+function pyEq(a: RuleValue, b: RuleValue): boolean {
+  if (a === null || b === null) return a === b
+  const numA = typeof a === 'number' || typeof a === 'boolean'
+  const numB = typeof b === 'number' || typeof b === 'boolean'
+  if (numA && numB) return Number(a) === Number(b)
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((item, index) => pyEq(item, b[index] as RuleValue))
+  }
+  return a === b
+}
+
+function pyTruthy(value: RuleValue): boolean {
+  if (Array.isArray(value)) return value.length > 0
+  return Boolean(value)
+}
+
+function pyIn(item: RuleValue, container: RuleValue): boolean {
+  if (Array.isArray(container)) return container.some((entry) => pyEq(item, entry))
+  if (typeof container === 'string') {
+    if (typeof item !== 'string') throw new PyTypeError('in_requires_string')
+    return container.includes(item)
+  }
+  throw new PyTypeError('not_iterable')
+}
+
+function pyOrder(a: RuleValue, b: RuleValue): number {
+  const numA = typeof a === 'number' || typeof a === 'boolean'
+  const numB = typeof b === 'number' || typeof b === 'boolean'
+  if (numA && numB) return Number(a) - Number(b)
+  if (typeof a === 'string' && typeof b === 'string') return a < b ? -1 : a > b ? 1 : 0
+  throw new PyTypeError('unorderable')
+}
+
+function evalNode(node: RuleNode, env: Env): RuleValue {
+  if (!Array.isArray(node)) return node
+  const [op, ...args] = node
+  switch (op) {
+    case 'else':
+      return true
+    case 'var':
+      return env[args[0] as string] ?? null
+    case 'list':
+      return args.map((arg) => evalNode(arg, env)) as RuleValue
+    case 'and': {
+      let out: RuleValue = true
+      for (const arg of args) {
+        out = evalNode(arg, env)
+        if (!pyTruthy(out)) return out
+      }
+      return out
+    }
+    case 'or': {
+      let out: RuleValue = false
+      for (const arg of args) {
+        out = evalNode(arg, env)
+        if (pyTruthy(out)) return out
+      }
+      return out
+    }
+    case 'not':
+      return !pyTruthy(evalNode(args[0] as RuleNode, env))
+  }
+  const left = evalNode(args[0] as RuleNode, env)
+  const right = evalNode(args[1] as RuleNode, env)
+  switch (op) {
+    case '==':
+      return pyEq(left, right)
+    case '!=':
+      return !pyEq(left, right)
+    case '<':
+      return pyOrder(left, right) < 0
+    case '<=':
+      return pyOrder(left, right) <= 0
+    case '>':
+      return pyOrder(left, right) > 0
+    case '>=':
+      return pyOrder(left, right) >= 0
+    case 'in':
+      return pyIn(left, right)
+    case 'not in':
+      return !pyIn(left, right)
+    case 'is':
+      return left === right
+    case 'is not':
+      return left !== right
+  }
+  throw new Error(`unsupported_rule_node:${String(op)}`)
+}
+
+function buildEnv(answers: Answers, params: Answers): Env {
+  const env: Env = {}
+  for (const [key, value] of Object.entries({ ...params, ...answers })) {
+    env[normalizeName(key)] = value
+  }
+  return env
+}
+
+export function evalCondition(node: RuleNode | undefined, answers: Answers, params: Answers): boolean {
+  if (node === undefined || node === true) return true
+  try {
+    return pyTruthy(evalNode(node, buildEnv(answers, params)))
+  } catch (e) {
+    if (e instanceof PyTypeError) return false
+    throw e
+  }
+}
+
+function isElse(node: RuleNode): boolean {
+  return Array.isArray(node) && node.length === 1 && node[0] === 'else'
+}
+
+function defaultForType(type: string | null | undefined): RuleValue {
+  const lower = (type ?? '').toLowerCase()
+  if (lower === 'boolean') return false
+  if (lower === 'string') return ''
+  if (lower === 'string_list' || lower === 'list') return []
+  return null
+}
+
+export function computeParameters(bundle: RuleBundle, answers: Answers): Answers {
+  const params: Answers = { ...bundle.constants }
+  for (const module of bundle.modules) {
+    for (const variable of module.variables) {
+      let value: RuleValue =
+        variable.initial !== undefined && variable.initial !== null
+          ? variable.initial
+          : defaultForType(variable.type)
+      const lower = (variable.type ?? '').toLowerCase()
+      if (lower === 'string_list' || lower === 'list') {
+        const collected: AnswerScalar[] = []
+        let elseValue: RuleValue | undefined
+        for (const [condition, ruleValue] of variable.rules) {
+          if (isElse(condition)) {
+            elseValue = ruleValue
+            continue
+          }
+          if (evalCondition(condition, answers, params)) collected.push(ruleValue as AnswerScalar)
+        }
+        if (collected.length) {
+          value = collected
+        } else if (elseValue !== undefined && elseValue !== null) {
+          value = Array.isArray(elseValue) ? elseValue : [elseValue]
+        }
+      } else {
+        for (const [condition, ruleValue] of variable.rules) {
+          if (evalCondition(condition, answers, params)) {
+            value = ruleValue
+            break
+          }
+        }
+      }
+      params[variable.name] = value
+    }
+  }
+  return params
+}
+
+export function questionVisible(question: BundleQuestion, answers: Answers, params: Answers): boolean {
+  if (question.dependency === undefined) return true
+  return evalCondition(question.dependency, answers, params)
+}
+
+export function validateAnswer(question: BundleQuestion, value: RuleValue): AnswerError | null {
+  const allowed = question.values ?? []
+  const isAllowed = (item: RuleValue) => allowed.some((option) => pyEq(option, item))
+  if (question.type === 'boolean') {
+    return typeof value === 'boolean' ? null : { invalid_answer: question.id, expected: 'boolean' }
+  }
+  if (question.type === 'single_choice') {
+    return isAllowed(value) ? null : { invalid_answer: question.id, value }
+  }
+  if (question.type === 'multi_choice' || question.type === 'multiple_choice') {
+    if (!Array.isArray(value)) return { invalid_answer: question.id, expected: 'list' }
+    if (value.some((item, index) => value.findIndex((other) => pyEq(item, other)) !== index)) {
+      return { invalid_answer: question.id, duplicates: true }
+    }
+    const invalid = value.filter((item) => !isAllowed(item))
+    if (invalid.length) return { invalid_answer: question.id, invalid }
+    const exclusive = question.exclusive ?? []
+    if (exclusive.length && value.some((item) => exclusive.some((ex) => pyEq(ex, item)))) {
+      if (value.length !== 1) return { invalid_answer: question.id, exclusive: true }
+    }
+  }
+  return null
+}
+
+export function currentQuestionId(module: BundleModule, answers: Answers, params: Answers): string | null {
+  let lastAnswered: string | null = null
+  let lastVisible: string | null = null
+  for (const question of module.questions) {
+    if (!questionVisible(question, answers, params)) continue
+    lastVisible = question.id
+    if (!(question.id in answers)) return question.id
+    lastAnswered = question.id
+  }
+  return lastAnswered ?? lastVisible
+}
+
+export function moduleComplete(module: BundleModule, answers: Answers, params: Answers): boolean {
+  return module.questions.every(
+    (question) => question.id in answers || !questionVisible(question, answers, params),
+  )
+}
+
+export function pruneHiddenAnswers(module: BundleModule, answers: Answers, params: Answers): boolean {
+  let removed = false
+  for (const question of module.questions) {
+    if (question.id in answers && !questionVisible(question, answers, params)) {
+      delete answers[question.id]
+      removed = true
+    }
+  }
+  return removed
+}
+
+export function settle(bundle: RuleBundle, module: BundleModule, answers: Answers): Answers {
+  let params = computeParameters(bundle, answers)
+  for (let i = 0; i < 5; i += 1) {
+    if (!pruneHiddenAnswers(module, answers, params)) break
+    params = computeParameters(bundle, answers)
+  }
+  return params
+}
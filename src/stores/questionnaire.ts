@@ -2,11 +2,16 @@ import { ref } from 'vue'
 import { defineStore } from 'pinia'
 import type {
   AnswerValue,
+  BackRequest,
+  BackResponse,
   Module,
   ModuleResponse,
   ModuleQuestion,
   QuestionResponse,
   ResultResponse,
+  RuleBundle,
+  RuleBundleResponse,
+  SessionStateResponse,
   StartResponse,
   SubmitRequest,
   SubmitResponse,
@@ -14,6 +19,7 @@ import type {
 import { useLocaleStore } from '@/stores/locale'
 
 const API_BASE = import.meta.env.VITE_API_BASE ?? (import.meta.env.DEV ? '/api' : '')
+const STATIC_BASE = import.meta.env.VITE_STATIC_BASE ?? ''
 const SESSION_KEY = 'questionnaire_session_id'
 const LOG_LEVEL = import.meta.env.VITE_LOG_LEVEL ?? (import.meta.env.DEV ? 'info' : 'error')
 const LOG_INFO = LOG_LEVEL === 'info' || LOG_LEVEL === 'debug'
@@ -43,12 +49,24 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
   const currentModule = ref<Module | null>(null)
   const parameters = ref<Record<string, AnswerValue>>({})
   const answers = ref<Record<string, AnswerValue>>({})
+  const revision = ref<number | null>(null)
+  // Answers the server refused with a 409: kept until the user decides whether to overwrite the newer state.
+  const conflict = ref<{ moduleId: string; answers: Record<string, AnswerValue> } | null>(null)
+  let serverAnswers: Record<string, AnswerValue> = {}
+  let parametersSynced = false
   const lastAction = ref<SubmitResponse['next'] | null>(null)
   const lastMessage = ref<string | null>(null)
   const conclusion = ref<Record<string, unknown> | null>(null)
+  const ruleBundle = ref<RuleBundle | null>(null)
+  const engineVersions = ref<Record<string, string>>({})
   const loading = ref(false)
   const error = ref<string | null>(null)
 
+  function versionQuery() {
+    const version = engineVersions.value[locale.apiLang]
+    return version ? `&v=${encodeURIComponent(version)}` : ''
+  }
+
   async function init(): Promise<Module | null> {
     loading.value = true
     error.value = null
@@ -61,6 +79,10 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
       currentModule.value = data.module
       parameters.value = {}
       answers.value = {}
+      revision.value = data.revision ?? 0
+      if (data.engine_version) engineVersions.value[locale.apiLang] = data.engine_version
+      serverAnswers = {}
+      parametersSynced = false
       lastAction.value = null
       lastMessage.value = null
       conclusion.value = null
@@ -95,36 +117,157 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
     }
   }
 
+  async function loadSession(): Promise<SessionStateResponse | null> {
+    const res = await fetchWithLog(
+      `${API_BASE}/session?session_id=${sessionId.value}&lang=${locale.apiLang}`,
+      undefined,
+      'session',
+    )
+    if (!res.ok) throw new Error(`session_http_${res.status}`)
+    const data = (await res.json()) as SessionStateResponse
+    answers.value = { ...data.answers }
+    serverAnswers = { ...data.answers }
+    parameters.value = data.parameters
+    parametersSynced = true
+    revision.value = data.revision
+    if (data.module) currentModule.value = data.module
+    conclusion.value = data.conclusion ?? null
+    return data
+  }
+
+  function buildSubmitPayload(moduleId: string, payloadAnswers: Record<string, AnswerValue>): SubmitRequest {
+    const changed: Record<string, AnswerValue> = {}
+    for (const [key, value] of Object.entries(payloadAnswers)) {
+      if (JSON.stringify(serverAnswers[key]) !== JSON.stringify(value)) changed[key] = value
+    }
+    const removed = Object.keys(serverAnswers).filter((key) => !(key in payloadAnswers))
+    return {
+      session_id: sessionId.value,
+      module_id: moduleId,
+      answers: changed,
+      removed,
+      base_revision: revision.value,
+      parameters_mode: parametersSynced ? 'diff' : 'full',
+    }
+  }
+
+  function applySubmit(data: SubmitResponse, payloadAnswers: Record<string, AnswerValue>) {
+    parameters.value =
+      data.parameters_base != null ? { ...parameters.value, ...data.parameters } : data.parameters
+    parametersSynced = true
+    lastAction.value = data.next
+    lastMessage.value = data.next?.message ?? null
+    answers.value = { ...payloadAnswers }
+    serverAnswers = { ...payloadAnswers }
+    for (const key of data.pruned ?? []) delete serverAnswers[key]
+    revision.value = data.revision ?? null
+    if (data.module) currentModule.value = data.module
+    if (data.conclusion !== undefined) conclusion.value = data.conclusion ?? null
+  }
+
+  async function failedSubmit(res: Response): Promise<never> {
+    // Unknown server state: the next submit reloads it first instead of guessing a base revision.
+    revision.value = null
+    parametersSynced = false
+    const detail = await res.json().catch(() => null)
+    throw new Error(JSON.stringify(detail ?? { status: res.status }))
+  }
+
+  async function postSubmit(payload: SubmitRequest) {
+    return fetchWithLog(`${API_BASE}/submit-answer?lang=${locale.apiLang}`, {
+      method: 'POST',
+      headers: { 'content-type': 'application/json' },
+      body: JSON.stringify(payload),
+    }, 'submit-answer')
+  }
+
   async function submit(moduleId: string, payloadAnswers: Record<string, AnswerValue>): Promise<SubmitResponse | null> {
     if (!sessionId.value) return null
     loading.value = true
     error.value = null
+    conflict.value = null
     try {
-      const payload: SubmitRequest = {
+      if (revision.value === null) await loadSession()
+      const res = await postSubmit(buildSubmitPayload(moduleId, payloadAnswers))
+      if (res.status === 409) {
+        // Someone else changed the session (another tab or device): show their state, keep ours for resolveConflict.
+        await loadSession()
+        conflict.value = { moduleId, answers: { ...payloadAnswers } }
+        throw new Error('revision_conflict')
+      }
+      if (!res.ok) await failedSubmit(res)
+      const data = (await res.json()) as SubmitResponse
+      applySubmit(data, payloadAnswers)
+      return data
+    } catch (e) {
+      error.value = e instanceof Error ? e.message : 'submit_failed'
+      return null
+    } finally {
+      loading.value = false
+    }
+  }
+
+  async function resolveConflict(overwrite: boolean): Promise<SubmitResponse | null> {
+    const pending = conflict.value
+    conflict.value = null
+    if (!pending) return null
+    error.value = null
+    if (!overwrite) return null
+    loading.value = true
+    try {
+      // Replaces only the state the user has just been shown; a newer change is another 409.
+      const res = await postSubmit({
         session_id: sessionId.value,
-        module_id: moduleId,
-        answers: payloadAnswers,
+        module_id: pending.moduleId,
+        answers: pending.answers,
         replace: true,
+        base_revision: revision.value,
+      })
+      if (res.status === 409) {
+        await loadSession()
+        conflict.value = pending
+        throw new Error('revision_conflict')
       }
-      const res = await fetchWithLog(`${API_BASE}/submit-answer?lang=${locale.apiLang}`, {
+      if (!res.ok) await failedSubmit(res)
+      const data = (await res.json()) as SubmitResponse
+      applySubmit(data, pending.answers)
+      return data
+    } catch (e) {
+      error.value = e instanceof Error ? e.message : 'submit_failed'
+      return null
+    } finally {
+      loading.value = false
+    }
+  }
+
+  async function back(steps = 1): Promise<BackResponse | null> {
+    if (!sessionId.value) return null
+    loading.value = true
+    error.value = null
+    try {
+      const payload: BackRequest = { session_id: sessionId.value, steps, base_revision: revision.value }
+      const res = await fetchWithLog(`${API_BASE}/back?lang=${locale.apiLang}`, {
         method: 'POST',
         headers: { 'content-type': 'application/json' },
         body: JSON.stringify(payload),
-      }, 'submit-answer')
+      }, 'back')
       if (!res.ok) {
         const detail = await res.json().catch(() => null)
         throw new Error(JSON.stringify(detail ?? { status: res.status }))
       }
-      const data = (await res.json()) as SubmitResponse
+      const data = (await res.json()) as BackResponse
+      answers.value = { ...data.answers }
+      serverAnswers = { ...data.answers }
       parameters.value = data.parameters
-      lastAction.value = data.next
-      lastMessage.value = data.next?.message ?? null
-      answers.value = { ...payloadAnswers }
+      parametersSynced = true
+      revision.value = data.revision
+      lastAction.value = null
+      lastMessage.value = null
       if (data.module) currentModule.value = data.module
-      if (data.conclusion !== undefined) conclusion.value = data.conclusion ?? null
+      conclusion.value = data.conclusion ?? null
       return data
     } catch (e) {
-      error.value = e instanceof Error ? e.message : 'submit_failed'
+      error.value = e instanceof Error ? e.message : 'back_failed'
       return null
     } finally {
       loading.value = false
@@ -135,13 +278,20 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
     loading.value = true
     error.value = null
     try {
-      const res = await fetchWithLog(
-        `${API_BASE}/question/${encodeURIComponent(questionId)}?lang=${locale.apiLang}`,
-        undefined,
-        'question',
-      )
-      if (!res.ok) throw new Error(`question_http_${res.status}`)
-      const data = (await res.json()) as QuestionResponse
+      const version = engineVersions.value[locale.apiLang]
+      const apiUrl = `${API_BASE}/question/${encodeURIComponent(questionId)}?lang=${locale.apiLang}${versionQuery()}`
+      let data: QuestionResponse | null = null
+      if (STATIC_BASE && version) {
+        // The export can lag behind the engine (new version, deploy without re-export): fall back to the API.
+        const staticUrl = `${STATIC_BASE}/${locale.apiLang}/${version}/questions/${encodeURIComponent(questionId)}.json`
+        const res = await fetchWithLog(staticUrl, undefined, 'question_static').catch(() => null)
+        if (res?.ok) data = (await res.json().catch(() => null)) as QuestionResponse | null
+      }
+      if (!data?.question) {
+        const res = await fetchWithLog(apiUrl, undefined, 'question')
+        if (!res.ok) throw new Error(`question_http_${res.status}`)
+        data = (await res.json()) as QuestionResponse
+      }
       return data.question
     } catch (e) {
       error.value = e instanceof Error ? e.message : 'question_failed'
@@ -164,6 +314,8 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
       if (!res.ok) throw new Error(`result_http_${res.status}`)
       const data = (await res.json()) as ResultResponse
       parameters.value = data.parameters
+      parametersSynced = true
+      revision.value = data.revision
       conclusion.value = data.conclusion ?? null
       return data.parameters
     } catch (e) {
@@ -174,12 +326,35 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
     }
   }
 
+  async function loadRuleBundle(): Promise<RuleBundle | null> {
+    if (ruleBundle.value?.lang === locale.apiLang) return ruleBundle.value
+    try {
+      const res = await fetchWithLog(
+        `${API_BASE}/rules/bundle?lang=${locale.apiLang}${versionQuery()}`,
+        undefined,
+        'rule-bundle',
+      )
+      if (!res.ok) throw new Error(`rule_bundle_http_${res.status}`)
+      const data = (await res.json()) as RuleBundleResponse
+      ruleBundle.value = data.bundle
+      engineVersions.value[data.bundle.lang] = data.bundle.version
+      return data.bundle
+    } catch (e) {
+      logError('rule_bundle_failed', e)
+      return null
+    }
+  }
+
   function reset() {
     sessionId.value = ''
     localStorage.removeItem(SESSION_KEY)
     currentModule.value = null
     parameters.value = {}
     answers.value = {}
+    revision.value = null
+    conflict.value = null
+    serverAnswers = {}
+    parametersSynced = false
     lastAction.value = null
     lastMessage.value = null
     conclusion.value = null
@@ -191,16 +366,23 @@ export const useQuestionnaireStore = defineStore('questionnaire', () => {
     currentModule,
     parameters,
     answers,
+    revision,
+    conflict,
     lastAction,
     lastMessage,
     conclusion,
+    ruleBundle,
+    engineVersions,
     loading,
     error,
     init,
     loadModule,
     submit,
+    resolveConflict,
+    back,
     fetchQuestion,
     fetchResult,
+    loadRuleBundle,
     reset,
   }
 })
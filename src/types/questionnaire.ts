@@ -23,11 +23,26 @@ export type Module = {
   title: string
   description?: string
   questions: ModuleQuestion[]
+  lookahead?: ModuleLookahead | null
+}
+
+export type LookaheadBranch = {
+  value: AnswerScalar
+  next: NextAction
+  module_complete: boolean
+  module?: Module | null
+}
+
+export type ModuleLookahead = {
+  question_id: string
+  options: LookaheadBranch[]
 }
 
 export type StartResponse = {
   session_id: string
   module: Module
+  revision?: number
+  engine_version?: string | null
 }
 
 export type ModuleResponse = {
@@ -43,6 +58,9 @@ export type SubmitRequest = {
   module_id?: string | null
   answers: Record<string, AnswerValue>
   replace?: boolean
+  removed?: string[]
+  base_revision?: number | null
+  parameters_mode?: 'full' | 'diff'
 }
 
 export type NextAction = {
@@ -53,7 +71,10 @@ export type NextAction = {
 
 export type SubmitResponse = {
   session_id: string
+  revision: number
+  pruned?: string[]
   parameters: Record<string, AnswerValue>
+  parameters_base?: number | null
   next: NextAction
   module_complete: boolean
   module?: Module | null
@@ -63,4 +84,61 @@ export type SubmitResponse = {
 export type ResultResponse = {
   parameters: Record<string, AnswerValue>
   conclusion?: Record<string, unknown> | null
+  revision: number
+}
+
+export type BackRequest = {
+  session_id: string
+  steps?: number
+  base_revision?: number | null
+}
+
+export type BackResponse = {
+  session_id: string
+  revision: number
+  restored: 'snapshot' | 'recomputed'
+  history: number
+  answers: Record<string, AnswerValue>
+  parameters: Record<string, AnswerValue>
+  module_id?: string | null
+  module?: Module | null
+  conclusion?: Record<string, unknown> | null
+}
+
+export type SessionStateResponse = Omit<BackResponse, 'restored'>
+
+export type RuleValue = AnswerValue | null
+export type RuleNode = RuleValue | RuleNode[]
+
+export type BundleQuestion = {
+  id: string
+  type: string
+  dependency?: RuleNode
+  values?: AnswerScalar[]
+  exclusive?: AnswerScalar[]
+}
+
+export type BundleVariable = {
+  name: string
+  type?: string | null
+  initial?: RuleValue
+  rules: [RuleNode, RuleValue][]
+}
+
+export type BundleModule = {
+  id: string
+  questions: BundleQuestion[]
+  variables: BundleVariable[]
+}
+
+export type RuleBundle = {
+  format: number
+  lang: string
+  version: string
+  constants: Record<string, RuleValue>
+  modules: BundleModule[]
+}
+
+export type RuleBundleResponse = {
+  bundle: RuleBundle
 }